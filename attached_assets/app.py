@@ -1,33 +1,56 @@
 import os
 import sys
+import io
 from threading import Thread
 import re
 from datetime import datetime, date, timedelta
 import time
+import queue
+from functools import lru_cache
 import uuid # Ensure this is here for the adhoc endpoint
 
 import numpy as np
-from flask import Flask, render_template, request, jsonify, send_from_directory, Response, url_for
+from flask import Flask, render_template, request, jsonify, send_from_directory, Response, url_for, stream_with_context
 from urllib.parse import urlparse
 import datetime as dt_module # Renaming to avoid conflict with 'datetime' object from 'from datetime import datetime'
 from jinja2 import BaseLoader 
 from markupsafe import Markup 
 from PIL import Image # Ensure this is here for the adhoc endpoint
 
-from eidon.config import appdata_folder, screenshots_path, ARCHIVE_DIR, WEBP_QUALITY
-# Corrected database import to include insert_entry and get_entry_by_timestamp
-from eidon.database import (
-    create_db, 
-    get_all_entries, 
-    get_timestamps, 
-    get_entry_by_timestamp, 
-    insert_entry # Make sure this is included
-)
-from eidon.nlp import cosine_similarity, get_embedding, tokenize_text
-from eidon.screenshot import record_screenshots_thread, pause_capture, resume_capture, is_capture_active
-from eidon.utils import human_readable_time, timestamp_to_human_readable, parse_prefixed_filters
-from eidon.archiver import run_archiver, get_archived_image_data
-from eidon.ocr import extract_text_from_image # <--- ADD THIS IMPORT
+from eidon import config
+if __name__ == "__main__":
+    # Parse command-line arguments before the eidon modules below copy config values.
+    config.init()
+
+from eidon.config import appdata_folder, screenshots_path, ARCHIVE_DIR, WEBP_QUALITY, WEBP_METHOD, ensure_dirs_exist
+from eidon.utils import human_readable_time, human_readable_times, timestamp_to_human_readable, parse_prefixed_filters
+# The archiver's process-pool workers re-run this file as __mp_main__ when they are
+# started with "spawn" (the macOS default). They only need eidon.archive_worker, so
+# skip the modules below, which load the embedding model, OCR and capture backends.
+if __name__ != "__mp_main__":
+    # Corrected database import to include insert_entry and get_entry_by_timestamp
+    from eidon.database import (
+        create_db, 
+        get_embedding_matrix,
+        get_timestamps, 
+        get_entry_by_timestamp, 
+        insert_entry, # Make sure this is included
+        query_entries,
+        query_entry_ids,
+        get_entries_by_ids,
+    )
+    from eidon.nlp import cosine_similarity_batch, get_embedding, tokenize_text
+    from eidon import vector_index
+    from eidon.screenshot import record_screenshots_thread, pause_capture, resume_capture, is_capture_active
+    from eidon.archiver import run_archiver, get_archived_image_path, open_archived_image_stream
+    from eidon.ocr import extract_text_from_image # <--- ADD THIS IMPORT
+
+# Maximum number of semantic matches returned when the ANN vector index is used
+ANN_TOP_K = 200
+# Maximum number of full-text (BM25) matches reranked by embedding similarity
+LEXICAL_CANDIDATE_LIMIT = 500
+# Browser cache lifetime (seconds) for screenshot images; they never change once written
+SCREENSHOT_MAX_AGE = 3600
 
 app = Flask(
     __name__,
@@ -35,12 +58,16 @@ app = Flask(
     static_url_path='/static'
 )
 
+# Patterns used per entry while rendering and filtering, compiled once.
+_NL_RE = re.compile(r'\r\n|\r|\n')
+_SLUG_RE = re.compile(r'[^a-z0-9-]')
+
 # Custom Jinja2 filter: nl2br
 def nl2br_filter(value):
     if value is None:
         return ''
     s_value = str(value)
-    return Markup(re.sub(r'\r\n|\r|\n', '<br>\n', s_value))
+    return Markup(_NL_RE.sub('<br>\n', s_value))
 
 # Custom filter for shorter date/time for cards
 def timestamp_to_short_format(timestamp_val):
@@ -60,6 +87,7 @@ app.jinja_env.filters["timestamp_to_human_readable"] = timestamp_to_human_readab
 app.jinja_env.filters["timestamp_to_short_format"] = timestamp_to_short_format
 app.jinja_env.filters["nl2br"] = nl2br_filter
 
+@lru_cache(maxsize=1024)
 def get_app_icon_url(app_name, page_url=None):
     """Return Google favicon for page_url if given, else Bootstrap Icons CDN URL for app_name."""
     if page_url:
@@ -67,18 +95,27 @@ def get_app_icon_url(app_name, page_url=None):
         return f'https://www.google.com/s2/favicons?sz=64&domain={domain}'
     if not app_name:
         return ''
-    slug = re.sub(r'[^a-z0-9\\-]', '', app_name.lower().strip().replace(' ', '-'))
+    slug = _SLUG_RE.sub('', app_name.lower().strip().replace(' ', '-'))
     return f'https://cdn.jsdelivr.net/npm/bootstrap-icons@1.10.5/icons/{slug}.svg'
 
 @app.route("/screenshots_file/<path:filename>")
 def serve_screenshot(filename):
     screenshots_file_path = os.path.join(screenshots_path, filename)
     if os.path.exists(screenshots_file_path):
-        return send_from_directory(screenshots_path, filename)
-
-    archived_data = get_archived_image_data(filename)
-    if archived_data:
-        return Response(archived_data, mimetype='image/webp')
+        return send_from_directory(screenshots_path, filename, conditional=True, max_age=SCREENSHOT_MAX_AGE)
+
+    archived_path = get_archived_image_path(filename)
+    if archived_path:
+        # Stream the decompression instead of buffering the whole image, and let
+        # conditional requests short-circuit with a 304 before any decompression.
+        # An archive that cannot be decoded is a 404, never a (cached) empty image.
+        image_stream = open_archived_image_stream(archived_path)
+        if image_stream is None:
+            return "Image not found", 404
+        response = Response(stream_with_context(image_stream), mimetype='image/webp')
+        response.set_etag(f"{filename}-{int(os.path.getmtime(archived_path))}")
+        response.cache_control.max_age = SCREENSHOT_MAX_AGE
+        return response.make_conditional(request)
     
     return "Image not found", 404
 
@@ -145,6 +182,17 @@ def timeline():
         initial_metadata_html=initial_metadata_html
     )
 
+@lru_cache(maxsize=2048)
+def _cached_query_embedding(q):
+    """
+    Returns the float32 embedding of a search query, memoized so repeated and
+    incrementally typed queries skip the embedding model. The array is read-only
+    because it is shared between requests.
+    """
+    vec = np.array(get_embedding(q), dtype=np.float32)
+    vec.setflags(write=False)
+    return vec
+
 @app.route("/search")
 def search():
     raw_q = request.args.get("q", "")
@@ -153,84 +201,82 @@ def search():
     if not q and not filters:
         return render_template("search_prompt.html")
 
-    all_db_entries = get_all_entries()
-    
     q_lower = q.lower()
     query_tokens = tokenize_text(q_lower)
-    
-    token_matched_entries = []
-    if query_tokens:
-        for e in all_db_entries:
-            search_parts = []
-            if e.text: search_parts.append(e.text.lower())
-            if e.app: search_parts.append(e.app.lower())
-            if e.title: search_parts.append(e.title.lower())
-            if e.page_url: search_parts.append(e.page_url.lower())
-            
-            if not search_parts: continue
 
-            combined_text = " ".join(search_parts)
-            entry_tokens = tokenize_text(combined_text)
-            
-            if query_tokens.issubset(entry_tokens):
-                token_matched_entries.append(e)
-
-    if query_tokens:
-        candidate_entries = token_matched_entries
+    # Date, time, title and URL filters and token matching are all evaluated in SQLite.
+    filter_args = dict(
+        date=filters.get("date"),
+        time_range=filters.get("time"),
+        title_substr=filters.get("title"),
+        url_domain_substr=filters.get("url"),
+        tokens=query_tokens,
+    )
+    query_emb = _cached_query_embedding(q) if q else None
+    ann_result = None
+    if query_emb is not None and query_emb.size > 0 and np.any(query_emb):
+        # Semantic recall: when more entries match than are ranked exactly, the ANN index
+        # picks the most similar of all of them. Without it (or for selective filters, see
+        # vector_index.search) token queries keep only their best BM25 matches.
+        matching_ids = query_entry_ids(**filter_args)
+        if len(matching_ids) > LEXICAL_CANDIDATE_LIMIT:
+            ann_result = vector_index.search(query_emb, k=ANN_TOP_K, candidate_ids=matching_ids)
+        if ann_result is not None:
+            candidate_entries = get_entries_by_ids(ann_result[0], with_embeddings=False)
+        elif query_tokens or len(matching_ids) <= LEXICAL_CANDIDATE_LIMIT:
+            candidate_entries = get_entries_by_ids(matching_ids[:LEXICAL_CANDIDATE_LIMIT], with_embeddings=False)
+        else:
+            candidate_entries = query_entries(**filter_args, with_embeddings=False)
     else:
-        candidate_entries = all_db_entries
-
-    filtered_entries = []
-    for e in candidate_entries:
-        ok = True
-        # Using dt_module.datetime for consistency
-        if "date" in filters and dt_module.datetime.fromtimestamp(e.timestamp).date() != filters["date"]:
-            ok = False
-        if ok and "time" in filters:
-            etime = dt_module.datetime.fromtimestamp(e.timestamp).time()
-            tfilter = filters["time"]
-            if isinstance(tfilter, tuple):
-                if not (tfilter[0] <= etime <= tfilter[1]):
-                    ok = False
-            else:
-                if etime.strftime("%H:%M") != tfilter.strftime("%H:%M"):
-                    ok = False
-        if ok and "title" in filters and (not e.title or filters["title"] not in e.title.lower()):
-            ok = False
-        if "url" in filters:
-            raw_url = e.page_url.lower() if e.page_url else ""
-            norm_url = re.sub(r'^https?://(www\\.)?', '', raw_url)
-            domain = norm_url.split('/')[0]
-            if filters["url"] not in domain:
-                ok = False
-        if ok:
-            filtered_entries.append(e)
-    candidate_entries = filtered_entries if filters else candidate_entries
-
-    if not q and filters:
+        candidate_entries = query_entries(
+            **filter_args,
+            limit=LEXICAL_CANDIDATE_LIMIT if query_tokens else None,
+            with_embeddings=False,
+        )
+
+    if ann_result is not None:
+        results_to_display = candidate_entries  # Already ranked by similarity
+    elif not q and filters:
         results_to_display = sorted(candidate_entries, key=lambda e: e.timestamp, reverse=True)
     else:
-        has_emb = any(e.embedding is not None and e.embedding.size > 0 for e in candidate_entries)
+        # Candidates are fetched without their embedding blobs; the cached embedding
+        # matrix says which entries have a (usable) embedding and holds the vectors.
+        if q:
+            candidate_rows, emb_matrix, emb_scales = get_embedding_matrix([e.id for e in candidate_entries])
+        else:
+            candidate_rows, emb_matrix, emb_scales = np.full(len(candidate_entries), -1, dtype=np.intp), None, None
+        has_emb = bool((candidate_rows >= 0).any())
         if q and has_emb:
-            entries_with_embeddings = [e for e in candidate_entries if e.embedding is not None and e.embedding.size > 0]
-            entries_without_embeddings = [e for e in candidate_entries if not (e.embedding is not None and e.embedding.size > 0)]
+            entries_with_embeddings = [e for e, row in zip(candidate_entries, candidate_rows) if row >= 0]
+            entries_without_embeddings = [e for e, row in zip(candidate_entries, candidate_rows) if row < 0]
             entries_without_embeddings.sort(key=lambda e: e.timestamp, reverse=True)
-            query_emb = get_embedding(q)
-            if query_emb is None or np.all(query_emb == 0):
+            if query_emb is None or not np.any(query_emb):
                 results_to_display = entries_without_embeddings
             else:
-                sims = [cosine_similarity(query_emb, e.embedding) for e in entries_with_embeddings]
-                ranked = [pair[0] for pair in sorted(zip(entries_with_embeddings, sims), key=lambda p: p[1], reverse=True)]
+                # Score all candidates with one matrix-vector product against the cached,
+                # pre-normalized embedding matrix. If the query's dimension differs from the
+                # stored embeddings (model changed), every candidate scores 0.
+                q_vec = query_emb
+                rows = candidate_rows[candidate_rows >= 0]
+                sims = np.zeros(len(entries_with_embeddings), dtype=np.float32)
+                if emb_matrix.shape[1] == q_vec.shape[0]:
+                    row_scales = emb_scales[rows] if emb_scales is not None else None
+                    sims = cosine_similarity_batch(emb_matrix[rows], q_vec, row_scales)
+                order = np.argsort(-sims, kind="stable")
+                ranked = [entries_with_embeddings[i] for i in order]
                 results_to_display = ranked + entries_without_embeddings
         else:
             results_to_display = sorted(candidate_entries, key=lambda e: e.timestamp, reverse=True)
 
     # build list of dicts with dynamic app icons for search results
+    # and their relative capture times, formatted for the whole page in one call
     entries_with_icons = []
-    for e in results_to_display:
-        entry_dict = dict(e._asdict())
-        entry_dict.pop('embedding', None)
+    human_times = human_readable_times([e.timestamp for e in results_to_display])
+    for e, human_time in zip(results_to_display, human_times):
+        entry_dict = e._asdict()
+        del entry_dict['embedding']  # Not loaded for search candidates; not rendered
         entry_dict['app_icon_url'] = get_app_icon_url(e.app, e.page_url)
+        entry_dict['human_time'] = human_time
         entries_with_icons.append(entry_dict)
     return render_template(
         "search_results.html",
@@ -254,6 +300,9 @@ def api_toggle_capture():
     return jsonify({"status": new_status})
 
 # Adhoc capture endpoint starts here
+# Captures are saved synchronously, then OCR/embedding/insert run on a background worker.
+ADHOC_Q = queue.Queue()
+
 @app.route("/api/add_adhoc_capture", methods=["POST"])
 def api_add_adhoc_capture():
     if 'screenshot_file' not in request.files:
@@ -281,17 +330,44 @@ def api_add_adhoc_capture():
     filepath = os.path.join(screenshots_path, filename_webp)
 
     try:
-        img = Image.open(file.stream)
-        img.save(filepath, format="WEBP", quality=WEBP_QUALITY)
+        raw = file.stream.read()
+        if raw[:4] == b"RIFF" and raw[8:12] == b"WEBP":
+            # Already WebP: store the upload as-is instead of decoding and lossily re-encoding it.
+            with open(filepath, "wb") as f:
+                f.write(raw)
+        else:
+            img = Image.open(io.BytesIO(raw))
+            img.save(filepath, format="WEBP", quality=WEBP_QUALITY, method=WEBP_METHOD)
     except Exception as e:
         app.logger.error(f"Error saving adhoc screenshot {filename_webp}: {e}")
         return jsonify({"status": "error", "message": f"Could not process or save image: {str(e)}"}), 500
 
+    # OCR, embedding and the DB insert are not interactive; hand them to the background
+    # worker so the client only waits for the image to be saved.
+    ADHOC_Q.put({
+        "filepath": filepath,
+        "filename": filename_webp,
+        "timestamp": timestamp,
+        "app": app_name,
+        "title": window_title,
+        "page_url": page_url,
+    })
+    return jsonify({"status": "accepted", "message": "Adhoc capture queued for processing.", "filename": filename_webp}), 202
+
+
+def _process_adhoc(task):
+    """Runs OCR, embedding and DB insertion for a queued adhoc capture."""
+    filename_webp = task["filename"]
+    timestamp = task["timestamp"]
     text_content = ""
     embedding_vector = np.array([]) 
 
     try:
-        text_content = extract_text_from_image(img) # Needs extract_text_from_image
+        # Re-open the saved file rather than holding the decoded image in the queue,
+        # decoding its pixels exactly once for OCR.
+        with Image.open(task["filepath"]) as img:
+            img.load()
+            text_content = extract_text_from_image(img) # Needs extract_text_from_image
     except Exception as e:
         app.logger.error(f"OCR error for adhoc capture {filename_webp}: {e}")
         # Continue with empty text
@@ -308,10 +384,10 @@ def api_add_adhoc_capture():
             text=text_content,
             timestamp=timestamp,
             embedding=embedding_vector,
-            app=app_name,
-            title=window_title,
+            app=task["app"],
+            title=task["title"],
             filename=filename_webp,
-            page_url=page_url
+            page_url=task["page_url"]
         )
         # Check if insertion was skipped due to duplicate timestamp or genuinely failed
         if db_id is None:
@@ -321,16 +397,28 @@ def api_add_adhoc_capture():
                  app.logger.warning(f"Adhoc capture for timestamp {timestamp} (file: {filename_webp}) was likely skipped due to duplicate timestamp.")
             else:
                 app.logger.error(f"Adhoc capture for {filename_webp} failed to insert into DB (not a duplicate).")
-                # return jsonify({"status": "error", "message": "Database insertion failed."}), 500 # Optional: make it a hard fail
+            return
     except Exception as e:
         app.logger.error(f"Database insertion error for adhoc capture {filename_webp}: {e}")
-        return jsonify({"status": "error", "message": f"Database error: {str(e)}"}), 500
+        return
 
     app.logger.info(f"Successfully processed adhoc capture: {filename_webp}")
-    return jsonify({"status": "success", "message": "Adhoc capture processed.", "filename": filename_webp})
+
+
+def adhoc_worker_thread():
+    """Consumes ADHOC_Q forever; run as a daemon thread."""
+    while True:
+        task = ADHOC_Q.get()
+        try:
+            _process_adhoc(task)
+        except Exception as e:
+            app.logger.error(f"Unexpected error processing adhoc capture {task.get('filename')}: {e}")
+        finally:
+            ADHOC_Q.task_done()
 
 
 if __name__ == "__main__":
+    ensure_dirs_exist()
     create_db()
     try:
         run_archiver()
@@ -345,4 +433,10 @@ if __name__ == "__main__":
     t.daemon = True
     t.start()
 
-    app.run(host='0.0.0.0', port=8082, debug=True)
+    adhoc_t = Thread(target=adhoc_worker_thread)
+    adhoc_t.daemon = True
+    adhoc_t.start()
+
+    # The Werkzeug reloader would start a second process that re-runs the archiver and
+    # a second recorder; the interactive debugger is opt-in via EIDON_DEBUG=1.
+    app.run(host='0.0.0.0', port=8082, debug=os.environ.get('EIDON_DEBUG') == '1', use_reloader=False)
@@ -0,0 +1,135 @@
+import os
+import sys
+import logging
+from datetime import datetime
+from typing import Optional, Tuple
+
+import zstandard as zstd
+
+# --- Archive Pool Worker ---
+# Per-file compression for eidon.archiver's process pool. Pool workers started with
+# "spawn" (the macOS default) are fresh interpreters that import this module to run
+# archive_file, so it deliberately imports no other eidon module: only the standard
+# library and zstandard.
+
+logger = logging.getLogger(__name__)
+if not logger.handlers: # Avoid adding multiple handlers if imported multiple times
+    handler = logging.StreamHandler(sys.stderr)
+    handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+
+# WebP payloads are already entropy-coded, so zstd mostly dedupes container headers;
+# deeper searches cost far more CPU than they save in size. Small files get the
+# cheapest level outright.
+SMALL_FILE_BYTES = 256 * 1024
+SMALL_FILE_COMPRESSION_LEVEL = 1
+_worker_compressor: Optional[zstd.ZstdCompressor] = None
+_worker_small_compressor: Optional[zstd.ZstdCompressor] = None
+
+
+def _make_compressor(compression_level: int, dict_bytes: Optional[bytes]) -> zstd.ZstdCompressor:
+    # threads=-1 only splits inputs larger than a zstd job, so small screenshots are
+    # unaffected while the occasional large file uses every core.
+    if dict_bytes is not None:
+        return zstd.ZstdCompressor(
+            level=compression_level, dict_data=zstd.ZstdCompressionDict(dict_bytes), threads=-1
+        )
+    return zstd.ZstdCompressor(level=compression_level, threads=-1)
+
+
+def init_worker(compression_level: int, dict_bytes: Optional[bytes]) -> None:
+    """ProcessPoolExecutor initializer: builds the per-process compressors."""
+    global _worker_compressor, _worker_small_compressor
+    _worker_compressor = _make_compressor(compression_level, dict_bytes)
+    _worker_small_compressor = _make_compressor(min(compression_level, SMALL_FILE_COMPRESSION_LEVEL), dict_bytes)
+
+
+def archive_file(file_info: Tuple[str, float, int], archive_dir: str, chunk_size: int) -> Tuple[str, str]:
+    """
+    Archives a single .webp file that is old enough to be archived, using the
+    compressor set up by `init_worker` for the current process.
+
+    Args:
+        file_info (Tuple[str, float, int]): (path, mtime, size) as stat'ed by the directory scan.
+        archive_dir (str): The archive root. Passed explicitly because pool workers may be
+            fresh interpreters in which config.init() (command-line arguments) never ran.
+        chunk_size (int): Size of chunks (in bytes) to read/write during compression.
+
+    Returns:
+        Tuple[str, str]: (status, original_filepath), where status is one of
+        "archived", "cleaned" (archive already existed, original removed),
+        "skipped" (vanished) or "error".
+    """
+    original_filepath, file_mtime, file_size = file_info
+    try:
+        mtime_datetime = datetime.fromtimestamp(file_mtime)
+        date_str = mtime_datetime.strftime("%Y-%m-%d")
+
+        day_archive_subdir = os.path.join(archive_dir, date_str)
+        try:
+            os.makedirs(day_archive_subdir, exist_ok=True)
+        except OSError as e:
+            logger.error(f"Failed to create day archive directory {day_archive_subdir} for {original_filepath}: {e}")
+            return "error", original_filepath
+
+        base_filename = os.path.basename(original_filepath)
+        archived_file_path_zst = os.path.join(day_archive_subdir, base_filename + ".zst")
+
+        # Check if the archived file already exists
+        if os.path.exists(archived_file_path_zst):
+            logger.debug(f"Archived file {archived_file_path_zst} already exists.")
+            # If original still exists, remove it (it's a duplicate or leftover)
+            if os.path.exists(original_filepath):
+                try:
+                    os.remove(original_filepath)
+                    logger.info(f"Removed original file {original_filepath} as its archive already exists.")
+                    return "cleaned", original_filepath
+                except OSError as e:
+                    logger.error(f"Error removing already archived original file {original_filepath}: {e}")
+                    return "error", original_filepath
+            return "skipped", original_filepath
+
+        # Archive the file
+        logger.info(f"Archiving {original_filepath} to {archived_file_path_zst}...")
+        if file_size < SMALL_FILE_BYTES:
+            compressor_context = _worker_small_compressor
+        else:
+            compressor_context = _worker_compressor
+        try:
+            with open(original_filepath, 'rb') as f_in, \
+                 open(archived_file_path_zst, 'wb') as f_out:
+                # Use stream_writer for efficient chunk-by-chunk compression
+                with compressor_context.stream_writer(f_out, size=file_size) as compressor:
+                    while True:
+                        chunk = f_in.read(chunk_size)
+                        if not chunk:
+                            break
+                        compressor.write(chunk)
+
+            # If compression is successful, remove the original file
+            os.remove(original_filepath)
+            logger.info(f"Successfully archived and removed original: {original_filepath}")
+            return "archived", original_filepath
+
+        except Exception as e: # Catch any error during compression or file removal
+            logger.error(f"Error during archiving process for {original_filepath} to {archived_file_path_zst}: {e}")
+            # Important: If compression failed, do NOT remove original_filepath.
+            # If archive file was partially created, it might be good to clean it up.
+            if os.path.exists(archived_file_path_zst):
+                try:
+                    # Check if the file is empty or very small, indicating partial write
+                    if os.path.getsize(archived_file_path_zst) < chunk_size / 2 : # Heuristic
+                        os.remove(archived_file_path_zst)
+                        logger.warning(f"Removed potentially corrupt/partial archive file: {archived_file_path_zst}")
+                except OSError as rm_err:
+                     logger.error(f"Failed to remove partial archive {archived_file_path_zst} after error: {rm_err}")
+            return "error", original_filepath
+
+    except FileNotFoundError:
+        # This can happen if a file is deleted between the directory scan and processing
+        logger.warning(f"File not found during archival (possibly deleted concurrently): {original_filepath}")
+        return "skipped", original_filepath
+    except Exception as e:
+        logger.error(f"Unexpected error processing file {original_filepath} for archiving: {e}")
+        return "error", original_filepath
@@ -1,12 +1,15 @@
 import os
 import time
-import glob
 import zstandard as zstd # Ensure this is imported
 from datetime import datetime
-from typing import Optional, Tuple # Added Tuple for potential future use
+from typing import Iterator, Optional, Tuple # Added Tuple for potential future use
 import re
 import logging # For better logging practices
 import sys # For sys.stderr
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 
 # Assuming your config.py is in a directory named 'eidon' at the same level or in PYTHONPATH
 # If Eidon is the root package: from eidon.config import ...
@@ -14,6 +17,8 @@ import sys # For sys.stderr
 # Given "from Eidon.config", this implies Eidon is a directory in PYTHONPATH
 # For consistency with other files, let's assume:
 from eidon.config import screenshots_path, HOT_DAYS, COLD_DAYS, ARCHIVE_DIR, WEBP_QUALITY # WEBP_QUALITY isn't used here but good to be aware of config structure
+from eidon.zdict import get_decompressor, get_or_train_dictionary
+from eidon.archive_worker import archive_file, init_worker
 
 # --- Logging Setup ---
 # It's good practice to use the logging module instead of just print() for application messages.
@@ -26,14 +31,56 @@ if not logger.handlers: # Avoid adding multiple handlers if imported multiple ti
     logger.setLevel(logging.INFO) # Set default logging level (INFO, DEBUG, WARNING, ERROR)
 
 
+# --- Decompressed Image Cache ---
+# Timeline scrubbing requests the same archived frames repeatedly. Keep recently
+# decompressed images in an LRU bounded by total bytes, so hits skip both the disk
+# read and the zstd decompression. Archive files never change once written.
+ARCHIVE_CACHE_MAX_BYTES = 128 * 1024 * 1024
+_archive_cache: "OrderedDict[str, bytes]" = OrderedDict()
+_archive_cache_bytes = 0
+_archive_cache_lock = threading.Lock()
+
+
+def _archive_cache_get(archived_filepath: str) -> Optional[bytes]:
+    with _archive_cache_lock:
+        data = _archive_cache.get(archived_filepath)
+        if data is not None:
+            _archive_cache.move_to_end(archived_filepath)
+        return data
+
+
+def _archive_cache_put(archived_filepath: str, data: bytes) -> None:
+    global _archive_cache_bytes
+    if len(data) > ARCHIVE_CACHE_MAX_BYTES:
+        return
+    with _archive_cache_lock:
+        previous = _archive_cache.pop(archived_filepath, None)
+        if previous is not None:
+            _archive_cache_bytes -= len(previous)
+        _archive_cache[archived_filepath] = data
+        _archive_cache_bytes += len(data)
+        while _archive_cache_bytes > ARCHIVE_CACHE_MAX_BYTES:
+            _, evicted = _archive_cache.popitem(last=False)
+            _archive_cache_bytes -= len(evicted)
+
+
 # --- Archiver Function ---
-def run_archiver(compression_level: int = 19, chunk_size: int = 16384) -> None:
+# Archiving is CPU-bound zstd compression per file and independent across files, so
+# files are spread over a process pool. Each worker builds its own compressor once
+# (compressor objects cannot be pickled) from the shared dictionary's raw bytes.
+# The per-file work lives in eidon.archive_worker, which spawned workers import
+# without the rest of the app.
+ARCHIVE_PARALLEL_MIN_FILES = 16  # Below this, pool start-up costs more than it saves
+
+
+def run_archiver(compression_level: int = 3, chunk_size: int = 16384) -> None:
     """
     Compresses old .webp snapshots from screenshots_path into individual .zst files
-    within date-based subdirectories in ARCHIVE_DIR.
+    within date-based subdirectories in ARCHIVE_DIR, in parallel across CPU cores.
 
     Args:
         compression_level (int): Zstandard compression level (1-22, higher is more compression but slower).
+            Files smaller than archive_worker.SMALL_FILE_BYTES always use its SMALL_FILE_COMPRESSION_LEVEL.
         chunk_size (int): Size of chunks (in bytes) to read/write during compression.
     """
     now_ts = time.time()
@@ -51,107 +98,60 @@ def run_archiver(compression_level: int = 19, chunk_size: int = 16384) -> None:
         logger.error(f"Failed to create archive base directory {ARCHIVE_DIR}: {e}")
         return # Cannot proceed if archive directory cannot be created
 
-    # Find all .webp files in the screenshots directory
-    webp_pattern = os.path.join(screenshots_path, "*.webp")
-    archived_count = 0
-    already_exists_cleaned_count = 0
-    error_count = 0
-
-    for original_filepath in glob.glob(webp_pattern):
-        try:
-            # Get the modification time of the file
-            file_mtime = os.path.getmtime(original_filepath)
-
-            if file_mtime < cutoff_cold:
-                # File is old enough to be archived
-                mtime_datetime = datetime.fromtimestamp(file_mtime)
-                date_str = mtime_datetime.strftime("%Y-%m-%d")
-                
-                day_archive_subdir = os.path.join(ARCHIVE_DIR, date_str)
-                try:
-                    os.makedirs(day_archive_subdir, exist_ok=True)
-                except OSError as e:
-                    logger.error(f"Failed to create day archive directory {day_archive_subdir} for {original_filepath}: {e}")
-                    error_count += 1
-                    continue # Skip to next file
-
-                base_filename = os.path.basename(original_filepath)
-                archived_file_path_zst = os.path.join(day_archive_subdir, base_filename + ".zst")
-
-                # Check if the archived file already exists
-                if os.path.exists(archived_file_path_zst):
-                    logger.debug(f"Archived file {archived_file_path_zst} already exists.")
-                    # If original still exists, remove it (it's a duplicate or leftover)
-                    if os.path.exists(original_filepath):
-                        try:
-                            os.remove(original_filepath)
-                            logger.info(f"Removed original file {original_filepath} as its archive already exists.")
-                            already_exists_cleaned_count +=1
-                        except OSError as e:
-                            logger.error(f"Error removing already archived original file {original_filepath}: {e}")
-                            error_count += 1
-                    continue # Move to the next file
-
-                # Archive the file
-                logger.info(f"Archiving {original_filepath} to {archived_file_path_zst}...")
+    # Find all .webp files in the screenshots directory. DirEntry.stat() is cached from
+    # the scan, so each file costs one stat() for both its mtime and its size.
+    webp_files = []
+    to_archive = []
+    try:
+        with os.scandir(screenshots_path) as it:
+            for entry in it:
+                if not entry.name.endswith(".webp") or not entry.is_file():
+                    continue
                 try:
-                    # Initialize Zstd compressor
-                    compressor_context = zstd.ZstdCompressor(level=compression_level)
-                    
-                    with open(original_filepath, 'rb') as f_in, \
-                         open(archived_file_path_zst, 'wb') as f_out:
-                        # Use stream_writer for efficient chunk-by-chunk compression
-                        with compressor_context.stream_writer(f_out, size=os.path.getsize(original_filepath)) as compressor:
-                            while True:
-                                chunk = f_in.read(chunk_size)
-                                if not chunk:
-                                    break
-                                compressor.write(chunk)
-                    
-                    # If compression is successful, remove the original file
-                    os.remove(original_filepath)
-                    logger.info(f"Successfully archived and removed original: {original_filepath}")
-                    archived_count += 1
-
-                except Exception as e: # Catch any error during compression or file removal
-                    logger.error(f"Error during archiving process for {original_filepath} to {archived_file_path_zst}: {e}")
-                    error_count += 1
-                    # Important: If compression failed, do NOT remove original_filepath.
-                    # If archive file was partially created, it might be good to clean it up.
-                    if os.path.exists(archived_file_path_zst):
-                        try:
-                            # Check if the file is empty or very small, indicating partial write
-                            if os.path.getsize(archived_file_path_zst) < chunk_size / 2 : # Heuristic
-                                os.remove(archived_file_path_zst)
-                                logger.warning(f"Removed potentially corrupt/partial archive file: {archived_file_path_zst}")
-                        except OSError as rm_err:
-                             logger.error(f"Failed to remove partial archive {archived_file_path_zst} after error: {rm_err}")
-            # else:
-                # logger.debug(f"File {original_filepath} is not old enough for archiving (mtime: {file_mtime:.0f} vs cutoff: {cutoff_cold:.0f}).")
-
-        except FileNotFoundError:
-            # This can happen if a file is deleted between glob listing and processing
-            logger.warning(f"File not found during archival (possibly deleted concurrently): {original_filepath}")
-            continue
-        except Exception as e:
-            logger.error(f"Unexpected error processing file {original_filepath} for archiving: {e}")
-            error_count += 1
-    
-    logger.info(f"Archiver run finished. Archived: {archived_count} files. Cleaned pre-existing: {already_exists_cleaned_count}. Errors: {error_count}.")
+                    st = entry.stat()
+                except FileNotFoundError:
+                    continue  # Deleted concurrently
+                webp_files.append(entry.path)
+                if st.st_mtime < cutoff_cold:
+                    to_archive.append((entry.path, st.st_mtime, st.st_size))
+    except OSError as e:
+        logger.error(f"Failed to list screenshots directory {screenshots_path}: {e}")
+        return
+    counts = {"archived": 0, "cleaned": 0, "skipped": 0, "error": 0}
+
+    # Every file is compressed with the shared screenshot dictionary (trained from
+    # this run's files the first time enough of them exist).
+    dictionary = get_or_train_dictionary(webp_files)
+    dict_bytes = dictionary.as_bytes() if dictionary is not None else None
+    archive_one = partial(archive_file, archive_dir=ARCHIVE_DIR, chunk_size=chunk_size)
+
+    if len(to_archive) < ARCHIVE_PARALLEL_MIN_FILES:
+        init_worker(compression_level, dict_bytes)
+        for status, _ in map(archive_one, to_archive):
+            counts[status] += 1
+    else:
+        with ProcessPoolExecutor(
+            max_workers=os.cpu_count(),
+            initializer=init_worker,
+            initargs=(compression_level, dict_bytes),
+        ) as executor:
+            for status, _ in executor.map(archive_one, to_archive, chunksize=8):
+                counts[status] += 1
+
+    logger.info(f"Archiver run finished. Archived: {counts['archived']} files. Cleaned pre-existing: {counts['cleaned']}. Errors: {counts['error']}.")
 
 
 # --- Archived Image Retrieval ---
-def get_archived_image_data(filename_webp: str) -> Optional[bytes]:
+def get_archived_image_path(filename_webp: str) -> Optional[str]:
     """
-    Retrieves and decompresses an image from the archive, given its original .webp filename.
+    Resolves the archive location of an image, given its original .webp filename.
     Example filename_webp: "1746552743_0_uuid.webp"
 
     Args:
         filename_webp (str): The original .webp filename of the image.
 
     Returns:
-        Optional[bytes]: The decompressed image data as bytes if found and successfully decompressed,
-                         otherwise None.
+        Optional[str]: The path of the existing .webp.zst archive file, otherwise None.
     """
     if not filename_webp or not filename_webp.endswith(".webp"):
         logger.warning(f"Invalid .webp filename provided for archive retrieval: '{filename_webp}'")
@@ -185,29 +185,111 @@ def get_archived_image_data(filename_webp: str) -> Optional[bytes]:
     # Path construction: ARCHIVE_DIR / YYYY-MM-DD / filename.webp.zst
     potential_archived_filepath = os.path.join(ARCHIVE_DIR, date_str, archived_file_name_zst)
 
-    logger.debug(f"Attempting to retrieve archived image: {potential_archived_filepath}")
-
-    if os.path.exists(potential_archived_filepath):
-        try:
-            decompressor_context = zstd.ZstdDecompressor()
-            with open(potential_archived_filepath, 'rb') as f_in:
-                # Use stream_reader for efficient decompression
-                with decompressor_context.stream_reader(f_in) as reader:
-                    decompressed_data = reader.read()
-            logger.info(f"Successfully decompressed: {potential_archived_filepath}")
-            return decompressed_data
-        except zstd.ZstdError as e: # More specific Zstd errors
-            logger.error(f"Zstandard decompression error for {potential_archived_filepath}: {e}")
-            return None
-        except Exception as e: # Other errors (IOError, etc.)
-            logger.error(f"Error during decompression of {potential_archived_filepath}: {e}")
-            return None
-    else:
+    if not os.path.exists(potential_archived_filepath):
         logger.debug(f"Archived file not found at expected path: {potential_archived_filepath}")
         # Optional: Implement a fallback search if the date derived from filename timestamp is wrong.
         # This would involve globbing ARCHIVE_DIR/*/*.zst, which could be slow.
         # For now, strict path based on filename's timestamp is used.
         return None
+    return potential_archived_filepath
+
+
+def get_archived_image_data(filename_webp: str) -> Optional[bytes]:
+    """
+    Retrieves and decompresses an image from the archive, given its original .webp filename.
+
+    Args:
+        filename_webp (str): The original .webp filename of the image.
+
+    Returns:
+        Optional[bytes]: The decompressed image data as bytes if found and successfully decompressed,
+                         otherwise None.
+    """
+    potential_archived_filepath = get_archived_image_path(filename_webp)
+    if potential_archived_filepath is None:
+        return None
+
+    cached_data = _archive_cache_get(potential_archived_filepath)
+    if cached_data is not None:
+        return cached_data
+
+    logger.debug(f"Attempting to retrieve archived image: {potential_archived_filepath}")
+    try:
+        with open(potential_archived_filepath, 'rb') as f_in:
+            decompressor_context = get_decompressor(f_in.read(18))
+            f_in.seek(0)
+            # Use stream_reader for efficient decompression
+            with decompressor_context.stream_reader(f_in) as reader:
+                decompressed_data = reader.read()
+        logger.info(f"Successfully decompressed: {potential_archived_filepath}")
+        _archive_cache_put(potential_archived_filepath, decompressed_data)
+        return decompressed_data
+    except zstd.ZstdError as e: # More specific Zstd errors
+        logger.error(f"Zstandard decompression error for {potential_archived_filepath}: {e}")
+        return None
+    except Exception as e: # Other errors (IOError, etc.)
+        logger.error(f"Error during decompression of {potential_archived_filepath}: {e}")
+        return None
+
+
+def open_archived_image_stream(archived_filepath: str, chunk_size: int = 65536) -> Optional[Iterator[bytes]]:
+    """
+    Opens an archived image for streaming, so callers can send it without waiting for
+    the whole image to decompress. The file is opened and its frame header decoded
+    up front, so an unreadable archive or a missing/mismatched dictionary is reported
+    before any bytes are produced. Fully streamed images are added to the decompressed
+    image cache; cache hits are yielded whole.
+
+    Args:
+        archived_filepath (str): Path of the .webp.zst file (see get_archived_image_path).
+        chunk_size (int): Maximum number of decompressed bytes per chunk.
+
+    Returns:
+        Optional[Iterator[bytes]]: The decompressed bytes in chunks, or None if the
+                                   archive cannot be opened or decoded.
+    """
+    cached_data = _archive_cache_get(archived_filepath)
+    if cached_data is not None:
+        return iter((cached_data,))
+
+    try:
+        f_in = open(archived_filepath, 'rb')
+    except OSError as e:
+        logger.error(f"Error opening archived image {archived_filepath}: {e}")
+        return None
+    try:
+        header = f_in.read(18)
+        decompressor_context = get_decompressor(header)
+        content_size = zstd.get_frame_parameters(header).content_size
+        f_in.seek(0)
+    except (zstd.ZstdError, OSError) as e:
+        f_in.close()
+        logger.error(f"Error decoding archived image {archived_filepath}: {e}")
+        return None
+    # Only images the cache will accept are collected while streaming; anything else
+    # (or an archive without a recorded size) streams without being held in memory.
+    cacheable = content_size != zstd.CONTENTSIZE_UNKNOWN and content_size <= ARCHIVE_CACHE_MAX_BYTES
+    return _iter_decompressed(f_in, decompressor_context, archived_filepath, chunk_size, cacheable)
+
+
+def _iter_decompressed(f_in, decompressor_context: zstd.ZstdDecompressor, archived_filepath: str,
+                       chunk_size: int, cacheable: bool) -> Iterator[bytes]:
+    """Yields the decompressed contents of the open archive `f_in`, closing it when done."""
+    try:
+        chunks = [] if cacheable else None
+        with f_in, decompressor_context.stream_reader(f_in) as reader:
+            while True:
+                chunk = reader.read(chunk_size)
+                if not chunk:
+                    break
+                if chunks is not None:
+                    chunks.append(chunk)
+                yield chunk
+        if chunks is not None:
+            _archive_cache_put(archived_filepath, b"".join(chunks))
+    except (zstd.ZstdError, OSError) as e:
+        # Headers have already been sent at this point; all we can do is stop the stream.
+        logger.error(f"Error while streaming archived image {archived_filepath}: {e}")
 
 # --- Example Usage (for testing if run directly) ---
 if __name__ == "__main__":
@@ -2,11 +2,6 @@ import os
 import sys
 import argparse
 
-parser = argparse.ArgumentParser(
-    description="Eidon - Personal Digital History Recorder",
-    formatter_class=argparse.ArgumentDefaultsHelpFormatter # Shows default values in help
-)
-
 # --- Storage Configuration ---
 # Determine a sensible default storage path based on OS.
 # This will be used if --storage-path is not provided.
@@ -32,25 +27,36 @@ def get_default_appdata_folder(app_name="eidon"):
 
 DEFAULT_STORAGE_PATH = get_default_appdata_folder()
 
-parser.add_argument(
-    "--storage-path",
-    default=DEFAULT_STORAGE_PATH,
-    help="Root path to store screenshots, database, and archives.",
-)
-
-# --- Capture Behavior Configuration ---
-parser.add_argument(
-    "--idle-time-threshold",
-    type=float,
-    default=10.0, # Default to 10 seconds
-    help="Seconds of user inactivity before screenshot capture pauses.",
-)
-parser.add_argument(
-    "--primary-monitor-only", # This argument was in the original but not used by screenshot.py
-    action="store_true",      # If you intend to use it, screenshot.py needs modification.
-    default=False, # Defaulting to False as current screenshot.py captures all screens.
-    help="Only record the primary monitor (currently captures all monitors).",
-)
+# --- Command-line Arguments ---
+# The parser is only built when the application entry point calls init(); importing
+# config (from workers, tools or tests) just uses the defaults below.
+def _build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description="Eidon - Personal Digital History Recorder",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter # Shows default values in help
+    )
+
+    parser.add_argument(
+        "--storage-path",
+        default=DEFAULT_STORAGE_PATH,
+        help="Root path to store screenshots, database, and archives.",
+    )
+
+    # --- Capture Behavior Configuration ---
+    parser.add_argument(
+        "--idle-time-threshold",
+        type=float,
+        default=10.0, # Default to 10 seconds
+        help="Seconds of user inactivity before screenshot capture pauses.",
+    )
+    parser.add_argument(
+        "--primary-monitor-only", # This argument was in the original but not used by screenshot.py
+        action="store_true",      # If you intend to use it, screenshot.py needs modification.
+        default=False, # Defaulting to False as current screenshot.py captures all screens.
+        help="Only record the primary monitor (currently captures all monitors).",
+    )
+    return parser
+
 
 # --- Image Processing and Similarity ---
 # These are not exposed as command-line args but are configurable constants.
@@ -65,62 +71,86 @@ MIN_HAMMING_DISTANCE = 10     # For perceptual hash (phash). Lower means more si
 MAX_IMAGE_WIDTH = 960      # Max width for saved screenshots (aspect ratio preserved)
 MAX_IMAGE_HEIGHT = 600       # Max height for saved screenshots
 WEBP_QUALITY = 75            # Quality 0-100 for WebP compression (lower is smaller/lower quality)
+WEBP_METHOD = 4              # WebP encoder effort 0-6; 6 is ~3x slower than 4 for a few percent smaller files
+
+# --- OCR Configuration ---
+# Frames can be OCR'd as a grid of tiles, so that only tiles whose pixels differ from
+# every recently seen tile are sent to Vision. Off by default (a 1x1 grid): a frame
+# with no cached tiles then costs one Vision request per tile instead of one, and
+# lines near tile edges are recognized less reliably. Full-width bands keep text lines
+# whole; more than one column would split lines (and words) at tile edges.
+OCR_TILE_ROWS = 1
+OCR_TILE_COLS = 1
+OCR_TILE_OVERLAP = 48  # Pixels adjacent bands share, so a line on a band edge is whole in one of them
+# Frames whose 64-bit perceptual hash is within this many bits of a recently OCR'd
+# frame reuse that frame's text instead of running OCR. 0 disables the check: an
+# 8x8 hash cannot see small text edits, and the capture loop already skips frames
+# that look unchanged, so this is only worth enabling to trade recall for CPU.
+OCR_REUSE_HAMMING_DISTANCE = 0
+
+# --- Search Configuration ---
+QUANTIZE_EMBEDDINGS = True   # Rank search results using int8-quantized embeddings (4x less memory
+                             # traffic than float32 at a negligible accuracy cost).
 
 # --- Archiving Configuration ---
 HOT_DAYS = 1         # Files newer than this remain in the primary 'screenshots' dir.
 COLD_DAYS = 0        # Files older than this are candidates for moving to the archive.
                       # Note: Archiving currently considers files older than COLD_DAYS based on mtime.
 
-# --- Parse Arguments ---
-# Only parse if the script is run directly, not when imported.
-# This allows other modules to import config values without triggering argparse errors
-# if they are imported by a script that doesn't expect these args (e.g., a test script).
-if __name__ == "__main__" or "pytest" not in sys.modules: # Crudely check if not run by pytest
+# --- Set Global Configuration Variables ---
+# Defaults used when config is imported without init() (e.g. by a test script).
+class ArgsDefault:
+    def __init__(self):
+        self.storage_path = DEFAULT_STORAGE_PATH
+        self.idle_time_threshold = 10.0
+        self.primary_monitor_only = True
+
+
+def _apply_args(args) -> None:
+    global IDLE_THRESHOLD, PRIMARY_MONITOR_ONLY, appdata_folder, db_path, screenshots_path, ARCHIVE_DIR
+    IDLE_THRESHOLD = args.idle_time_threshold
+    PRIMARY_MONITOR_ONLY = args.primary_monitor_only # Uncomment if used
+
+    # Define paths based on the (potentially user-provided) storage_path
+    appdata_folder = os.path.abspath(args.storage_path) # Ensure path is absolute
+    db_path = os.path.join(appdata_folder, "eidon.db")
+    screenshots_path = os.path.join(appdata_folder, "screenshots")
+    ARCHIVE_DIR = os.path.join(appdata_folder, "archive")
+
+
+def init(argv=None) -> None:
+    """
+    Parses command-line arguments (sys.argv by default) into the module's settings.
+
+    Must run before other eidon modules are imported, since they copy these values
+    (e.g. `from eidon.config import db_path`) at import time.
+    """
     try:
-        args = parser.parse_args()
+        args = _build_parser().parse_args(argv)
     except SystemExit as e:
         # This can happen if --help is passed or an error occurs in parsing.
         # Allow the program to exit cleanly.
         if e.code != 0: # If it's an error code, print message
              print(f"Argument parsing error: {e}", file=sys.stderr)
         sys.exit(e.code)
-else:
-    # If imported, provide default values or handle as needed.
-    # For simplicity, creating a Namespace with defaults.
-    # This ensures that config values are available even if app.py (or another main) isn't the entry point.
-    class ArgsDefault:
-        def __init__(self):
-            self.storage_path = DEFAULT_STORAGE_PATH
-            self.idle_time_threshold = 10.0
-            self.primary_monitor_only = True
-    args = ArgsDefault()
+    _apply_args(args)
 
 
-# --- Set Global Configuration Variables ---
-IDLE_THRESHOLD = args.idle_time_threshold
-PRIMARY_MONITOR_ONLY = args.primary_monitor_only # Uncomment if used
+_apply_args(ArgsDefault())
 
-# Define paths based on the (potentially user-provided) storage_path
-appdata_folder = os.path.abspath(args.storage_path) # Ensure path is absolute
-db_path = os.path.join(appdata_folder, "eidon.db")
-screenshots_path = os.path.join(appdata_folder, "screenshots")
-ARCHIVE_DIR = os.path.join(appdata_folder, "archive")
 
 # --- Create Directories if they don't exist ---
-# This should ideally be done once when the application starts,
-# for example, in app.py before starting threads.
-# However, having it here ensures paths are valid if config.py is imported early.
+# Called once by app.py at startup (not at import time, so importing config has no
+# filesystem side effects). makedirs(exist_ok=True) handles existing directories
+# itself, so no separate exists() check is needed.
 def ensure_dirs_exist():
     paths_to_create = [appdata_folder, screenshots_path, ARCHIVE_DIR]
     for path_to_create in paths_to_create:
-        if not os.path.exists(path_to_create):
-            try:
-                os.makedirs(path_to_create, exist_ok=True)
-                # print(f"INFO: Created directory: {path_to_create}")
-            except OSError as e:
-                print(f"ERROR: Could not create directory {path_to_create}: {e}", file=sys.stderr)
-                # Depending on severity, you might want to sys.exit() here
-ensure_dirs_exist()
+        try:
+            os.makedirs(path_to_create, exist_ok=True)
+        except OSError as e:
+            print(f"ERROR: Could not create directory {path_to_create}: {e}", file=sys.stderr)
+            # Depending on severity, you might want to sys.exit() here
 
 
 # --- Sanity Check Print (optional, for debugging) ---
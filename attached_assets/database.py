@@ -1,14 +1,286 @@
+import queue
+import re
 import sqlite3
+import threading
 from collections import namedtuple
+from contextlib import contextmanager
 import numpy as np
-from typing import Any, List, Optional, Tuple
+from datetime import date as dt_date, datetime, time as dt_time, timedelta
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
 
-from eidon.config import db_path
+from eidon.config import db_path, QUANTIZE_EMBEDDINGS
+from eidon.quantize import quantize_int8
+from eidon.vector_index import add_embedding as add_to_vector_index
 
 # Define the structure of a database entry using namedtuple
 Entry = namedtuple("Entry", ["id", "app", "title", "text", "timestamp", "embedding", "filename", "page_url"])
 
 
+# --- NumPy BLOB Binding ---
+# Embedding arrays are bound directly as BLOBs: sqlite3 reads the array's own
+# buffer through a memoryview instead of a fresh bytes copy from .tobytes().
+def _adapt_ndarray(array: np.ndarray) -> memoryview:
+    """Exposes an array's contiguous buffer as bytes for binding as a BLOB."""
+    return memoryview(np.ascontiguousarray(array)).cast("B")
+
+
+sqlite3.register_adapter(np.ndarray, _adapt_ndarray)
+
+# --- In-memory Embedding Matrix Cache ---
+# /search ranks entries by cosine similarity. Rather than scoring each entry's
+# embedding one by one, we keep every stored embedding in a single contiguous
+# (N, D) float32 matrix so ranking becomes one matrix-vector product. Embeddings
+# are L2-normalized when written, so rows are used as-is.
+# The cache is built lazily on first use and appended to by insert_entry().
+# With QUANTIZE_EMBEDDINGS the rows are stored as int8 with a per-row scale.
+_emb_lock = threading.Lock()
+_emb_row_by_id: Dict[int, int] = {}  # entry id -> row index in _emb_buffer
+_emb_buffer: Optional[np.ndarray] = None  # Over-allocated backing store; rows [0, _emb_count) are valid
+_emb_scales: Optional[np.ndarray] = None  # Per-row int8 dequantization scales (quantized mode only)
+_emb_count = 0
+_emb_loaded = False  # Set once the cache has been populated from the database
+
+
+def _normalize_embedding(embedding: np.ndarray) -> np.ndarray:
+    """Returns a float32 L2-normalized copy of the embedding (zero vectors stay zero)."""
+    vec = np.asarray(embedding, dtype=np.float32)
+    return vec / (np.sqrt(vec.dot(vec)) + 1e-12)
+
+
+def _append_to_embedding_cache(entry_id: int, embedding: np.ndarray) -> None:
+    """Adds one embedding to the matrix cache. Caller must hold _emb_lock."""
+    global _emb_buffer, _emb_scales, _emb_count
+    if embedding.size == 0:
+        return
+    row_dtype = np.int8 if QUANTIZE_EMBEDDINGS else np.float32
+    if _emb_buffer is None:
+        _emb_buffer = np.empty((64, embedding.size), dtype=row_dtype)
+        _emb_scales = np.empty(64, dtype=np.float32)
+    elif embedding.size != _emb_buffer.shape[1]:
+        # Embedding model dimension changed; such rows cannot share the matrix.
+        return
+    if _emb_count == _emb_buffer.shape[0]:
+        # Grow geometrically so appends stay amortized O(D). Readers holding a view
+        # of the old buffer are unaffected.
+        grown = np.empty((_emb_buffer.shape[0] * 2, _emb_buffer.shape[1]), dtype=row_dtype)
+        grown[:_emb_count] = _emb_buffer[:_emb_count]
+        _emb_buffer = grown
+        grown_scales = np.empty(grown.shape[0], dtype=np.float32)
+        grown_scales[:_emb_count] = _emb_scales[:_emb_count]
+        _emb_scales = grown_scales
+    if QUANTIZE_EMBEDDINGS:
+        _emb_buffer[_emb_count], _emb_scales[_emb_count] = quantize_int8(embedding)
+    else:
+        _emb_buffer[_emb_count] = embedding
+    _emb_row_by_id[entry_id] = _emb_count
+    _emb_count += 1
+
+
+def get_embedding_matrix(entry_ids: List[int]) -> Tuple[np.ndarray, np.ndarray, Optional[np.ndarray]]:
+    """
+    Returns the cached embedding matrix used for similarity ranking, and the rows of
+    the given entries in it. The id lookups happen under the cache lock, so they match
+    the returned matrix and cost O(len(entry_ids)) rather than a copy of the whole map.
+
+    Args:
+        entry_ids: The entries to look up (e.g. search candidates).
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray, Optional[np.ndarray]]: For each entry id, its row
+            index (intp), or -1 if it has no usable embedding; an (N, D) matrix whose rows
+            are the L2-normalized embeddings (int8 if QUANTIZE_EMBEDDINGS, else float32);
+            and the per-row int8 scales (None when not quantized). The matrix is empty
+            (shape (0, 0)) if no embeddings are stored.
+    """
+    global _emb_loaded, _emb_buffer, _emb_scales, _emb_count
+    with _emb_lock:
+        if not _emb_loaded:
+            if QUANTIZE_EMBEDDINGS:
+                # Stored int8 rows are loaded as-is: a quarter of the bytes, no quantizing.
+                ids, matrix, scales = get_all_quantized_embeddings()
+            else:
+                ids, _, matrix = get_all_embeddings_matrix()
+            if ids.size > 0:
+                # Bulk-load, leaving headroom so the next inserts do not immediately regrow.
+                capacity = max(64, ids.size * 2)
+                _emb_buffer = np.empty((capacity, matrix.shape[1]), dtype=matrix.dtype)
+                _emb_scales = np.empty(capacity, dtype=np.float32)
+                _emb_buffer[:ids.size] = matrix
+                if QUANTIZE_EMBEDDINGS:
+                    _emb_scales[:ids.size] = scales
+                _emb_row_by_id.update(zip(ids.tolist(), range(ids.size)))
+                _emb_count = int(ids.size)
+            _emb_loaded = True
+        rows = np.fromiter((_emb_row_by_id.get(entry_id, -1) for entry_id in entry_ids), dtype=np.intp, count=len(entry_ids))
+        if _emb_buffer is None:
+            return rows, np.empty((0, 0), dtype=np.float32), None
+        scales = _emb_scales[:_emb_count] if QUANTIZE_EMBEDDINGS else None
+        return rows, _emb_buffer[:_emb_count], scales
+
+
+def get_all_embeddings_matrix() -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Loads every stored embedding into one contiguous matrix, newest entry first.
+
+    Only embeddings with the dimension of the newest stored embedding are included
+    (rows from an earlier embedding model cannot share the matrix), and zero-norm
+    embeddings (entries without text) are skipped since they cannot be ranked. Stored embeddings
+    are L2-normalized, so similarity against the rows is a single `M @ q`.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray, np.ndarray]: (ids int64 (N,), timestamps int64 (N,),
+            embeddings float32 (N, D)). All empty if no embeddings are stored or an error occurs.
+    """
+    empty = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty((0, 0), dtype=np.float32))
+    try:
+        with _read_conn() as conn:
+            row = conn.execute(
+                "SELECT length(embedding) FROM entries WHERE length(embedding) > 0 AND norm > 0 ORDER BY timestamp DESC LIMIT 1"
+            ).fetchone()
+            if row is None:
+                return empty
+            blob_len = row[0]
+            rows = conn.execute(
+                "SELECT id, timestamp, embedding FROM entries WHERE length(embedding) = ? AND norm > 0 ORDER BY timestamp DESC",
+                (blob_len,)
+            ).fetchall()
+    except sqlite3.Error as e:
+        print(f"Database error while loading embeddings: {e}")
+        return empty
+    n = len(rows)
+    ids = np.fromiter((r[0] for r in rows), dtype=np.int64, count=n)
+    timestamps = np.fromiter((r[1] for r in rows), dtype=np.int64, count=n)
+    # One buffer for all rows instead of one small array per entry.
+    matrix = np.frombuffer(b"".join(r[2] for r in rows), dtype=np.float32).reshape(n, blob_len // 4)
+    return ids, timestamps, matrix
+
+
+def get_all_quantized_embeddings() -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Loads every stored int8-quantized embedding into one contiguous matrix, newest
+    entry first, with the same row selection as get_all_embeddings_matrix().
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray, np.ndarray]: (ids int64 (N,), embeddings int8 (N, D),
+            scales float32 (N,)), where row i ≈ embeddings[i] * scales[i]. All empty if no
+            embeddings are stored or an error occurs.
+    """
+    empty = (np.empty(0, dtype=np.int64), np.empty((0, 0), dtype=np.int8), np.empty(0, dtype=np.float32))
+    try:
+        with _read_conn() as conn:
+            row = conn.execute(
+                "SELECT length(embedding_i8) FROM entries WHERE embedding_scale > 0 ORDER BY timestamp DESC LIMIT 1"
+            ).fetchone()
+            if row is None:
+                return empty
+            dim = row[0]
+            rows = conn.execute(
+                "SELECT id, embedding_scale, embedding_i8 FROM entries"
+                " WHERE length(embedding_i8) = ? AND embedding_scale > 0 ORDER BY timestamp DESC",
+                (dim,)
+            ).fetchall()
+    except sqlite3.Error as e:
+        print(f"Database error while loading quantized embeddings: {e}")
+        return empty
+    n = len(rows)
+    ids = np.fromiter((r[0] for r in rows), dtype=np.int64, count=n)
+    scales = np.fromiter((r[1] for r in rows), dtype=np.float32, count=n)
+    matrix = np.frombuffer(b"".join(r[2] for r in rows), dtype=np.int8).reshape(n, dim)
+    return ids, matrix, scales
+
+
+# --- Persistent Write Connection ---
+# Captures insert rows continuously. Opening a connection and fsync-ing a rollback
+# journal per row dominates that cost, so all writes share one connection in WAL
+# mode (readers are not blocked by the writer) with synchronous=NORMAL, which only
+# syncs at checkpoints. The connection is shared across threads under _write_lock.
+_write_lock = threading.Lock()
+_write_conn: Optional[sqlite3.Connection] = None
+
+MMAP_SIZE = 256 * 1024 * 1024  # Bytes of the database file read through a memory map
+
+
+def _configure(conn: sqlite3.Connection) -> None:
+    """
+    Applies the per-connection pragmas. journal_mode=WAL is persistent in the database
+    file (set by create_db()); these are not and must be set on every connection.
+    """
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA cache_size=-20000")  # ~20 MB page cache
+    # Reads of mapped pages come straight from the OS page cache, without a copy
+    # into SQLite's own page cache.
+    conn.execute(f"PRAGMA mmap_size={MMAP_SIZE}")
+
+
+def _get_write_conn() -> sqlite3.Connection:
+    """Returns the shared write connection, opening it on first use. Caller must hold _write_lock."""
+    global _write_conn
+    if _write_conn is None:
+        conn = sqlite3.connect(db_path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")  # No-op once create_db() has set it
+        _configure(conn)
+        _write_conn = conn
+    return _write_conn
+
+
+# --- Pooled Read Connections ---
+# The timeline and search read on every request. Reads borrow an open connection from
+# a small pool (WAL lets readers run alongside the writer), so they skip the file open,
+# pragmas, schema parse and page-cache warm-up, and reuse the connection's statement
+# cache for the fixed queries below. The pool is shared rather than per thread, since
+# the threaded dev server runs each request on a new thread.
+READ_POOL_SIZE = 4  # Idle read connections kept open; busier moments open (and close) extras
+_read_pool: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue(maxsize=READ_POOL_SIZE)
+
+ENTRY_PAGE_SIZE = 500  # Rows fetched per query by iter_entries()
+_MAX_TIMESTAMP = 2**63 - 1  # Largest SQLite INTEGER; keyset start when paging from the newest entry
+
+_SELECT_ENTRIES_PAGE_SQL = (
+    "SELECT id, app, title, text, timestamp, embedding, filename, page_url FROM entries "
+    "WHERE timestamp < ? ORDER BY timestamp DESC LIMIT ?"
+)
+_SELECT_TIMESTAMPS_SQL = "SELECT timestamp FROM entries ORDER BY timestamp DESC"
+_SELECT_ENTRY_BY_TIMESTAMP_SQL = "SELECT id, app, title, text, timestamp, embedding, filename, page_url FROM entries WHERE timestamp = ?"
+
+
+_URL_STRIP_RE = re.compile(r'^https?://(?:www\.)?')
+
+
+def _url_domain(page_url: Optional[str]) -> str:
+    """Returns the lowercase host of a page URL without scheme or leading 'www.'."""
+    raw_url = page_url.lower() if page_url else ""
+    return _URL_STRIP_RE.sub('', raw_url).split('/')[0]
+
+
+@contextmanager
+def _read_conn() -> Iterator[sqlite3.Connection]:
+    """Lends a pooled read connection for the duration of the with block."""
+    try:
+        conn = _read_pool.get_nowait()
+    except queue.Empty:
+        conn = sqlite3.connect(db_path, check_same_thread=False)
+        conn.row_factory = sqlite3.Row  # Return rows as dictionary-like objects
+        _configure(conn)
+        # url: filters match the host, which SQL alone cannot extract from a URL
+        conn.create_function("url_domain", 1, _url_domain, deterministic=True)
+    try:
+        with conn: # Ends the (read) transaction
+            yield conn
+    finally:
+        try:
+            _read_pool.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+
+# Bumped whenever create_db() gains a column, index or data migration.
+# 1: embeddings stored L2-normalized. 2: int8-quantized embedding columns.
+# 3: idx_timestamp replaced by idx_app_ts. 4: missing embeddings stored as NULL.
+SCHEMA_VERSION = 4
+
+
 def create_db() -> None:
     """
     Creates the SQLite database and the 'entries' table if they don't exist.
@@ -19,6 +291,15 @@ def create_db() -> None:
     try:
         with sqlite3.connect(db_path) as conn:
             cursor = conn.cursor()
+            # WAL is recorded in the database file, so every later connection uses it.
+            cursor.execute("PRAGMA journal_mode=WAL")
+            # A database already at SCHEMA_VERSION has every table, column, index and
+            # migration below; skip the probing entirely.
+            cursor.execute("PRAGMA user_version")
+            schema_version = cursor.fetchone()[0]
+            if schema_version >= SCHEMA_VERSION:
+                return
+
             # Create table with all columns, including filename and page_url from the start.
             # UNIQUE constraint on timestamp ensures no duplicate entries for the same second.
             cursor.execute("""
@@ -30,12 +311,16 @@ def create_db() -> None:
                     timestamp INTEGER UNIQUE,
                     embedding BLOB,
                     filename TEXT,
-                    page_url TEXT
+                    page_url TEXT,
+                    norm REAL,
+                    embedding_i8 BLOB,
+                    embedding_scale REAL
                 )
             """)
-            # Add index on timestamp for faster lookups (idempotent, won't error if exists)
+            # The UNIQUE constraint already gives timestamp lookups and ordering an index of
+            # their own; idx_app_ts serves per-app scans in time order.
             cursor.execute(
-                "CREATE INDEX IF NOT EXISTS idx_timestamp ON entries (timestamp)"
+                "CREATE INDEX IF NOT EXISTS idx_app_ts ON entries (app, timestamp DESC)"
             )
 
             # --- Column Alteration Logic (for upgrading older schemas) ---
@@ -63,52 +348,385 @@ def create_db() -> None:
                     print("INFO: Added 'page_url' column to database.")
                 except sqlite3.OperationalError as e:
                     print(f"Warning: Tried to add 'page_url' column but failed (might already exist): {e}")
+
+            # Check and add norm column (L2 norm of the embedding as produced) if not present
+            if "norm" not in columns:
+                try:
+                    cursor.execute("ALTER TABLE entries ADD COLUMN norm REAL")
+                    print("INFO: Added 'norm' column to database.")
+                    _backfill_norms(cursor)
+                except sqlite3.OperationalError as e:
+                    print(f"Warning: Tried to add 'norm' column but failed (might already exist): {e}")
+
+            # Check and add int8-quantized embedding columns if not present (populated below)
+            for column_name, column_type in (("embedding_i8", "BLOB"), ("embedding_scale", "REAL")):
+                if column_name not in columns:
+                    try:
+                        cursor.execute(f"ALTER TABLE entries ADD COLUMN {column_name} {column_type}")
+                        print(f"INFO: Added '{column_name}' column to database.")
+                    except sqlite3.OperationalError as e:
+                        print(f"Warning: Tried to add '{column_name}' column but failed (might already exist): {e}")
+
+            # Full-text index over the (now complete) set of searchable columns
+            _create_fts_index(cursor)
+
+            # One-off: L2-normalize embeddings stored before they were normalized on insert
+            if schema_version < 1:
+                _normalize_stored_embeddings(cursor)
+            # One-off: store int8-quantized copies of the (normalized) embeddings
+            if schema_version < 2:
+                _quantize_stored_embeddings(cursor)
+            # One-off: drop the plain timestamp index, which duplicated the UNIQUE
+            # constraint's implicit index and doubled index writes per insert
+            if schema_version < 3:
+                cursor.execute("DROP INDEX IF EXISTS idx_timestamp")
+            # One-off: empty embeddings were stored as zero-length BLOBs; use NULL instead
+            if schema_version < 4:
+                cursor.execute("UPDATE entries SET embedding = NULL WHERE length(embedding) = 0")
+
+            cursor.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
             
             conn.commit()
     except sqlite3.Error as e:
         print(f"Database error during table creation or alteration: {e}")
 
 
-def get_all_entries() -> List[Entry]:
+# --- Full-Text Search Index ---
+# entries_fts is an FTS5 inverted index over the searchable columns of `entries`.
+# It is an external-content table (it stores no copy of the text) kept in sync by
+# triggers, so search can resolve query tokens in SQLite instead of scanning every
+# row in Python. Its token -> rowid postings are exactly what a hand-maintained
+# tokens(token, entry_id) table would hold, with BM25 ranking on top, so no
+# separate token table is kept. SQLite builds without FTS5 fall back to LIKE matching.
+_fts_available: Optional[bool] = None  # None until checked
+
+
+def _create_fts_index(cursor: sqlite3.Cursor) -> None:
+    """Creates entries_fts and its sync triggers, populating it from existing rows on first creation."""
+    global _fts_available
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'entries_fts'")
+    already_exists = cursor.fetchone() is not None
+    try:
+        cursor.execute("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS entries_fts USING fts5(
+                text, app, title, page_url,
+                content='entries', content_rowid='id',
+                tokenize='unicode61 remove_diacritics 2'
+            )
+        """)
+    except sqlite3.OperationalError as e:
+        print(f"Warning: SQLite FTS5 unavailable, search will use slower LIKE matching: {e}")
+        _fts_available = False
+        return
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS entries_fts_ai AFTER INSERT ON entries BEGIN
+            INSERT INTO entries_fts(rowid, text, app, title, page_url)
+            VALUES (new.id, new.text, new.app, new.title, new.page_url);
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS entries_fts_ad AFTER DELETE ON entries BEGIN
+            INSERT INTO entries_fts(entries_fts, rowid, text, app, title, page_url)
+            VALUES ('delete', old.id, old.text, old.app, old.title, old.page_url);
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS entries_fts_au AFTER UPDATE OF text, app, title, page_url ON entries BEGIN
+            INSERT INTO entries_fts(entries_fts, rowid, text, app, title, page_url)
+            VALUES ('delete', old.id, old.text, old.app, old.title, old.page_url);
+            INSERT INTO entries_fts(rowid, text, app, title, page_url)
+            VALUES (new.id, new.text, new.app, new.title, new.page_url);
+        END
+    """)
+    if not already_exists:
+        cursor.execute("INSERT INTO entries_fts(entries_fts) VALUES ('rebuild')")
+        print("INFO: Built full-text search index 'entries_fts'.")
+    _fts_available = True
+
+
+def _backfill_norms(cursor: sqlite3.Cursor) -> None:
+    """Populates the norm column for rows written before it existed."""
+    cursor.execute("SELECT id, embedding FROM entries WHERE norm IS NULL")
+    updates = [
+        (float(np.linalg.norm(np.frombuffer(blob, dtype=np.float32))) if blob else 0.0, entry_id)
+        for entry_id, blob in cursor.fetchall()
+    ]
+    if updates:
+        cursor.executemany("UPDATE entries SET norm = ? WHERE id = ?", updates)
+        print(f"INFO: Populated 'norm' for {len(updates)} entries.")
+
+
+def _normalize_stored_embeddings(cursor: sqlite3.Cursor) -> None:
+    """Rewrites every stored embedding as its L2-normalized float32 form."""
+    cursor.execute("SELECT id, embedding FROM entries WHERE length(embedding) > 0")
+    updates = [
+        (_normalize_embedding(np.frombuffer(blob, dtype=np.float32)), entry_id)
+        for entry_id, blob in cursor.fetchall()
+    ]
+    if updates:
+        cursor.executemany("UPDATE entries SET embedding = ? WHERE id = ?", updates)
+        print(f"INFO: Normalized {len(updates)} stored embeddings.")
+
+
+def _quantize_stored_embeddings(cursor: sqlite3.Cursor) -> None:
+    """Populates embedding_i8/embedding_scale from every stored float32 embedding."""
+    cursor.execute("SELECT id, embedding FROM entries WHERE length(embedding) > 0")
+    updates = []
+    for entry_id, blob in cursor.fetchall():
+        quantized, scale = quantize_int8(np.frombuffer(blob, dtype=np.float32))
+        updates.append((quantized, scale, entry_id))
+    if updates:
+        cursor.executemany("UPDATE entries SET embedding_i8 = ?, embedding_scale = ? WHERE id = ?", updates)
+        print(f"INFO: Quantized {len(updates)} stored embeddings.")
+
+
+def _has_fts(conn: sqlite3.Connection) -> bool:
+    """Returns whether the entries_fts index exists (checked once per process)."""
+    global _fts_available
+    if _fts_available is None:
+        row = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'entries_fts'").fetchone()
+        _fts_available = row is not None
+    return _fts_available
+
+
+def _escape_like(value: str) -> str:
+    """Escapes LIKE wildcards so `value` matches literally (use with ESCAPE '\\')."""
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+# Searchable text of an entry for the LIKE fallback (same columns as entries_fts)
+_LIKE_SEARCH_TEXT = (
+    "(coalesce(e.text, '') || ' ' || coalesce(e.app, '') || ' ' || "
+    "coalesce(e.title, '') || ' ' || coalesce(e.page_url, ''))"
+)
+
+
+# Shared read-only embedding for entries without one (stored as NULL)
+_EMPTY_EMBEDDING = np.array([], dtype=np.float32)
+_EMPTY_EMBEDDING.setflags(write=False)
+
+
+def _row_to_entry(row: sqlite3.Row) -> Entry:
+    embedding_val = row["embedding"]
+    embedding = _EMPTY_EMBEDDING if embedding_val is None else np.frombuffer(embedding_val, dtype=np.float32)
+    return Entry(
+        id=row["id"],
+        app=row["app"],
+        title=row["title"],
+        text=row["text"],
+        timestamp=row["timestamp"],
+        embedding=embedding,
+        filename=row["filename"],
+        page_url=row["page_url"],
+    )
+
+
+def _entry_query_sql(
+    conn: sqlite3.Connection,
+    columns: str,
+    date: Optional[dt_date],
+    time_range: Optional[Union[dt_time, Tuple[dt_time, dt_time]]],
+    title_substr: Optional[str],
+    url_domain_substr: Optional[str],
+    tokens: Optional[Iterable[str]],
+    limit: Optional[int],
+) -> Tuple[str, List[Any]]:
+    """Builds the SELECT of `columns` (over entries aliased `e`) for query_entries() and query_entry_ids()."""
+    where: List[str] = []
+    params: List[Any] = []
+    if date is not None:
+        # A plain timestamp range (rather than date() on every row) can use the timestamp UNIQUE index.
+        day_start = datetime.combine(date, dt_time.min)
+        where.append("e.timestamp >= ? AND e.timestamp < ?")
+        params.extend((int(day_start.timestamp()), int((day_start + timedelta(days=1)).timestamp())))
+    if time_range is not None:
+        if isinstance(time_range, tuple):
+            where.append("time(e.timestamp, 'unixepoch', 'localtime') BETWEEN ? AND ?")
+            params.extend(t.strftime("%H:%M:%S") for t in time_range)
+        else:
+            where.append("strftime('%H:%M', e.timestamp, 'unixepoch', 'localtime') = ?")
+            params.append(time_range.strftime("%H:%M"))
+    if title_substr:
+        where.append("e.title LIKE ? ESCAPE '\\'")
+        params.append(f"%{_escape_like(title_substr)}%")
+    if url_domain_substr:
+        # Matched in SQL so that a LIMIT applies to the domain-filtered rows
+        where.append("instr(url_domain(e.page_url), ?) > 0")
+        params.append(url_domain_substr)
+
+    token_list = [t for t in (tokens or ()) if t]
+    sql = f"SELECT {columns} FROM entries e"
+    order_by = "e.timestamp DESC"
+    if token_list:
+        if _has_fts(conn):
+            # Each token quoted as an FTS5 string; adjacent strings are AND-ed.
+            sql += " JOIN entries_fts ON entries_fts.rowid = e.id"
+            where.insert(0, "entries_fts MATCH ?")
+            params.insert(0, " ".join('"' + t.replace('"', '""') + '"' for t in token_list))
+            order_by = "bm25(entries_fts)"
+        else:
+            # No FTS5: match each token against the searchable columns. SQLite's
+            # LIKE is already case-insensitive for ASCII.
+            for token in token_list:
+                where.append(f"{_LIKE_SEARCH_TEXT} LIKE ? ESCAPE '\\'")
+                params.append(f"%{_escape_like(token)}%")
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += f" ORDER BY {order_by}"
+    if limit is not None:
+        sql += " LIMIT ?"
+        params.append(limit)
+    return sql, params
+
+
+def query_entries(
+    date: Optional[dt_date] = None,
+    time_range: Optional[Union[dt_time, Tuple[dt_time, dt_time]]] = None,
+    title_substr: Optional[str] = None,
+    url_domain_substr: Optional[str] = None,
+    tokens: Optional[Iterable[str]] = None,
+    limit: Optional[int] = None,
+    with_embeddings: bool = True,
+) -> List[Entry]:
     """
-    Retrieves all entries from the database.
+    Retrieves the entries matching all of the given filters, evaluated by SQLite.
+
+    Args:
+        date (Optional[date]): Only entries captured on this local date.
+        time_range (Optional[Union[time, Tuple[time, time]]]): Only entries captured within
+            this inclusive local time-of-day range, or in this exact minute if a single time.
+        title_substr (Optional[str]): Case-insensitive substring of the window title.
+        url_domain_substr (Optional[str]): Lowercase substring of the page URL's host
+            (without scheme or leading 'www.').
+        tokens (Optional[Iterable[str]]): Word tokens that must all occur in the entry's
+            text, app, title or URL.
+        limit (Optional[int]): Maximum number of entries to return.
+        with_embeddings (bool): Whether to load embedding blobs. If False, every returned
+            entry has an empty embedding, which saves decoding N x D floats that callers
+            ranking via get_embedding_matrix() never use.
 
     Returns:
-        List[Entry]: A list of all entries as Entry namedtuples.
-                     Returns an empty list if the table is empty or an error occurs.
+        List[Entry]: Matching entries, best BM25 match first when tokens are resolved
+            through the full-text index, otherwise newest first. Empty if none match
+            or an error occurs.
     """
     entries: List[Entry] = []
+    embedding_column = "e.embedding" if with_embeddings else "NULL AS embedding"
+    columns = f"e.id, e.app, e.title, e.text, e.timestamp, {embedding_column}, e.filename, e.page_url"
     try:
-        with sqlite3.connect(db_path) as conn:
-            conn.row_factory = sqlite3.Row  # Return rows as dictionary-like objects
-            cursor = conn.cursor()
-            cursor.execute("SELECT id, app, title, text, timestamp, embedding, filename, page_url FROM entries ORDER BY timestamp DESC")
-            results = cursor.fetchall()
-            for row in results:
-                embedding_val = row["embedding"]
-                # Handle NULL or empty embeddings gracefully
-                if embedding_val and len(embedding_val) > 0:
-                    embedding = np.frombuffer(embedding_val, dtype=np.float32)
-                else:
-                    embedding = np.array([], dtype=np.float32) # Ensure consistent empty array type
-                
-                entries.append(
-                    Entry(
-                        id=row["id"],
-                        app=row["app"],
-                        title=row["title"],
-                        text=row["text"],
-                        timestamp=row["timestamp"],
-                        embedding=embedding,
-                        filename=row["filename"],
-                        page_url=row["page_url"],
-                    )
-                )
+        with _read_conn() as conn:
+            sql, params = _entry_query_sql(conn, columns, date, time_range, title_substr, url_domain_substr, tokens, limit)
+            entries = [_row_to_entry(row) for row in conn.execute(sql, params)]
     except sqlite3.Error as e:
-        print(f"Database error while fetching all entries: {e}")
+        print(f"Database error while querying entries: {e}")
     return entries
 
 
+def query_entry_ids(
+    date: Optional[dt_date] = None,
+    time_range: Optional[Union[dt_time, Tuple[dt_time, dt_time]]] = None,
+    title_substr: Optional[str] = None,
+    url_domain_substr: Optional[str] = None,
+    tokens: Optional[Iterable[str]] = None,
+    limit: Optional[int] = None,
+) -> List[int]:
+    """
+    Like query_entries(), but returns only the ids of the matching entries (in the same
+    order), so every match can be counted or ranked without reading its row.
+    """
+    ids: List[int] = []
+    try:
+        with _read_conn() as conn:
+            sql, params = _entry_query_sql(conn, "e.id", date, time_range, title_substr, url_domain_substr, tokens, limit)
+            ids = [row[0] for row in conn.execute(sql, params)]
+    except sqlite3.Error as e:
+        print(f"Database error while querying entry ids: {e}")
+    return ids
+
+
+_IDS_PER_QUERY = 500  # Bound parameters per IN (...) query, well under SQLite's limit
+
+
+def get_entries_by_ids(entry_ids: List[int], with_embeddings: bool = True) -> List[Entry]:
+    """
+    Retrieves the entries with the given ids, in the order given.
+
+    Args:
+        entry_ids (List[int]): The ids to fetch. Ids without an entry are skipped.
+        with_embeddings (bool): Whether to load embedding blobs (see query_entries()).
+
+    Returns:
+        List[Entry]: The entries found. Empty if none exist or an error occurs.
+    """
+    embedding_column = "embedding" if with_embeddings else "NULL AS embedding"
+    by_id: Dict[int, Entry] = {}
+    try:
+        with _read_conn() as conn:
+            for start in range(0, len(entry_ids), _IDS_PER_QUERY):
+                batch = entry_ids[start:start + _IDS_PER_QUERY]
+                sql = (f"SELECT id, app, title, text, timestamp, {embedding_column}, filename, page_url FROM entries "
+                       f"WHERE id IN ({','.join('?' * len(batch))})")
+                for row in conn.execute(sql, batch):
+                    by_id[row["id"]] = _row_to_entry(row)
+    except sqlite3.Error as e:
+        print(f"Database error while fetching entries by id: {e}")
+        return []
+    return [by_id[entry_id] for entry_id in entry_ids if entry_id in by_id]
+
+
+def iter_entries(before_ts: Optional[int] = None, page_size: int = ENTRY_PAGE_SIZE) -> Iterator[Entry]:
+    """
+    Yields entries newest first, fetched a page at a time.
+
+    Uses keyset pagination on the timestamp index (`timestamp < last seen`), so each
+    page is an index seek and only one page of rows and embedding BLOBs is held in
+    memory at once, however many entries exist.
+
+    Args:
+        before_ts (Optional[int]): Only yield entries strictly older than this timestamp.
+        page_size (int): Number of rows fetched per query.
+
+    Yields:
+        Entry: Each entry as an Entry namedtuple. Iteration stops early if an error occurs.
+    """
+    cursor_ts = before_ts if before_ts is not None else _MAX_TIMESTAMP
+    while True:
+        try:
+            with _read_conn() as conn:
+                rows = conn.execute(_SELECT_ENTRIES_PAGE_SQL, (cursor_ts, page_size)).fetchall()
+        except sqlite3.Error as e:
+            print(f"Database error while fetching entries: {e}")
+            return
+        for row in rows:
+            yield _row_to_entry(row)
+        if len(rows) < page_size:
+            return
+        cursor_ts = rows[-1]["timestamp"]
+
+
+def get_all_entries() -> Iterator[Entry]:
+    """
+    Retrieves all entries from the database, newest first.
+
+    Returns:
+        Iterator[Entry]: A lazy iterator over all entries as Entry namedtuples
+                         (see iter_entries()). Empty if the table is empty or an error occurs.
+    """
+    return iter_entries()
+
+
+def get_recent_entries(n: int) -> List[Entry]:
+    """
+    Retrieves the `n` newest entries.
+
+    Returns:
+        List[Entry]: Up to `n` entries, newest first. Empty if none exist or an error occurs.
+    """
+    if n <= 0:
+        return []
+    return list(islice(iter_entries(page_size=n), n))
+
+
 def get_timestamps() -> List[int]:
     """
     Retrieves all timestamps from the database, ordered descending.
@@ -119,10 +737,10 @@ def get_timestamps() -> List[int]:
     """
     timestamps: List[int] = []
     try:
-        with sqlite3.connect(db_path) as conn:
+        with _read_conn() as conn:
             cursor = conn.cursor()
             # Use the index for potentially faster retrieval
-            cursor.execute("SELECT timestamp FROM entries ORDER BY timestamp DESC")
+            cursor.execute(_SELECT_TIMESTAMPS_SQL)
             results = cursor.fetchall()
             timestamps = [result[0] for result in results]
     except sqlite3.Error as e:
@@ -130,6 +748,143 @@ def get_timestamps() -> List[int]:
     return timestamps
 
 
+def _prepare_entry_rows(
+    rows: List[Tuple[str, int, np.ndarray, str, str, str, Optional[str]]]
+) -> List[Tuple[np.ndarray, float, tuple]]:
+    """Returns (normalized embedding, original norm, INSERT parameters) for each row."""
+    prepared = []
+    for text, timestamp, embedding, app, title, filename, page_url in rows:
+        # Arrays bind as BLOBs via _adapt_ndarray; handle empty array case. Embeddings are stored unit-length
+        # so that cosine similarity at search time is a plain dot product; the original
+        # norm is kept so zero (content-free) embeddings can be skipped without reading them.
+        norm = float(np.linalg.norm(embedding)) if embedding.size > 0 else 0.0
+        if embedding.size > 0:
+            embedding = _normalize_embedding(embedding)
+            embedding_blob: Optional[np.ndarray] = embedding
+            embedding_i8, scale = quantize_int8(embedding)
+        else:
+            embedding_blob = None # NULL marks "no embedding", so readers need a single None check
+            embedding_i8, scale = None, None
+        prepared.append((embedding, norm, (text, timestamp, embedding_blob, app, title, filename, page_url,
+                                           norm, embedding_i8, scale)))
+    return prepared
+
+
+def _execute_entry_inserts(conn: sqlite3.Connection, prepared: List[Tuple[np.ndarray, float, tuple]]) -> List[Optional[int]]:
+    """Inserts prepared rows on `conn` inside the caller's transaction, returning each new row id (None if skipped)."""
+    row_ids: List[Optional[int]] = [None] * len(prepared)
+    for i, (_, _, params) in enumerate(prepared):
+        # ON CONFLICT(timestamp) DO NOTHING: If a row with this timestamp exists, skip insertion.
+        # Executed per row (in the same transaction) rather than via executemany so
+        # that each inserted row's id is known.
+        cursor = conn.execute(
+            """
+            INSERT INTO entries (text, timestamp, embedding, app, title, filename, page_url, norm,
+                                 embedding_i8, embedding_scale)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(timestamp) DO NOTHING
+            """,
+            params
+        )
+        if cursor.rowcount > 0:  # Check if a row was actually inserted
+            row_ids[i] = cursor.lastrowid
+    return row_ids
+
+
+def _publish_inserted_embeddings(row_ids: List[Optional[int]], prepared: List[Tuple[np.ndarray, float, tuple]]) -> None:
+    """Adds newly inserted embeddings to the matrix cache and the vector index."""
+    for row_id, (embedding, norm, _) in zip(row_ids, prepared):
+        if row_id is None or norm == 0.0:
+            continue  # Skipped duplicate, or an embedding with nothing to rank by
+        with _emb_lock:
+            # Only append once the cache is loaded; a lazy build will pick this row up otherwise.
+            if _emb_loaded:
+                _append_to_embedding_cache(row_id, embedding)
+        add_to_vector_index(row_id, embedding)
+
+
+def insert_entries(
+    rows: List[Tuple[str, int, np.ndarray, str, str, str, Optional[str]]]
+) -> List[Optional[int]]:
+    """
+    Inserts several entries in a single transaction. Rows whose timestamp already
+    exists are skipped due to the UNIQUE constraint on the timestamp column.
+
+    Args:
+        rows: Tuples of (text, timestamp, embedding, app, title, filename, page_url),
+            with the same meaning as the arguments of insert_entry().
+
+    Returns:
+        List[Optional[int]]: For each row, the ID of the newly inserted row, or None if
+            it was skipped as a duplicate. All None if the transaction failed.
+    """
+    prepared = _prepare_entry_rows(rows)
+    try:
+        with _write_lock:
+            conn = _get_write_conn()
+            with conn:  # One transaction (and one commit) for the whole batch
+                row_ids = _execute_entry_inserts(conn, prepared)
+    except sqlite3.Error as e:
+        print(f"Database error during insertion of {len(prepared)} entries: {e}")
+        return [None] * len(prepared)
+
+    _publish_inserted_embeddings(row_ids, prepared)
+    return row_ids
+
+
+def bulk_insert(
+    rows: List[Tuple[str, int, np.ndarray, str, str, str, Optional[str]]],
+    drop_indexes: bool = True
+) -> List[Optional[int]]:
+    """
+    Inserts a large batch of entries (e.g. an archive restore) faster than insert_entries().
+
+    With `drop_indexes`, the secondary indexes on `entries` are dropped, the rows are
+    inserted, and the indexes are recreated, all in one transaction: building each
+    B-tree once from the finished table is much cheaper than updating it per row, and
+    a failure rolls the indexes back along with the rows. The UNIQUE timestamp index
+    is kept, since duplicates are detected through it. Fsyncs are also skipped
+    (synchronous=OFF) for the duration of the import.
+
+    Args:
+        rows: Tuples of (text, timestamp, embedding, app, title, filename, page_url),
+            with the same meaning as the arguments of insert_entry().
+        drop_indexes (bool): Whether to drop and rebuild the secondary indexes.
+
+    Returns:
+        List[Optional[int]]: As for insert_entries().
+    """
+    prepared = _prepare_entry_rows(rows)
+    try:
+        with _write_lock:
+            conn = _get_write_conn()
+            conn.execute("PRAGMA synchronous=OFF")
+            try:
+                # Explicit BEGIN: sqlite3 would otherwise autocommit the DROP INDEX statements.
+                conn.execute("BEGIN")
+                with conn:
+                    indexes = []
+                    if drop_indexes:
+                        # Implicit UNIQUE/PRIMARY KEY indexes have no SQL and are never dropped.
+                        indexes = conn.execute(
+                            "SELECT name, sql FROM sqlite_master "
+                            "WHERE type = 'index' AND tbl_name = 'entries' AND sql IS NOT NULL"
+                        ).fetchall()
+                        for name, _ in indexes:
+                            conn.execute(f'DROP INDEX "{name}"')
+                    row_ids = _execute_entry_inserts(conn, prepared)
+                    for _, sql in indexes:
+                        conn.execute(sql)
+            finally:
+                conn.execute("PRAGMA synchronous=NORMAL")
+    except sqlite3.Error as e:
+        print(f"Database error during bulk insertion of {len(prepared)} entries: {e}")
+        return [None] * len(prepared)
+
+    _publish_inserted_embeddings(row_ids, prepared)
+    return row_ids
+
+
 def insert_entry(
     text: str, 
     timestamp: int, 
@@ -157,62 +912,18 @@ def insert_entry(
                        Returns None if the insertion was skipped due to a duplicate timestamp
                        or if an error occurred.
     """
-    # Ensure embedding is bytes; handle empty array case
-    if embedding.size > 0:
-        embedding_bytes: bytes = embedding.astype(np.float32).tobytes()
-    else:
-        embedding_bytes = b'' # Store empty byte string for empty embeddings
-
-    last_row_id: Optional[int] = None
-    try:
-        with sqlite3.connect(db_path) as conn:
-            cursor = conn.cursor()
-            # ON CONFLICT(timestamp) DO NOTHING: If a row with this timestamp exists, skip insertion.
-            cursor.execute(
-                """
-                INSERT INTO entries (text, timestamp, embedding, app, title, filename, page_url)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-                ON CONFLICT(timestamp) DO NOTHING
-                """,
-                (text, timestamp, embedding_bytes, app, title, filename, page_url)
-            )
-            conn.commit()
-            if cursor.rowcount > 0:  # Check if a row was actually inserted
-                last_row_id = cursor.lastrowid
-            # else:
-                # Optionally log that a duplicate timestamp was encountered and insertion skipped
-                # print(f"INFO: Skipped inserting entry with duplicate timestamp: {timestamp}")
-
-    except sqlite3.Error as e:
-        print(f"Database error during insertion for timestamp {timestamp}: {e}")
-    return last_row_id
+    return insert_entries([(text, timestamp, embedding, app, title, filename, page_url)])[0]
 
 def get_entry_by_timestamp(timestamp_val: int) -> Optional[Entry]:
     """Retrieves a single entry by its timestamp."""
     entry: Optional[Entry] = None
     try:
-        with sqlite3.connect(db_path) as conn:
-            conn.row_factory = sqlite3.Row
+        with _read_conn() as conn:
             cursor = conn.cursor()
-            cursor.execute("SELECT id, app, title, text, timestamp, embedding, filename, page_url FROM entries WHERE timestamp = ?", (timestamp_val,))
+            cursor.execute(_SELECT_ENTRY_BY_TIMESTAMP_SQL, (timestamp_val,))
             row = cursor.fetchone()
             if row:
-                embedding_val = row["embedding"]
-                if embedding_val and len(embedding_val) > 0:
-                    embedding = np.frombuffer(embedding_val, dtype=np.float32)
-                else:
-                    embedding = np.array([], dtype=np.float32)
-                
-                entry = Entry(
-                    id=row["id"],
-                    app=row["app"],
-                    title=row["title"],
-                    text=row["text"],
-                    timestamp=row["timestamp"],
-                    embedding=embedding,
-                    filename=row["filename"],
-                    page_url=row["page_url"]
-                )
+                entry = _row_to_entry(row)
     except sqlite3.Error as e:
         print(f"Database error while fetching entry by timestamp {timestamp_val}: {e}")
     return entry
\ No newline at end of file
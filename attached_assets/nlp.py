@@ -1,7 +1,42 @@
 import numpy as np
 import logging
+import re
 import sys
-from functools import lru_cache # For caching embeddings and tokenizations
+import hashlib
+import threading
+from collections import OrderedDict
+from functools import wraps
+from typing import Callable, Optional
+
+from eidon.quantize import quantize_int8
+
+# --- Optional SIMD Distance Kernels ---
+# SimSIMD provides AVX-512/NEON dispatched distance functions. If it is not
+# installed, batch similarity falls back to a NumPy matrix-vector product.
+try:
+    import simsimd
+except ImportError:
+    simsimd = None
+
+# --- Optional JIT / BLAS Kernels ---
+# Without SimSIMD, Numba compiles a fused parallel dot-scale-clip kernel; failing
+# that, SciPy's sgemv is called directly on the (transposed) matrix buffer.
+try:
+    import numba
+except ImportError:
+    numba = None
+
+try:
+    from scipy.linalg.blas import sgemv
+except ImportError:
+    sgemv = None
+
+# --- Optional Fast Hashing ---
+# xxhash keys the text caches below; without it, an 8-byte BLAKE2b digest is used.
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
 
 # --- Platform Check for NLEmbedding ---
 # NLEmbedding is macOS-specific (Darwin)
@@ -65,50 +100,124 @@ if IS_DARWIN and NLEmbedding:
 else:
     logger.info("Running on non-macOS platform or NLEmbedding not available. Semantic search disabled; token-based search will be used.")
 
+# Bound once so the per-sentence loop in get_embedding() skips the attribute lookup
+# (None when no model is loaded).
+_vec_for_string = apple_embed_model.vectorForString_ if apple_embed_model is not None else None
+
+# Shared read-only "no embedding" result (a zero vector, or empty when the dimension is
+# unknown), returned by get_embedding() instead of allocating one on every empty path.
+_ZERO_EMBEDDING = np.zeros(EMBEDDING_DIM, dtype=np.float32)
+_ZERO_EMBEDDING.setflags(write=False)
+
+
+# --- Text-keyed Result Caches ---
+# OCR text can be many kilobytes; keying an LRU by the text itself retains every
+# string and compares whole strings on lookup. These caches key by a 64-bit hash of
+# the text and bound their total size by the bytes of the cached results.
+def _text_key(text: str) -> int:
+    data = text.encode("utf-8", "surrogatepass")
+    if xxhash is not None:
+        return xxhash.xxh3_64_intdigest(data)
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "little")
+
+
+def _text_cache(max_bytes: int, sizeof: Callable[[object], int]):
+    """
+    Decorator caching a single-argument text function by hashed key, evicting least
+    recently used results once their combined `sizeof` exceeds `max_bytes`.
+    """
+    def decorator(func):
+        cache: "OrderedDict[int, object]" = OrderedDict()
+        sizes = {}
+        lock = threading.Lock()
+        total = 0
+
+        @wraps(func)
+        def wrapper(text):
+            nonlocal total
+            if not isinstance(text, str):
+                return func(text)
+            key = _text_key(text)
+            with lock:
+                if key in cache:
+                    cache.move_to_end(key)
+                    return cache[key]
+            result = func(text)
+            size = sizeof(result)
+            if size > max_bytes:
+                return result
+            with lock:
+                if key not in cache:
+                    cache[key] = result
+                    sizes[key] = size
+                    total += size
+                    while total > max_bytes:
+                        evicted_key, _ = cache.popitem(last=False)
+                        total -= sizes.pop(evicted_key)
+            return result
+
+        def cache_clear():
+            nonlocal total
+            with lock:
+                cache.clear()
+                sizes.clear()
+                total = 0
+
+        wrapper.cache_clear = cache_clear
+        return wrapper
+    return decorator
+
+
+def _set_of_str_size(tokens) -> int:
+    return sys.getsizeof(tokens) + sum(sys.getsizeof(t) for t in tokens)
+
 
 # --- Embedding Function ---
-@lru_cache(maxsize=1024) # Cache results for recently processed texts
+@_text_cache(max_bytes=64 * 1024 * 1024, sizeof=lambda vec: vec.nbytes) # Cache results for recently processed texts
 def get_embedding(text: str) -> np.ndarray:
     """
     Generates a sentence embedding for the given text using Apple's NLEmbedding.
     If NLEmbedding is unavailable or text is empty, returns a zero vector of EMBEDDING_DIM (if known) or an empty array.
+    That zero/empty vector is a single shared read-only array; callers must not modify it.
     """
-    if not IS_DARWIN or apple_embed_model is None:
+    if _vec_for_string is None:
         # logger.debug("NLEmbedding model not available. Returning zero/empty vector for embedding.")
-        return np.zeros(EMBEDDING_DIM, dtype=np.float32) if EMBEDDING_DIM > 0 else np.array([], dtype=np.float32)
+        return _ZERO_EMBEDDING
 
     if not text or text.isspace():
         logger.warning("Input text for embedding is empty or whitespace. Returning zero vector.")
-        return np.zeros(EMBEDDING_DIM, dtype=np.float32)
+        return _ZERO_EMBEDDING
 
     # Split text into sentences/lines and average their embeddings for a more robust document representation.
     # NLEmbedding.vectorForString_ typically works best on sentence-like units.
     sentences = [line.strip() for line in text.splitlines() if line.strip()]
     if not sentences:
         logger.warning("No non-empty lines found in text for embedding. Returning zero vector.")
-        return np.zeros(EMBEDDING_DIM, dtype=np.float32)
+        return _ZERO_EMBEDDING
 
-    vecs = []
+    # Sum sentence vectors into one preallocated accumulator rather than stacking a list
+    acc = np.zeros(EMBEDDING_DIM, dtype=np.float32)
+    count = 0
     for s in sentences:
         try:
-            ns_vector = apple_embed_model.vectorForString_(s)
+            ns_vector = _vec_for_string(s)
             if ns_vector: # ns_vector could be None if the string is problematic
-                # Convert Objective-C NSArray of NSNumbers to a Python list of floats, then to NumPy array
-                py_vector = [float(x) for x in ns_vector]
-                vecs.append(np.array(py_vector, dtype=np.float32))
+                # Convert Objective-C NSArray of NSNumbers straight into a NumPy array
+                np.add(acc, np.fromiter(ns_vector, dtype=np.float32, count=EMBEDDING_DIM), out=acc)
+                count += 1
             else:
                 logger.debug(f"NLEmbedding returned None for sentence: '{s[:50]}...'")
         except Exception as e:
             logger.error(f"Error getting vector for sentence '{s[:50]}...': {e}")
             continue # Skip problematic sentences
 
-    if not vecs:
+    if count == 0:
         logger.warning("No valid vectors generated for any sentence in the text. Returning zero vector.")
-        return np.zeros(EMBEDDING_DIM, dtype=np.float32)
+        return _ZERO_EMBEDDING
 
     # Calculate the mean of the sentence vectors
-    mean_vector = np.mean(vecs, axis=0)
-    return mean_vector.astype(np.float32)
+    acc /= count
+    return acc
 
 
 # --- Cosine Similarity ---
@@ -135,15 +244,77 @@ def cosine_similarity(a: np.ndarray, b: np.ndarray) -> float:
         return 0.0
 
     norm_a = np.linalg.norm(a)
-    norm_b = np.linalg.norm(b)
-
-    if norm_a == 0 or norm_b == 0:
+    if norm_a == 0 or np.linalg.norm(b) == 0:
         # logger.debug("Cosine similarity: one or both vectors have zero magnitude.")
         return 0.0
 
-    similarity = np.dot(a, b) / (norm_a * norm_b)
-    # Clip values to handle potential floating-point inaccuracies slightly outside [-1, 1]
-    return float(np.clip(similarity, -1.0, 1.0))
+    # The batch kernel expects unit rows; it normalizes the query itself.
+    row = np.ascontiguousarray((a / norm_a).reshape(1, -1), dtype=np.float32)
+    return float(cosine_similarity_batch(row, b)[0])
+
+
+def cosine_similarity_batch(matrix: np.ndarray, query: np.ndarray, scales: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Calculates the cosine similarity between a query vector and every row of a matrix.
+
+    Uses SimSIMD's batched kernels when available, then a Numba-compiled parallel
+    kernel, then a single BLAS sgemv (or NumPy) matrix-vector product. Scores are
+    clipped to [-1, 1]. The rows of `matrix` are expected to be L2-normalized
+    (as they are in the database embedding cache).
+
+    Args:
+        matrix: A contiguous (N, D) embedding matrix, either float32 or int8.
+        query: A (D,) float32 query embedding.
+        scales: Per-row dequantization scales; required when `matrix` is int8.
+
+    Returns:
+        A float32 array of N similarity scores.
+    """
+    if matrix.shape[0] == 0:
+        return np.zeros(0, dtype=np.float32)
+    query = np.ascontiguousarray(query, dtype=np.float32)
+    query_unit = query / (np.sqrt(query.dot(query)) + 1e-12)
+    if matrix.dtype == np.int8:
+        # Quantize the unit query the same way the rows were, so the scaled
+        # integer dot product approximates the cosine directly.
+        query_q, query_scale = quantize_int8(query_unit)
+        row_scales = scales.astype(np.float32) * np.float32(query_scale)
+        if simsimd is not None:
+            dots = np.asarray(simsimd.cdist(query_q.reshape(1, -1), np.ascontiguousarray(matrix), metric="dot"), dtype=np.float32).ravel()
+            return np.clip(dots * row_scales, -1.0, 1.0)
+        if _scaled_dot_clip is not None:
+            return _scaled_dot_clip(np.ascontiguousarray(matrix), query_q.astype(np.float32), row_scales)
+        dots = np.einsum("ij,j->i", matrix, query_q, dtype=np.int32).astype(np.float32)
+        return np.clip(dots * row_scales, -1.0, 1.0)
+    if simsimd is not None:
+        distances = simsimd.cdist(query.reshape(1, -1), np.ascontiguousarray(matrix, dtype=np.float32), metric="cosine")
+        return np.clip(1.0 - np.asarray(distances, dtype=np.float32).ravel(), -1.0, 1.0)
+    matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+    if _scaled_dot_clip is not None:
+        return _scaled_dot_clip(matrix, query_unit, np.ones(matrix.shape[0], dtype=np.float32))
+    if sgemv is not None:
+        # A C-ordered (N, D) matrix is the Fortran-ordered transpose of itself,
+        # so trans=1 lets BLAS read the buffer in place without a copy.
+        sims = sgemv(1.0, matrix.T, query_unit, trans=1)
+    else:
+        sims = matrix @ query_unit
+    return np.clip(sims, -1.0, 1.0)
+
+
+if numba is not None:
+    @numba.njit(parallel=True, fastmath=True, cache=True)
+    def _scaled_dot_clip(matrix, query, scales):
+        """Computes clip(matrix[i] . query * scales[i], -1, 1) for every row in parallel."""
+        n, d = matrix.shape
+        out = np.empty(n, dtype=np.float32)
+        for i in numba.prange(n):
+            acc = np.float32(0.0)
+            for j in range(d):
+                acc += np.float32(matrix[i, j]) * query[j]
+            out[i] = min(max(acc * scales[i], np.float32(-1.0)), np.float32(1.0))
+        return out
+else:
+    _scaled_dot_clip = None
 
 
 # --- Tokenizer Initialization (macOS only) ---
@@ -161,40 +332,48 @@ if IS_DARWIN and NLTokenizer and NLTokenUnitWord:
 else:
     logger.info("Running on non-macOS platform or NLTokenizer not available. Using basic split for tokenization.")
 
+# Bound tokenizer methods, resolved once rather than on every call (None without NLTokenizer)
+_set_string = tokenizer.setString_ if tokenizer is not None and NSMakeRange else None
+_enumerate_tokens = tokenizer.enumerateTokensInRange_usingBlock_ if _set_string is not None else None
+
 
 # --- Tokenization Function ---
-@lru_cache(maxsize=2048) # Cache tokenization results
-def tokenize_text(text: str) -> set:
+# Fallback tokenizer: runs of lowercase ASCII letters and digits.
+_TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+
+@_text_cache(max_bytes=16 * 1024 * 1024, sizeof=_set_of_str_size) # Cache tokenization results
+def tokenize_text(text: str) -> frozenset:
     """
     Tokenizes the text into a set of unique lowercase word tokens.
-    Uses Apple's NLTokenizer on macOS, otherwise falls back to a simple split-based method.
+    Uses Apple's NLTokenizer on macOS, otherwise falls back to a simple regex-based method.
+    The result is a frozenset, since the same object is handed out by the cache.
     """
     if not text or text.isspace():
-        return set()
+        return frozenset()
 
     text_lower = text.lower() # Normalize to lowercase first
 
-    if IS_DARWIN and tokenizer and NSMakeRange:
+    if _enumerate_tokens is not None:
         try:
-            tokenizer.setString_(text_lower) # Tokenize the lowercased string
+            _set_string(text_lower) # Tokenize the lowercased string
             tokens = set()
+
+            # Called once per token with its NSRange within the original string (text_lower);
+            # enumerating with a block avoids materializing an NSArray of boxed NSValue ranges.
+            def _collect(token_range, flags, stop):
+                tokens.add(text_lower[token_range.location : token_range.location + token_range.length])
+
             # NSMakeRange(0, len(text_lower)) is crucial for tokenizing the entire string
-            for token_range in tokenizer.tokensForRange_(NSMakeRange(0, len(text_lower))):
-                # The rangeValue() gives the range within the original string (text_lower)
-                r = token_range.rangeValue()
-                token = text_lower[r.location : r.location + r.length]
-                tokens.add(token)
-            return tokens
+            _enumerate_tokens(NSMakeRange(0, len(text_lower)), _collect)
+            return frozenset(tokens)
         except Exception as e:
             logger.warning(f"NLTokenizer error during tokenization: {e}. Falling back to basic split.")
             # Fallthrough to basic split if NLTokenizer fails
 
-    # Fallback for non-macOS or if NLTokenizer failed
-    # Basic split by whitespace and common punctuation (can be improved)
-    import re
-    # Split by non-alphanumeric characters, keeping alphanumeric sequences as tokens
-    split_tokens = re.findall(r'[a-z0-9]+', text_lower)
-    return set(s for s in split_tokens if s) # Filter out any empty strings that might result
+    # Fallback for non-macOS or if NLTokenizer failed: alphanumeric runs as tokens
+    # (the pattern never matches an empty string).
+    return frozenset(_TOKEN_RE.findall(text_lower))
 
 # --- Example Usage (for testing if run directly) ---
 if __name__ == "__main__":
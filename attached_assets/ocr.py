@@ -1,5 +1,29 @@
 import sys
+import functools
+import hashlib
+import threading
 import platform # For more detailed OS checking if needed, though sys.platform is usually sufficient
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
+from typing import List, Optional, Tuple
+
+from eidon.config import OCR_REUSE_HAMMING_DISTANCE, OCR_TILE_COLS, OCR_TILE_OVERLAP, OCR_TILE_ROWS
+
+# --- Optional Fast Hashing ---
+# xxhash keys the OCR result cache below; without it, a 16-byte BLAKE2b digest is used.
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
+# --- Optional JIT Compilation ---
+# Numba fuses the float (0-1) -> uint8 conversion of NumPy OCR inputs into one
+# parallel pass; without it, NumPy multiplies into a temporary float array and casts.
+try:
+    import numba
+except ImportError:
+    numba = None
 
 # --- Platform Check for Vision Framework ---
 IS_DARWIN = sys.platform == "darwin"
@@ -12,13 +36,15 @@ if IS_DARWIN:
         
         # Vision Framework for OCR
         from Vision import VNRecognizeTextRequest, VNImageRequestHandler
+        from Foundation import NSDictionary
         
         # Quartz CoreGraphics for image handling (CGImage)
         from Quartz.CoreGraphics import (
             CGDataProviderCreateWithCFData,
             CGImageCreate,
-            CGColorSpaceCreateDeviceRGB,
-            kCGImageAlphaPremultipliedLast, # Or kCGImageAlphaNoneSkipLast if alpha isn't needed
+            CGColorSpaceCreateDeviceGray,
+            CGRectMake,
+            kCGImageAlphaNone,
             kCGRenderingIntentDefault,
             # Potentially other constants if image formats vary
         )
@@ -50,63 +76,239 @@ if IS_DARWIN:
         raise RuntimeError(f"An unexpected error occurred while importing macOS frameworks for OCR: {e}")
 
 
-# --- Helper Function: PIL Image to CGImage (macOS only) ---
+# --- Helper Functions: Pixels to CGImage (macOS only) ---
+# Vision's cost scales with pixel count, and text on screens this large (4K, or
+# Retina at 2x) stays legible at half resolution.
+OCR_DOWNSCALE_MIN_SIDE = 1600  # Images whose shorter side exceeds this are OCR'd at half size
+OCR_BLANK_RANGE = 4            # Images whose sampled gray levels span less than this are blank
+
 if IS_DARWIN:
-    def _pil_to_cgimage(pil_img: Image.Image):
+    # Immutable handles created once rather than bridged on every OCR call: every
+    # CGImage shares the same device gray color space, and every request handler the
+    # same empty options dictionary (a Python {} would be converted each time).
+    _device_gray = CGColorSpaceCreateDeviceGray()
+    _empty_options = NSDictionary.dictionary()
+    _full_region = CGRectMake(0, 0, 1, 1)  # Vision's default regionOfInterest: the whole image
+
+    def _to_gray_image(arr: np.ndarray) -> Image.Image:
         """
-        Convert a PIL.Image object to a CGImageRef suitable for Apple Vision framework.
+        Returns a grayscale ("L") PIL image of a uint8 grayscale, RGB or RGBA array.
+
+        Text recognition is color-insensitive, so Vision is fed one byte per pixel
+        instead of four. Conversion uses PIL's C luma transform; RGBA arrays are
+        wrapped without a copy first.
         """
-        # Ensure image is in a suitable format for CGImage (e.g., RGBA or RGB)
-        # Vision framework generally works well with RGBA.
-        if pil_img.mode != "RGBA":
-            pil_img = pil_img.convert("RGBA")
-        
-        width, height = pil_img.size
-        # Get image data as bytes
-        img_data_bytes = pil_img.tobytes() # "raw", pil_img.mode would give "RGBA"
+        if arr.ndim == 2:
+            return Image.fromarray(arr, "L")
+        if arr.ndim == 3 and arr.shape[2] == 3:
+            # PIL stores RGB as 4 bytes per pixel anyway, so expand to RGBA here with one
+            # vectorized copy and one alpha fill, then wrap that buffer like RGBA input
+            # (Image.fromarray(arr, "RGB") would unpack and copy it a pixel at a time).
+            rgba = np.empty(arr.shape[:2] + (4,), dtype=np.uint8)
+            rgba[..., :3] = arr
+            rgba[..., 3] = 255
+            arr = rgba
+        if arr.ndim == 3 and arr.shape[2] == 4:
+            rgba = Image.frombuffer("RGBA", (arr.shape[1], arr.shape[0]), arr, "raw", "RGBA", 0, 1)
+            return rgba.convert("L")
+        raise TypeError(f"Unsupported NumPy image shape for OCR: {arr.shape}.")
 
-        # Create a CGDataProvider from the image data
-        # CGDataProviderCreateWithCFData expects CFDataRef, which can be Python bytes directly.
-        data_provider = CGDataProviderCreateWithCFData(img_data_bytes)
-        if not data_provider:
-            raise RuntimeError("Failed to create CGDataProvider from PIL image data.")
+    def _downscale_for_ocr(gray: Image.Image) -> Image.Image:
+        """Halves images whose shorter side exceeds OCR_DOWNSCALE_MIN_SIDE (box filter)."""
+        if min(gray.width, gray.height) > OCR_DOWNSCALE_MIN_SIDE:
+            return gray.reduce(2)
+        return gray
 
-        # Create a CGColorSpace (DeviceRGB is common)
-        color_space = CGColorSpaceCreateDeviceRGB()
-        if not color_space:
-            raise RuntimeError("Failed to create CGColorSpaceCreateDeviceRGB.")
+    def _numpy_to_cgimage(arr: np.ndarray):
+        """
+        Convert a uint8 HxW grayscale NumPy array to a CGImageRef suitable for Apple Vision framework.
+
+        The data provider wraps the array's own buffer (PyObjC proxies buffer objects as
+        NSData and keeps them alive), so the pixels are not copied on the way to Vision.
+        """
+        if arr.dtype != np.uint8 or arr.ndim != 2:
+            raise TypeError(f"Expected a uint8 HxW array, got {arr.dtype} {arr.shape}.")
+        arr = np.ascontiguousarray(arr)
+        height, width = arr.shape
+        return _cgimage_factory(width, height, arr.strides[0])(arr.data)
+
+    @functools.lru_cache(maxsize=4)
+    def _cgimage_factory(width: int, height: int, bytes_per_row: int):
+        """
+        Returns a function that wraps a pixel buffer of the given geometry in a CGImage.
+
+        Captures come at a fixed resolution per display, so the geometry and format
+        arguments are bound once per shape and only the data provider varies per call.
+        """
+        if not _device_gray:
+            raise RuntimeError("Failed to create CGColorSpaceCreateDeviceGray.")
 
         # Define CGImage parameters
         bits_per_component = 8
-        bits_per_pixel = 32  # 4 components (RGBA) * 8 bits
-        bytes_per_row = 4 * width # For RGBA: 4 bytes per pixel * width
-
-        # Create the CGImage
-        # kCGImageAlphaPremultipliedLast means alpha is the last component, and RGB values are premultiplied by alpha.
-        # If your image is not premultiplied, kCGImageAlphaLast might be more appropriate,
-        # or ensure conversion handles premultiplication. PIL's "RGBA" is typically not premultiplied.
-        # For simplicity and common cases, kCGImageAlphaPremultipliedLast often works.
-        # If text recognition is poor, experimenting with alpha modes (e.g. kCGImageAlphaNoneSkipLast if alpha is irrelevant) might help.
-        cg_image = CGImageCreate(
-            width, height,
-            bits_per_component,
-            bits_per_pixel,
-            bytes_per_row,
-            color_space,
-            kCGImageAlphaPremultipliedLast, # BitmapInfo: Alpha info and byte order
-            data_provider,
-            None,  # Decode array (usually None)
-            False, # shouldInterpolate (usually False for direct data)
-            kCGRenderingIntentDefault # Rendering intent
-        )
+        bits_per_pixel = 8  # 1 component (gray) * 8 bits
 
-        if not cg_image:
-            raise RuntimeError("Failed to create CGImage from PIL image.")
-            
-        return cg_image
+        def make_cgimage(data):
+            # Create a CGDataProvider from the image data
+            data_provider = CGDataProviderCreateWithCFData(data)
+            if not data_provider:
+                raise RuntimeError("Failed to create CGDataProvider from image data.")
+
+            # Create the CGImage (no alpha channel)
+            cg_image = CGImageCreate(
+                width, height,
+                bits_per_component,
+                bits_per_pixel,
+                bytes_per_row,
+                _device_gray,
+                kCGImageAlphaNone, # BitmapInfo: Alpha info and byte order
+                data_provider,
+                None,  # Decode array (usually None)
+                False, # shouldInterpolate (usually False for direct data)
+                kCGRenderingIntentDefault # Rendering intent
+            )
+
+            if not cg_image:
+                raise RuntimeError("Failed to create CGImage from image data.")
+            return cg_image
+
+        return make_cgimage
+
+    def _pil_to_cgimage(pil_img: Image.Image):
+        """
+        Convert a PIL.Image object to a CGImageRef suitable for Apple Vision framework.
+        """
+        if pil_img.mode != "L":
+            pil_img = pil_img.convert("L")
+        return _numpy_to_cgimage(np.asarray(pil_img))
 
 
-# --- Main OCR Function ---
+# --- OCR Result Caches ---
+# Consecutive captures are often pixel-identical (a static screen, or the same frame
+# OCR'd again), or differ only in a small region (the cursor, one window). Results
+# are cached by a hash of the raw pixels, both per frame and per tile, so a repeat
+# frame skips Vision entirely and a changed frame only re-recognizes changed tiles.
+OCR_CACHE_SIZE = 512        # Number of recent whole-frame OCR results kept
+OCR_MAX_WORKERS = 4         # Maximum number of images extract_text_from_images() OCRs at once
+OCR_TILE_CACHE_SIZE = 4096  # Number of recent per-tile OCR results kept
+
+_ocr_cache: "OrderedDict[bytes, str]" = OrderedDict()
+_tile_cache: "OrderedDict[bytes, str]" = OrderedDict()
+_ocr_cache_lock = threading.Lock()
+
+# Long-lived OCR threads, so each keeps its reusable Vision requests (see
+# _get_requests) across calls. Threads are only started when first needed.
+_ocr_pool = ThreadPoolExecutor(max_workers=OCR_MAX_WORKERS, thread_name_prefix="eidon-ocr")
+
+
+def _image_key(pixels, layout: str) -> bytes:
+    """
+    Returns a 16-byte content hash of an image.
+
+    Args:
+        pixels: The raw pixel buffer (bytes or any C-contiguous buffer).
+        layout: Mode and dimensions, so equal bytes in different shapes don't collide.
+    """
+    hasher = xxhash.xxh3_128() if xxhash is not None else hashlib.blake2b(digest_size=16)
+    hasher.update(layout.encode())
+    hasher.update(pixels)
+    return hasher.digest()
+
+
+def _cached_text(cache: "OrderedDict[bytes, str]", key: bytes) -> Optional[str]:
+    with _ocr_cache_lock:
+        text = cache.get(key)
+        if text is not None:
+            cache.move_to_end(key)
+        return text
+
+
+def _cache_text(cache: "OrderedDict[bytes, str]", key: bytes, text: str, max_size: int) -> None:
+    with _ocr_cache_lock:
+        cache[key] = text
+        cache.move_to_end(key)
+        while len(cache) > max_size:
+            cache.popitem(last=False)
+
+
+# Perceptual hashes of recently OCR'd frames and their text (see
+# OCR_REUSE_HAMMING_DISTANCE). A few are kept so multi-monitor captures don't evict
+# each other.
+OCR_RECENT_FRAMES = 8
+_recent_frames: "deque[Tuple[int, str]]" = deque(maxlen=OCR_RECENT_FRAMES)
+
+
+def _perceptual_hash(pixels) -> int:
+    """Returns a 64-bit average hash of a grayscale array: its 8x8 thumbnail thresholded at the median."""
+    thumb = np.asarray(Image.fromarray(pixels, "L").resize((8, 8), Image.BILINEAR))
+    return int.from_bytes(np.packbits(thumb > np.median(thumb)).tobytes(), "big")
+
+
+def _recent_text(phash: int) -> Optional[str]:
+    """Returns the text of a recently OCR'd frame perceptually close to `phash`, if any."""
+    with _ocr_cache_lock:
+        for recent_phash, text in reversed(_recent_frames):
+            if bin(phash ^ recent_phash).count("1") <= OCR_REUSE_HAMMING_DISTANCE:
+                return text
+    return None
+
+
+def _tile_bounds(width: int, height: int) -> List[Tuple[int, int, int, int]]:
+    """
+    Returns the (x0, y0, x1, y1) pixel bounds of each OCR tile, in reading order. Rows
+    are extended by OCR_TILE_OVERLAP pixels into their neighbours.
+    """
+    rows = max(1, min(OCR_TILE_ROWS, height))
+    cols = max(1, min(OCR_TILE_COLS, width))
+    return [
+        (c * width // cols, max(0, r * height // rows - OCR_TILE_OVERLAP),
+         (c + 1) * width // cols, min(height, (r + 1) * height // rows + OCR_TILE_OVERLAP))
+        for r in range(rows)
+        for c in range(cols)
+    ]
+
+
+def _join_tile_texts(tile_texts: List[Optional[str]]) -> str:
+    """
+    Joins tile texts in reading order. Lines in the overlap between bands are read by
+    both tiles, so the longest run of lines a tile starts with that repeats the end of
+    the text so far is dropped.
+    """
+    lines: List[str] = []
+    for text in tile_texts:
+        if not text:
+            continue
+        tile_lines = text.split("\n")
+        for n in range(min(len(lines), len(tile_lines)), 0, -1):
+            if lines[-n:] == tile_lines[:n]:
+                tile_lines = tile_lines[n:]
+                break
+        lines.extend(tile_lines)
+    return "\n".join(lines)
+
+
+# --- OCR Sessions ---
+# PyObjC temporaries from OCR (result strings, observation arrays) live until the
+# enclosing autorelease pool drains. A capture loop that OCRs several frames wraps
+# them in one ocr_session(), so they share a single pool instead of each call
+# pushing and draining its own.
+_session_local = threading.local()
+
+
+@contextmanager
+def ocr_session():
+    """Runs the enclosed OCR calls on this thread inside one shared autorelease pool."""
+    if not IS_DARWIN or getattr(_session_local, "active", False):
+        yield  # Nothing to drain off macOS; nested sessions share the outer pool
+        return
+    _session_local.active = True
+    try:
+        with autorelease_pool():
+            yield
+    finally:
+        _session_local.active = False
+
+
+# --- Main OCR Functions ---
 def extract_text_from_image(image_input) -> str:
     """
     Performs OCR on an image to extract text.
@@ -115,93 +317,311 @@ def extract_text_from_image(image_input) -> str:
     On other platforms, this function will raise a NotImplementedError.
 
     Args:
-        image_input: Can be a PIL.Image.Image object or a NumPy array (will be converted to PIL Image).
+        image_input: Can be a PIL.Image.Image object or a NumPy array (grayscale, RGB or RGBA),
+            which is passed to Vision without going through PIL.
 
     Returns:
         A string containing the extracted text, with lines separated by newlines.
         Returns an empty string if no text is found or an error occurs during OCR.
     """
+    return extract_text_from_images([image_input])[0]
+
+
+def extract_text_from_images(images: list, max_workers: int = OCR_MAX_WORKERS) -> List[str]:
+    """
+    Performs OCR on several images (e.g. every monitor of one capture) in one batch.
+
+    Cache hits (and, with OCR_REUSE_HAMMING_DISTANCE set, frames perceptually close to a
+    recently OCR'd one) are resolved first. The remaining images are recognized concurrently on
+    up to `max_workers` threads of a shared pool: PyObjC releases the GIL around Vision calls,
+    and each thread uses its own requests and autorelease pool. A single remaining image (or
+    max_workers=1) is recognized on the calling thread.
+
+    Args:
+        images: PIL.Image.Image objects and/or NumPy arrays, as for extract_text_from_image().
+        max_workers: Maximum number of images recognized at once (at most OCR_MAX_WORKERS).
+
+    Returns:
+        The extracted text of each image, in order (empty string on error or off macOS).
+    """
     if not IS_DARWIN:
         # print("Warning: OCR is only supported on macOS with Apple Vision. No text will be extracted.")
         # raise NotImplementedError("OCR is only supported on macOS with Apple Vision.")
-        return "" # Return empty string for non-macOS to allow app to function without OCR
+        return [""] * len(images) # Return empty strings for non-macOS to allow app to function without OCR
 
     # Ensure objc and Vision components are loaded (already checked at module level, but good practice)
-    if not all([objc, VNRecognizeTextRequest, VNImageRequestHandler, _pil_to_cgimage]):
+    if not all([objc, VNRecognizeTextRequest, VNImageRequestHandler, _numpy_to_cgimage]):
         print("Error: macOS Vision components not available for OCR.")
-        return ""
+        return [""] * len(images)
 
-    try:
-        # Convert input to PIL Image if it's a NumPy array
-        if isinstance(image_input, np.ndarray):
-            # Ensure the NumPy array is in a format PIL can understand (e.g., uint8)
-            if image_input.dtype != np.uint8:
-                # Attempt to convert if it's a float type (e.g. 0-1 range)
-                if np.issubdtype(image_input.dtype, np.floating) and image_input.max() <= 1.0:
-                    image_input = (image_input * 255).astype(np.uint8)
-                else: # Otherwise, try a direct conversion if possible, or raise error
-                    try:
-                        image_input = image_input.astype(np.uint8)
-                    except ValueError:
-                         raise TypeError("Unsupported NumPy array dtype for image conversion. Expected uint8 or float (0-1).")
-            pil_image = Image.fromarray(image_input)
-        elif isinstance(image_input, Image.Image):
-            pil_image = image_input
+    texts = [""] * len(images)
+    pending = []  # (image index, cache key, grayscale pixels)
+    phashes = {}  # image index -> perceptual hash, when near-duplicate reuse is enabled
+    for i, image_input in enumerate(images):
+        try:
+            cache_key, cached, pixels = _prepare_image(image_input)
+            if cached is None and OCR_REUSE_HAMMING_DISTANCE > 0:
+                phashes[i] = _perceptual_hash(pixels)
+                cached = _recent_text(phashes[i])
+        except Exception as e:
+            print(f"An error occurred during OCR: {e}")
+            continue
+        if cached is not None:
+            texts[i] = cached
         else:
-            raise TypeError(
-                "Invalid input type for OCR. Expected PIL.Image.Image or NumPy array, "
-                f"got {type(image_input).__name__}."
-            )
+            pending.append((i, cache_key, pixels))
 
-        # Convert PIL Image to CGImage
-        cg_image = _pil_to_cgimage(pil_image)
+    if len(pending) > 1 and max_workers > 1:
+        results = []
+        for start in range(0, len(pending), max_workers): # At most max_workers in flight
+            batch = [pixels for _, _, pixels in pending[start:start + max_workers]]
+            results.extend(_ocr_pool.map(_recognize_in_pool, batch))
+    elif pending:
+        # Perform the requests within an autorelease pool for memory management
+        # (the caller's, inside an ocr_session())
+        pool = nullcontext() if getattr(_session_local, "active", False) else autorelease_pool()
+        with pool:
+            results = [_recognize_image(pixels) for _, _, pixels in pending]
+    else:
+        results = []
 
-        # Create a Vision text recognition request
-        # The completion handler is not strictly needed for synchronous execution but often set to None.
-        request = VNRecognizeTextRequest.alloc().initWithCompletionHandler_(None)
-        # You can set recognitionLevel to .accurate or .fast
-        # request.setRecognitionLevel_(VNRecognizeTextRequest.VNRequestTextRecognitionLevelAccurate)
-        # You can also set customWords if needed, or specify languages
-        # request.setRecognitionLanguages_(['en-US'])
+    for (i, cache_key, _), text in zip(pending, results):
+        if text is not None:
+            texts[i] = text
+            _cache_text(_ocr_cache, cache_key, text, OCR_CACHE_SIZE)
+            if i in phashes:
+                with _ocr_cache_lock:
+                    _recent_frames.append((phashes[i], text))
+    return texts
 
 
-        # Create an image request handler with the CGImage
-        # The options dictionary can be used to specify orientation if known (e.g., from EXIF)
-        handler = VNImageRequestHandler.alloc().initWithCGImage_options_(cg_image, {})
-        
-        extracted_lines = []
-        # Perform the request(s) within an autorelease pool for memory management
-        with autorelease_pool():
-            success, error = handler.performRequests_error_([request], None)
-
-            if not success or error:
-                error_str = error.localizedDescription() if error else "Unknown error"
-                print(f"Error performing Vision text recognition request: {error_str}")
-                return ""
-
-            observations = request.results()
-            if observations:
-                for observation in observations:
-                    # Each observation is a VNRecognizedTextObservation
-                    # Get the top candidate (most likely recognition)
-                    # topCandidates_ takes an integer for the max number of candidates to return
-                    top_candidate = observation.topCandidates_(1)
-                    if top_candidate and len(top_candidate) > 0:
-                        extracted_lines.append(top_candidate[0].string())
-            
-        return "\n".join(extracted_lines)
+def _recognize_image(pixels) -> Optional[str]:
+    """
+    Recognizes one prepared grayscale image, whole or tile by tile.
 
+    Returns:
+        The extracted text, or None if recognition failed.
+    """
+    try:
+        if OCR_TILE_ROWS * OCR_TILE_COLS > 1:
+            return _recognize_tiled(pixels)
+        lines = _recognize_text(_numpy_to_cgimage(pixels))
+        return lines[0] if lines is not None else None
     except Exception as e:
         # Log the error or handle it more gracefully
         print(f"An error occurred during OCR: {e}")
         # Potentially log traceback for debugging:
         # import traceback
         # print(traceback.format_exc())
-        return "" # Return empty string on error
+        return None
+
+
+def _recognize_in_pool(pixels) -> Optional[str]:
+    """Worker-thread entry point: _recognize_image() inside the thread's own autorelease pool."""
+    with autorelease_pool():
+        return _recognize_image(pixels)
+
+
+def _prepare_image(image_input) -> Tuple[bytes, Optional[str], Optional["np.ndarray"]]:
+    """
+    Hashes an OCR input and, on a cache miss, converts it to a uint8 HxW grayscale array
+    (downscaled if very large).
+
+    Returns:
+        (cache key, cached text or None, grayscale pixels or None on a hit). Blank
+        images come back as a hit with empty text.
+    """
+    if isinstance(image_input, np.ndarray):
+        # Ensure the NumPy array is uint8
+        if image_input.dtype != np.uint8:
+            # Attempt to convert if it's a float type (e.g. 0-1 range)
+            if np.issubdtype(image_input.dtype, np.floating) and image_input.max() <= 1.0:
+                image_input = _unit_float_to_uint8(image_input)
+            else: # Otherwise, try a direct conversion if possible, or raise error
+                try:
+                    image_input = image_input.astype(np.uint8)
+                except ValueError:
+                     raise TypeError("Unsupported NumPy array dtype for image conversion. Expected uint8 or float (0-1).")
+        # Hash the array's own buffer, before (and on a hit, instead of) any conversion
+        image_input = np.ascontiguousarray(image_input)
+        cache_key = _image_key(image_input.data, f"ndarray:{image_input.shape}")
+        cached = _cached_text(_ocr_cache, cache_key)
+        if cached is not None:
+            return cache_key, cached, None
+        # NumPy input goes straight to a CGImage, skipping PIL entirely
+        pixels = np.asarray(_downscale_for_ocr(_to_gray_image(image_input)))
+        return (cache_key, "", None) if _is_blank(pixels) else (cache_key, None, pixels)
+    if isinstance(image_input, Image.Image):
+        # Convert to grayscale first (in C, without serializing the image) and key the
+        # cache on those pixels: a quarter of the bytes of an RGBA tobytes(), and exactly
+        # what Vision will see. tobytes() is then only called, via np.asarray, on the
+        # one-byte-per-pixel image.
+        gray = image_input if image_input.mode == "L" else image_input.convert("L")
+        gray_pixels = np.asarray(gray)
+        cache_key = _image_key(gray_pixels.data, f"L:{gray_pixels.shape}")
+        cached = _cached_text(_ocr_cache, cache_key)
+        if cached is not None:
+            return cache_key, cached, None
+        if _is_blank(gray_pixels):
+            return cache_key, "", None
+        downscaled = _downscale_for_ocr(gray)
+        return cache_key, None, gray_pixels if downscaled is gray else np.asarray(downscaled)
+    raise TypeError(
+        "Invalid input type for OCR. Expected PIL.Image.Image or NumPy array, "
+        f"got {type(image_input).__name__}."
+    )
+
+
+def _unit_float_to_uint8(arr) -> "np.ndarray":
+    """Converts a float image in the 0-1 range to uint8 (truncating, like astype)."""
+    if _scale_to_uint8 is None:
+        return (arr * 255).astype(np.uint8)
+    src = np.ascontiguousarray(arr)
+    dst = np.empty(src.shape, dtype=np.uint8)
+    _scale_to_uint8(src.reshape(-1), dst.reshape(-1))
+    return dst
+
+
+if numba is not None:
+    @numba.njit(parallel=True, fastmath=True, cache=True)
+    def _scale_to_uint8(src, dst):
+        """Writes clamp(src[i] * 255, 0, 255) to dst[i] in parallel, without a float temporary."""
+        for i in numba.prange(src.size):
+            v = src[i] * 255.0
+            dst[i] = 0 if v < 0 else (255 if v > 255 else np.uint8(v))
+else:
+    _scale_to_uint8 = None
+
+
+def _is_blank(pixels) -> bool:
+    """
+    Returns True if a grayscale array is (nearly) a single flat color, e.g. a frame
+    captured before a window painted. Such frames are answered with "" without
+    running Vision. Every 8th pixel of every 8th row is sampled.
+    """
+    sample = pixels[::8, ::8]
+    return sample.size == 0 or int(np.ptp(sample)) < OCR_BLANK_RANGE
+
+
+def _recognize_tiled(pixels) -> Optional[str]:
+    """
+    OCRs a uint8 HxW grayscale array tile by tile, sending only tiles missing from the
+    tile cache to Vision.
+
+    Returns:
+        The text of all tiles in reading order, or None if the Vision request failed.
+    """
+    height, width = pixels.shape[:2]
+    bounds = _tile_bounds(width, height)
+
+    tile_texts: List[Optional[str]] = [None] * len(bounds)
+    misses = []  # (tile index, tile key)
+    for i, (x0, y0, x1, y1) in enumerate(bounds):
+        tile = np.ascontiguousarray(pixels[y0:y1, x0:x1])
+        key = _image_key(tile.data, f"tile:{tile.shape}")
+        tile_texts[i] = _cached_text(_tile_cache, key)
+        if tile_texts[i] is None:
+            misses.append((i, key))
+
+    if misses:
+        # One handler for the whole frame, with one request per changed tile. Vision's
+        # regionOfInterest is normalized with its origin at the bottom-left.
+        regions = []
+        for i, _ in misses:
+            x0, y0, x1, y1 = bounds[i]
+            regions.append(CGRectMake(x0 / width, (height - y1) / height, (x1 - x0) / width, (y1 - y0) / height))
+        recognized = _recognize_text(_numpy_to_cgimage(pixels), regions)
+        if recognized is None:
+            return None
+        for (i, key), text in zip(misses, recognized):
+            tile_texts[i] = text
+            _cache_text(_tile_cache, key, text, OCR_TILE_CACHE_SIZE)
+
+    return _join_tile_texts(tile_texts)
+
+
+# --- Reusable Vision Requests ---
+# Allocating a VNRecognizeTextRequest crosses the PyObjC bridge, so requests are
+# created once and reused (one per tile at most). VNRequest objects are not
+# thread-safe, so each thread (the capture loop, the adhoc worker, OCR pool
+# workers) keeps its own.
+_request_local = threading.local()
+
+
+def _get_requests(count: int) -> list:
+    """Returns `count` reusable text recognition requests owned by the calling thread."""
+    pool = getattr(_request_local, "pool", None)
+    if pool is None:
+        pool = _request_local.pool = []
+    while len(pool) < count:
+        # The completion handler is not strictly needed for synchronous execution but often set to None.
+        request = VNRecognizeTextRequest.alloc().initWithCompletionHandler_(None)
+        # You can set recognitionLevel to .accurate or .fast
+        # request.setRecognitionLevel_(VNRecognizeTextRequest.VNRequestTextRecognitionLevelAccurate)
+        # You can also set customWords if needed, or specify languages
+        # request.setRecognitionLanguages_(['en-US'])
+        pool.append(request)
+    return pool[:count]
+
+
+def _recognize_text(cg_image, regions: Optional[list] = None) -> Optional[List[str]]:
+    """
+    Runs Vision text recognition on a CGImage (macOS only). Caller should be inside an
+    autorelease pool.
+
+    Args:
+        cg_image: The image to recognize.
+        regions: Normalized CGRects to recognize separately, in one batch of requests.
+            None recognizes the whole image.
+
+    Returns:
+        For each region (or just the whole image), the recognized lines joined by
+        newlines; None if the request failed.
+    """
+    if regions is None:
+        regions = [_full_region]
+
+    # Create an image request handler with the CGImage
+    # The options dictionary can be used to specify orientation if known (e.g., from EXIF)
+    handler = VNImageRequestHandler.alloc().initWithCGImage_options_(cg_image, _empty_options)
+    
+    requests = _get_requests(len(regions))
+    for request, region in zip(requests, regions):
+        # Always set, since a reused request keeps the region from its last use
+        request.setRegionOfInterest_(region)
+
+    success, error = handler.performRequests_error_(requests, None)
+
+    if not success or error:
+        error_str = error.localizedDescription() if error else "Unknown error"
+        print(f"Error performing Vision text recognition request: {error_str}")
+        return None
+
+    texts = []
+    for request in requests:
+        # Each observation is a VNRecognizedTextObservation; keep the string of its top
+        # candidate (most likely recognition). topCandidates_ takes the max number of
+        # candidates to return, and an empty NSArray is falsy.
+        extracted_lines = [
+            top_candidates[0].string()
+            for observation in (request.results() or ())
+            if (top_candidates := observation.topCandidates_(1))
+        ]
+        texts.append("\n".join(extracted_lines))
+    return texts
+
 
 # --- Example Usage (for testing if run directly) ---
 if __name__ == "__main__":
-    if IS_DARWIN:
+    import argparse
+    parser = argparse.ArgumentParser(description="Eidon OCR module.")
+    parser.add_argument("--self-test", action="store_true",
+                        help="Render a test image with Pillow and OCR it (macOS only).")
+    args = parser.parse_args()
+
+    if IS_DARWIN and not args.self_test:
+        print("OCR module loaded. Run with --self-test to OCR a generated test image.")
+    elif IS_DARWIN:
         print("Running ocr.py directly for testing (macOS)...")
         try:
             # Create a simple dummy image with text using PIL for testing
@@ -0,0 +1,23 @@
+from typing import Tuple
+
+import numpy as np
+
+# --- Int8 Embedding Quantization ---
+# Kept apart from nlp.py (which loads the embedding model at import) so the database
+# layer can quantize embeddings without pulling in the model.
+
+
+def quantize_int8(vec: np.ndarray) -> Tuple[np.ndarray, float]:
+    """
+    Symmetrically quantizes a vector to int8 with a per-vector scale, so that
+    `vec ≈ quantized.astype(np.float32) * scale`.
+
+    Returns:
+        A tuple of (int8 array, scale). A zero vector yields a zero array and scale 0.0.
+    """
+    vec = np.asarray(vec, dtype=np.float32)
+    max_abs = float(np.max(np.abs(vec))) if vec.size > 0 else 0.0
+    if max_abs == 0.0:
+        return np.zeros(vec.shape, dtype=np.int8), 0.0
+    scale = max_abs / 127.0
+    return np.round(vec / scale).astype(np.int8), scale
@@ -1,40 +1,27 @@
 import os
+import queue
 import sys
 import time
 import uuid # For generating unique parts of filenames
-from threading import Event
-from typing import List, Optional, Tuple # Retained Tuple for potential future use
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
+from threading import Event, Lock, Thread
+from typing import List, Optional, Tuple
 
 import numpy as np
 from PIL import Image, ImageGrab # ImageGrab for screenshots, Image for processing
-import imagehash # For perceptual hashing
 
-# macOS-specific imports for idle time and active window info
-if sys.platform == "darwin":
-    try:
-        from Quartz import (
-            CGEventSourceSecondsSinceLastEventType,
-            kCGAnyInputEventType,
-            kCGEventSourceStateCombinedSessionState
-        )
-    except ImportError:
-        print("ERROR: Quartz module not found. Idle detection will not work on macOS.", file=sys.stderr)
-        # Define stubs or alternative behavior if Quartz is critical and missing
-        def CGEventSourceSecondsSinceLastEventType(*args): return 0 # Assume active
-        kCGAnyInputEventType = None
-        kCGEventSourceStateCombinedSessionState = None
-else:
-    # Placeholder for non-macOS idle detection (could use psutil or other libraries)
-    print("Warning: Idle detection is currently only implemented for macOS.", file=sys.stderr)
+# Heavier dependencies (Numba, Quartz, and the OCR and embedding models) are
+# imported on first use by the capture thread, so importing this module (e.g. for the
+# pause/resume controls) doesn't load them.
+numba = None  # Set by _get_mssim_stats() and _get_phash_kernel() if Numba is installed
 
 # Eidon specific module imports
 from eidon.config import (
     screenshots_path, IDLE_THRESHOLD, SIMILARITY_THRESHOLD, MIN_HAMMING_DISTANCE,
-    MAX_IMAGE_WIDTH, MAX_IMAGE_HEIGHT, WEBP_QUALITY
+    MAX_IMAGE_WIDTH, MAX_IMAGE_HEIGHT, WEBP_QUALITY, WEBP_METHOD
 )
-from eidon.database import insert_entry, get_entry_by_timestamp # Added get_entry_by_timestamp for conflict check
-from eidon.nlp import get_embedding
-from eidon.ocr import extract_text_from_image
+from eidon.database import insert_entries, get_entry_by_timestamp # Added get_entry_by_timestamp for conflict check
 from eidon.utils import (
     get_active_app_name,
     get_active_window_title,
@@ -47,6 +34,15 @@ from eidon.utils import (
 # URL parts that identify the Eidon app's own interface (to prevent self-capture)
 SELF_VIEW_URL_PARTS = ["localhost:8082", "127.0.0.1:8082", "0.0.0.0:8082"] # Ensure this matches your app's serving address
 
+# A screen is only skipped when its phash distance is at most MIN_HAMMING_DISTANCE, so
+# larger distances are changes without further checks. Within this margin below the
+# threshold the phash alone is trusted too; only the band just under it runs MSSIM.
+PHASH_SURE_SIMILAR_MARGIN = 2    # Distance <= MIN_HAMMING_DISTANCE - 2: unchanged
+
+# Threads that process the screens of a multi-monitor capture concurrently. Resizing,
+# WEBP encoding, hashing and OCR all run in C extensions that release the GIL.
+_screen_pool = ThreadPoolExecutor(max_workers=max(2, (os.cpu_count() or 2) // 2), thread_name_prefix="eidon-screen")
+
 # Event to control screenshot capture (pause/resume)
 capture_active_event = Event()
 capture_active_event.set()  # Start in active (capturing) state
@@ -67,48 +63,96 @@ def is_capture_active() -> bool:
     return capture_active_event.is_set()
 
 # --- System Interaction Functions ---
+@lru_cache(maxsize=None)
+def _get_idle_fn():
+    """
+    Imports Quartz (macOS) on first use and returns a function giving the seconds since
+    the last input event, or None if idle detection is unavailable.
+    """
+    if sys.platform != "darwin":
+        # Placeholder for non-macOS idle detection (could use psutil or other libraries)
+        print("Warning: Idle detection is currently only implemented for macOS.", file=sys.stderr)
+        return None
+    try:
+        from Quartz import (
+            CGEventSourceSecondsSinceLastEventType,
+            kCGAnyInputEventType,
+            kCGEventSourceStateCombinedSessionState
+        )
+    except ImportError:
+        print("ERROR: Quartz module not found. Idle detection will not work on macOS.", file=sys.stderr)
+        return None
+    return lambda: CGEventSourceSecondsSinceLastEventType(
+        kCGEventSourceStateCombinedSessionState,
+        kCGAnyInputEventType,
+    )
+
+
 def get_idle_time() -> float:
     """
     Returns user idle time in seconds.
     Currently implemented for macOS using Quartz.
     Returns 0 (active) on other platforms or if Quartz fails.
     """
-    if sys.platform == "darwin" and kCGAnyInputEventType is not None:
+    idle_fn = _get_idle_fn()
+    if idle_fn is not None:
         try:
-            return CGEventSourceSecondsSinceLastEventType(
-                kCGEventSourceStateCombinedSessionState,
-                kCGAnyInputEventType,
-            )
+            return idle_fn()
         except Exception as e:
             print(f"Error getting idle time from Quartz: {e}", file=sys.stderr)
             return 0.0 # Assume active on error
     return 0.0 # Default to active for non-macOS or if Quartz components are missing
 
 # --- Image Comparison Functions ---
-def _calculate_mssim_for_rgb(img1_rgb: np.ndarray, img2_rgb: np.ndarray, L: int = 255) -> float:
+# Screens are compared through a small grayscale copy (longest side at most this many
+# pixels), shared by the phash and MSSIM checks, rather than at full resolution.
+COMPARE_MAX_SIDE = 320
+
+
+def _small_gray(img_np: np.ndarray) -> np.ndarray:
+    """
+    Converts an RGB(A) uint8 screenshot (NumPy array) to a small float32 grayscale copy.
+
+    PIL's C conversion uses the same ITU-R 601 luma weights (0.299, 0.587, 0.114) as a
+    NumPy dot product would, and reduce() box-averages by an integer factor in one pass.
+    """
+    mode = "RGBA" if img_np.shape[-1] == 4 else "RGB"
+    gray = Image.fromarray(np.ascontiguousarray(img_np, dtype=np.uint8), mode).convert("L")
+    factor = max(1, max(gray.size) // COMPARE_MAX_SIDE)
+    if factor > 1:
+        gray = gray.reduce(factor)
+    return np.asarray(gray, dtype=np.float32)
+
+
+def _calculate_mssim(gray1: np.ndarray, gray2: np.ndarray, L: int = 255) -> float:
     """
-    Calculates Mean Structural Similarity Index (MSSIM) between two RGB images.
+    Calculates Mean Structural Similarity Index (MSSIM) between two grayscale images.
     Helper function for is_similar.
+
+    Statistics are global (one window spanning the whole image), gathered by one fused
+    Numba pass or, without Numba, as dot products of centered float32 copies.
     """
     # Constants for MSSIM calculation
     K1, K2 = 0.01, 0.03
     C1, C2 = (K1 * L) ** 2, (K2 * L) ** 2
 
-    def rgb_to_grayscale(rgb_img: np.ndarray) -> np.ndarray:
-        """Converts an RGB image (NumPy array) to grayscale."""
-        # Standard luminance calculation
-        return np.dot(rgb_img[..., :3], [0.2989, 0.5870, 0.1140])
-
-    # Convert RGB images to grayscale for MSSIM
-    img1_gray = rgb_to_grayscale(img1_rgb)
-    img2_gray = rgb_to_grayscale(img2_rgb)
+    # Flattened, for BLAS dot products
+    img1_gray = gray1.reshape(-1)
+    img2_gray = gray2.reshape(-1)
+    n = img1_gray.size
 
-    mu1 = np.mean(img1_gray)
-    mu2 = np.mean(img2_gray)
-    sigma1_sq = np.var(img1_gray)
-    sigma2_sq = np.var(img2_gray)
-    # Covariance of img1_gray and img2_gray
-    sigma12 = np.mean((img1_gray - mu1) * (img2_gray - mu2))
+    mssim_stats = _get_mssim_stats()
+    if mssim_stats is not None:
+        mu1, mu2, sigma1_sq, sigma2_sq, sigma12 = mssim_stats(img1_gray, img2_gray)
+    else:
+        mu1 = float(img1_gray.mean(dtype=np.float64))
+        mu2 = float(img2_gray.mean(dtype=np.float64))
+        img1_gray = img1_gray - np.float32(mu1)
+        img2_gray = img2_gray - np.float32(mu2)
+        sigma1_sq = float(np.dot(img1_gray, img1_gray)) / n
+        sigma2_sq = float(np.dot(img2_gray, img2_gray)) / n
+        # Covariance of img1_gray and img2_gray
+        sigma12 = float(np.dot(img1_gray, img2_gray)) / n
 
     # MSSIM formula
     numerator = (2 * mu1 * mu2 + C1) * (2 * sigma12 + C2)
@@ -121,23 +165,53 @@ def _calculate_mssim_for_rgb(img1_rgb: np.ndarray, img2_rgb: np.ndarray, L: int
     return ssim_index
 
 
+@lru_cache(maxsize=None)
+def _get_mssim_stats():
+    """
+    Returns a Numba kernel computing (mean1, mean2, var1, var2, covariance) of two flat
+    arrays in one fused parallel pass, or None without Numba. Compiled on first use.
+    """
+    global numba  # The kernel must see numba as a global, not a closure variable, to be cacheable
+    try:
+        import numba
+    except ImportError:
+        return None
+
+    @numba.njit(parallel=True, fastmath=True, cache=True)
+    def _mssim_stats(g1, g2):
+        n = g1.size
+        s1 = s2 = ss1 = ss2 = sc = 0.0
+        for i in numba.prange(n):
+            a = np.float64(g1[i])
+            b = np.float64(g2[i])
+            s1 += a
+            s2 += b
+            ss1 += a * a
+            ss2 += b * b
+            sc += a * b
+        mu1 = s1 / n
+        mu2 = s2 / n
+        return mu1, mu2, ss1 / n - mu1 * mu1, ss2 / n - mu2 * mu2, sc / n - mu1 * mu2
+
+    return _mssim_stats
+
+
 def is_similar_mssim(
-    img1_np: np.ndarray, img2_np: np.ndarray, threshold: float = SIMILARITY_THRESHOLD
+    gray1_small: np.ndarray, gray2_small: np.ndarray, threshold: float = SIMILARITY_THRESHOLD
 ) -> bool:
     """
-    Checks if two images (NumPy arrays) are similar based on MSSIM.
-    Assumes img1_np and img2_np are RGB(A) images.
+    Checks if two screens are similar based on MSSIM.
+
+    Takes the small grayscale copies from _small_gray(), not full screenshots. Scores at
+    this scale run a few hundredths lower than at full resolution on typical screens,
+    so SIMILARITY_THRESHOLD may need re-tuning.
     """
-    if img1_np.shape != img2_np.shape:
+    if gray1_small.shape != gray2_small.shape:
         # If shapes differ (e.g., resolution change), they are not considered similar for this check.
         return False
-    
-    # If images have an alpha channel, consider only RGB for MSSIM
-    img1_rgb = img1_np[..., :3] if img1_np.shape[-1] == 4 else img1_np
-    img2_rgb = img2_np[..., :3] if img2_np.shape[-1] == 4 else img2_np
 
     try:
-        similarity = _calculate_mssim_for_rgb(img1_rgb, img2_rgb)
+        similarity = _calculate_mssim(gray1_small, gray2_small)
         return similarity >= threshold
     except Exception as e:
         print(f"Error calculating MSSIM: {e}", file=sys.stderr)
@@ -155,58 +229,305 @@ def take_screenshots() -> List[np.ndarray]:
         pil_images = ImageGrab.grab(all_screens=True)
         if not isinstance(pil_images, list): # If only one screen, it might not be a list
             pil_images = [pil_images]
-        return [np.array(img) for img in pil_images]
+        # np.asarray wraps the bytes PIL exports instead of copying them a second time
+        # (as np.array would); the arrays are read-only, which nothing downstream minds.
+        return [np.asarray(img) for img in pil_images]
     except Exception as e:
         print(f"Error taking screenshots with ImageGrab: {e}", file=sys.stderr)
         # This can happen if no display server is running (e.g., headless SSH session)
         return []
 
 # --- Perceptual Hashing ---
-def _get_phashes_from_pil_images(pil_images: List[Image.Image]) -> List[imagehash.ImageHash]:
-    """Helper to get phashes from a list of PIL images."""
-    phashes = []
-    for img in pil_images:
-        try:
-            # imagehash.phash works directly on PIL Images
-            phashes.append(imagehash.phash(img))
-        except Exception as e:
-            print(f"Error calculating phash for an image: {e}", file=sys.stderr)
-            # Add a placeholder or re-raise, depending on desired strictness
-            # For now, let's try to add a "null" hash to keep array lengths consistent
-            phashes.append(imagehash.hex_to_hash('0'*16)) # A zero phash
-    return phashes
+# The low 8 rows of the (unnormalized, type II) 32-point DCT matrix. The hash only keeps
+# the low 8x8 frequencies, so B @ thumb @ B.T computes just those, instead of the full
+# 32x32 transform.
+_PHASH_DCT_BASIS = 2.0 * np.cos(np.pi / 64.0 * np.outer(np.arange(8), 2 * np.arange(32) + 1))
 
-# --- Main Screenshot Recording Thread ---
-def record_screenshots_thread() -> None:
+
+@lru_cache(maxsize=None)
+def _get_phash_kernel():
     """
-    Continuously records screenshots, processes them, and stores relevant data if significant changes are detected.
-    Handles multiple monitors, idle time, self-view prevention, and similarity checks.
+    Returns a Numba kernel hashing a C-contiguous (32, 32) float64 thumbnail (low 8x8 DCT
+    via _PHASH_DCT_BASIS, median threshold, bits packed into a uint64), or None without
+    Numba. Compiled on first use for exactly that input type.
     """
-    # Ensure TOKENIZERS_PARALLELISM is set to false if using Hugging Face tokenizers indirectly
-    # This is often done to prevent deadlocks when using tokenizers in threads with multiprocessing.
-    # If not using HF tokenizers directly here, this might be less critical for this specific file.
-    os.environ["TOKENIZERS_PARALLELISM"] = "false"
+    global numba  # The kernel must see numba as a global, not a closure variable, to be cacheable
+    try:
+        import numba
+    except ImportError:
+        return None
+
+    @numba.njit(numba.uint64(numba.float64[:, ::1], numba.float64[:, ::1]), fastmath=True, cache=True)
+    def _phash_8x8(thumb, basis):
+        rows = np.zeros((8, 32))  # basis @ thumb
+        for k in range(8):
+            for n in range(32):
+                w = basis[k, n]
+                for j in range(32):
+                    rows[k, j] += w * thumb[n, j]
+        dct_low = np.zeros(64)  # (basis @ thumb @ basis.T), row-major
+        for k in range(8):
+            for l in range(8):
+                acc = 0.0
+                for j in range(32):
+                    acc += rows[k, j] * basis[l, j]
+                dct_low[k * 8 + l] = acc
+        median = np.median(dct_low)
+        h = np.uint64(0)
+        for b in range(64):
+            h = (h << np.uint64(1)) | np.uint64(dct_low[b] > median)
+        return h
+
+    return _phash_8x8
+
+
+def fast_phash(gray_small: np.ndarray) -> int:
+    """
+    Computes the 64-bit perceptual hash of a screen from its _small_gray() copy.
 
-    # Initialize with an initial capture to have a baseline
-    last_captured_screenshots_np: List[np.ndarray] = []
-    last_captured_phashes: List[imagehash.ImageHash] = []
-
-    # Initial capture attempt
-    initial_screenshots_np = take_screenshots()
-    if initial_screenshots_np:
-        last_captured_screenshots_np = initial_screenshots_np
-        # For phash, we need PIL images of the (potentially thumbnailed) versions
-        initial_pil_thumbs = []
-        for np_array in initial_screenshots_np:
-            img = Image.fromarray(np_array)
-            img.thumbnail((MAX_IMAGE_WIDTH, MAX_IMAGE_HEIGHT), Image.LANCZOS)
-            initial_pil_thumbs.append(img)
-        last_captured_phashes = _get_phashes_from_pil_images(initial_pil_thumbs)
+    The same hash as imagehash.phash() (DCT of a 32x32 grayscale image, low 8x8 frequencies
+    thresholded at their median), with the bits packed into a plain int so comparing
+    two hashes is an XOR and a popcount.
+    """
+    thumb = Image.fromarray(gray_small, "F").resize((32, 32), Image.BOX)
+    thumb_np = np.asarray(thumb, dtype=np.float64)
+    phash_kernel = _get_phash_kernel()
+    if phash_kernel is not None:
+        return int(phash_kernel(np.ascontiguousarray(thumb_np), _PHASH_DCT_BASIS))
+    dct_low = _PHASH_DCT_BASIS @ thumb_np @ _PHASH_DCT_BASIS.T
+    return int.from_bytes(np.packbits(dct_low > np.median(dct_low)).tobytes(), "big")
+
+
+def hamming_distance(phash1: int, phash2: int) -> int:
+    """Returns the number of differing bits between two phashes."""
+    return bin(phash1 ^ phash2).count("1")  # int.bit_count() needs Python 3.10
+
+
+def _screen_signature(img_np: np.ndarray) -> Tuple[int, np.ndarray]:
+    """Returns (phash, small grayscale copy) of a screenshot, for comparing it with the next."""
+    gray_small = _small_gray(img_np)
+    return fast_phash(gray_small), gray_small
+
+
+def _new_baseline(np_images: List[np.ndarray]) -> Tuple[List[np.ndarray], List[Optional[Tuple[int, np.ndarray]]]]:
+    """
+    Returns fresh comparison baselines (screenshots and signatures) for the capture loop.
+
+    Signatures start as None and are computed from the baseline screenshot only when a
+    comparison needs one, so resetting the baseline (self-view, monitor changes) costs
+    nothing per screen, and a screen whose next capture is bit-identical never needs one.
+    """
+    return list(np_images), [None] * len(np_images)
+
+
+# --- Per-Cycle Metadata ---
+def _app_and_title(active_url: Optional[str]) -> Tuple[str, str]:
+    """
+    Returns (app name for the DB, smart title for the DB) for a capture cycle, shared by
+    all of its recorded screens. The app and window lookups (AppKit/Accessibility
+    round-trips) run only for cycles in which some screen is actually recorded.
+    """
+    current_app_name = get_active_app_name()
+    current_window_title_from_os = get_active_window_title()
+    title_for_db = generate_smart_title(
+        app_name=current_app_name,
+        window_title=current_window_title_from_os,
+        url=active_url # Pass the fetched active_url
+    )
+    # Ensure active_app for DB is not empty
+    return current_app_name or "Unknown App", title_for_db
+
+
+# --- Per-Screen Processing ---
+def _process_one_screen(
+    i: int,
+    current_single_screen_np: np.ndarray,
+    last_single_screen_np: Optional[np.ndarray],
+    last_signature: Optional[Tuple[int, np.ndarray]],
+) -> Tuple[bool, Optional[Tuple[int, np.ndarray]]]:
+    """
+    Compares one screen with its previous capture. Runs on a _screen_pool thread for
+    multi-monitor captures.
+
+    Returns:
+        (whether the screen changed significantly, the signature of its new baseline if
+        so, otherwise of its current one). A changed screen is recorded by the caller, and
+        its current capture becomes its baseline; the signature may be None if it was not
+        needed for the comparison (it is then computed when next needed).
+    """
+    current_signature = None
+    # Ensure corresponding last_screenshot exists
+    if last_single_screen_np is None:
+        print(f"Warning: No previous capture for screen {i}. Skipping this screen for similarity.", file=sys.stderr)
+        # This should ideally be caught by monitor change logic, but as a safeguard.
+        # We will process it as a "new" screen without similarity check.
+        # To do that, we need to make sure a placeholder is there or handle it.
+        # For now, let's just process it as if it's completely new.
+        is_mssim_similar = False
+        hamming_dist_low_enough = False
     else:
-        print("Warning: Initial screenshot capture failed. Retrying...", file=sys.stderr)
-        # Loop will handle retries or wait if display becomes available.
+        # Compare with the corresponding screen from the last capture
+        # 0. Bit-identical frames (a static screen) need no similarity math at all
+        if (current_single_screen_np.shape == last_single_screen_np.shape
+                and np.array_equal(current_single_screen_np, last_single_screen_np)):
+            return False, last_signature
+
+        # 1. Perceptual Hash (phash) check (on a 32x32 reduction), which is cheap
+        current_signature = current_phash, current_gray = _screen_signature(current_single_screen_np)
+        if last_signature is None:
+            last_signature = _screen_signature(last_single_screen_np)
+        last_phash, last_gray = last_signature
+
+        hamming_dist = hamming_distance(current_phash, last_phash)
+        hamming_dist_low_enough = hamming_dist <= MIN_HAMMING_DISTANCE
+
+        # 2. MSSIM check (on the same small grayscale copies), only when the phash
+        # distance is under the threshold but too close to it to decide alone
+        if hamming_dist <= MIN_HAMMING_DISTANCE - PHASH_SURE_SIMILAR_MARGIN:
+            is_mssim_similar = True  # Clearly unchanged
+        elif not hamming_dist_low_enough:
+            is_mssim_similar = False  # Changed: MSSIM could not make this screen skippable
+        else:
+            is_mssim_similar = is_similar_mssim(current_gray, last_gray)
+
+    if is_mssim_similar and hamming_dist_low_enough:
+        # print(f"Screen {i}: Similar (MSSIM & phash). Skipping.", file=sys.stderr) # Debug
+        return False, last_signature # Skip this screen if both checks indicate similarity
+
+    # --- Significant Change Detected - Process This Screen ---
+    print(f"Screen {i}: Change detected. Processing. MSSIM similar: {is_mssim_similar}, Hamming dist: {hamming_dist if 'hamming_dist' in locals() else 'N/A'}", file=sys.stderr)
+    return True, current_signature
+
+
+# --- Recording (Save, OCR, Embedding, Database) ---
+# The changed screens of a cycle are recorded together on a worker thread, so the
+# capture loop keeps comparing new captures while earlier ones are OCR'd and embedded.
+# At most POST_MAX_PENDING cycles are queued or running; further changes wait for a
+# later cycle.
+POST_MAX_PENDING = 4
+_post_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="eidon-record")
+_post_pending = 0
+_post_pending_lock = Lock()
+
+
+def _submit_persist(*args) -> bool:
+    """Queues _persist_and_index(*args) on _post_pool. Returns False if the backlog is full."""
+    global _post_pending
+    with _post_pending_lock:
+        if _post_pending >= POST_MAX_PENDING:
+            return False
+        _post_pending += 1
+    _post_pool.submit(_persist_and_index, *args).add_done_callback(_persist_done)
+    return True
+
+
+def _persist_done(future) -> None:
+    global _post_pending
+    with _post_pending_lock:
+        _post_pending -= 1
+    if future.exception() is not None:
+        print(f"Error recording screenshot: {future.exception()}", file=sys.stderr)
+
+
+def _persist_and_index(
+    changed_screens: List[Tuple[int, np.ndarray]],
+    current_timestamp: int,
+    active_app_for_db: str,
+    title_for_db: str,
+    active_url: Optional[str],
+) -> None:
+    """
+    Saves a cycle's changed (screen index, capture) pairs as WEBP, OCRs and embeds them,
+    and inserts their database entries in a single transaction.
+    """
+    # Imported on first use (see the note at the top): these load the OCR and embedding models
+    from eidon.nlp import get_embedding
+    from eidon.ocr import extract_text_from_images, ocr_session
+
+    saved: List[Tuple[str, np.ndarray]] = []  # (filename, full-resolution capture)
+    for i, current_single_screen_np in changed_screens:
+        # Generate a unique filename for this screen's capture: the capture timestamp, screen
+        # index and a short UUID, so screens recorded in the same second don't collide.
+        filename_base = f"{current_timestamp}_{i}_{uuid.uuid4().hex[:8]}" # Shorter UUID
+        filename_webp = filename_base + ".webp"
+        filepath_webp = os.path.join(screenshots_path, filename_webp)
+
+        # Save the image (after thumbnailing) as WEBP. Only changed screens are
+        # thumbnailed; the similarity checks work without a thumbnail.
+        pil_to_save = Image.fromarray(current_single_screen_np)
+        pil_to_save.thumbnail((MAX_IMAGE_WIDTH, MAX_IMAGE_HEIGHT), Image.LANCZOS)
 
-    loop_count = 0
+        try:
+            pil_to_save.save(
+                filepath_webp,
+                format="WEBP",
+                quality=WEBP_QUALITY,
+                method=WEBP_METHOD
+            )
+        except Exception as e:
+            print(f"Error saving screenshot {filepath_webp}: {e}", file=sys.stderr)
+            continue # Skip processing this screen if save fails
+        saved.append((filename_webp, current_single_screen_np))
+    if not saved:
+        return
+
+    # Perform OCR on the *original* full-resolution images for best quality, all
+    # screens in one call so they are recognized concurrently
+    texts = [""] * len(saved)
+    try:
+        # This worker thread's PyObjC temporaries are drained in one autorelease pool
+        with ocr_session():
+            texts = extract_text_from_images([img for _, img in saved])
+    except Exception as e:
+        print(f"OCR error for {', '.join(name for name, _ in saved)}: {e}", file=sys.stderr)
+        # These entries will lack text.
+
+    rows = []
+    for (filename_webp, _), text_content in zip(saved, texts):
+        embedding_vector = np.array([])
+        if text_content and text_content.strip():
+            try:
+                embedding_vector = get_embedding(text_content)
+            except Exception as e:
+                print(f"Embedding error for {filename_webp}: {e}", file=sys.stderr)
+        # Timestamped when the screens were grabbed; the app and smart title are shared
+        # by the cycle's screens, and the filename is unique per screen
+        rows.append((text_content, current_timestamp, embedding_vector,
+                     active_app_for_db, title_for_db, filename_webp, active_url))
+
+    # Insert into the database in one transaction. The timestamp column is UNIQUE
+    # (ON CONFLICT DO NOTHING), so if several screens change in the same second only
+    # the first one inserted gets an entry; filenames stay distinct.
+    db_ids = insert_entries(rows)
+    for row, db_id in zip(rows, db_ids):
+        if db_id is None and get_entry_by_timestamp(current_timestamp):
+            print(f"INFO: Screenshot {row[5]} (ts: {current_timestamp}) likely skipped due to existing DB entry for this timestamp.", file=sys.stderr)
+
+
+# --- Capture Producer ---
+# The grab thread hands captures to the recording thread through a one-slot queue.
+# A capture the recording thread hasn't taken yet is replaced by a newer one, so
+# it always processes the latest screen state, however long processing takes.
+_frame_queue: "queue.Queue[Tuple[List[np.ndarray], float, int]]" = queue.Queue(maxsize=1)
+_grab_interval = 1.0  # Seconds between captures; set by the recording thread
+
+
+def _set_grab_interval(seconds: float) -> None:
+    global _grab_interval
+    _grab_interval = seconds
+
+
+def _offer_frame(frame: Tuple[List[np.ndarray], float, int]) -> None:
+    """Puts a capture on _frame_queue, dropping any capture still waiting there."""
+    try:
+        _frame_queue.get_nowait()
+    except queue.Empty:
+        pass
+    _frame_queue.put_nowait(frame) # Only this thread puts, so the slot is free
+
+
+def _grab_loop() -> None:
+    """Grab thread: captures all screens every _grab_interval seconds while capture is active."""
     while True:
         capture_active_event.wait() # Thread will pause here if event is cleared
 
@@ -217,237 +538,104 @@ def record_screenshots_thread() -> None:
             time.sleep(min(IDLE_THRESHOLD / 2, 5.0)) # Sleep adaptively when idle
             continue
 
-        # Take new screenshots
+        # Take new screenshots (the one wall-clock timestamp of this capture, and a
+        # monotonic start time so the interval between grabs doesn't drift)
+        grab_started = time.monotonic()
+        capture_timestamp = int(time.time())
         current_screenshots_np_list = take_screenshots()
         if not current_screenshots_np_list: # Failed to capture (e.g., screensaver, no display)
             print("Warning: Failed to capture current screenshots. Retrying in 5s.", file=sys.stderr)
             time.sleep(5)
             continue
-        
+
+        _offer_frame((current_screenshots_np_list, idle_seconds, capture_timestamp))
+        time.sleep(max(0.0, _grab_interval - (time.monotonic() - grab_started)))
+
+
+# --- Main Screenshot Recording Thread ---
+def record_screenshots_thread() -> None:
+    """
+    Continuously records screenshots, processes them, and stores relevant data if significant changes are detected.
+    Handles multiple monitors, idle time, self-view prevention, and similarity checks.
+    """
+    # Ensure TOKENIZERS_PARALLELISM is set to false if using Hugging Face tokenizers indirectly
+    # This is often done to prevent deadlocks when using tokenizers in threads with multiprocessing.
+    # If not using HF tokenizers directly here, this might be less critical for this specific file.
+    os.environ["TOKENIZERS_PARALLELISM"] = "false"
+
+    # Screens are grabbed by a producer thread, so the next grab overlaps with processing
+    # (saving, OCR, embedding) of the current one.
+    Thread(target=_grab_loop, daemon=True, name="eidon-grab").start()
+
+    # Initialize with an initial capture to have a baseline
+    last_captured_screenshots_np: List[np.ndarray] = []
+    last_captured_signatures: List[Optional[Tuple[int, np.ndarray]]] = []  # None: not computed yet
+
+    loop_count = 0
+    while True:
+        # Wait for the freshest capture, timestamped when it was grabbed (the grab thread
+        # pauses when capture is paused or the user is idle, and retries failed captures itself)
+        current_screenshots_np_list, idle_seconds, current_timestamp = _frame_queue.get()
+
         # Get active window URL for self-view check
         active_url: Optional[str] = get_active_page_url()
         if active_url and any(self_part in active_url for self_part in SELF_VIEW_URL_PARTS):
             # print(f"Self-view detected ({active_url}). Skipping capture.", file=sys.stderr) # Debug
             # Update last_screenshots to current (skipped) view to prevent immediate recapture on tab switch
-            last_captured_screenshots_np = current_screenshots_np_list
-            current_pil_thumbs = []
-            for np_array in current_screenshots_np_list:
-                img = Image.fromarray(np_array)
-                img.thumbnail((MAX_IMAGE_WIDTH, MAX_IMAGE_HEIGHT), Image.LANCZOS)
-                current_pil_thumbs.append(img)
-            last_captured_phashes = _get_phashes_from_pil_images(current_pil_thumbs)
-            time.sleep(3) # Wait a bit longer if viewing self
+            last_captured_screenshots_np, last_captured_signatures = _new_baseline(current_screenshots_np_list)
+            _set_grab_interval(3.0) # Wait a bit longer if viewing self
             continue
 
-        # Handle changes in the number of monitors
+        # Handle changes in the number of monitors (including the initial, empty baseline)
         if len(current_screenshots_np_list) != len(last_captured_screenshots_np):
-            print(f"Monitor configuration changed from {len(last_captured_screenshots_np)} to {len(current_screenshots_np_list)} screens. Re-initializing baseline.", file=sys.stderr)
-            last_captured_screenshots_np = current_screenshots_np_list
-            current_pil_thumbs = []
-            for np_array in current_screenshots_np_list:
-                img = Image.fromarray(np_array)
-                img.thumbnail((MAX_IMAGE_WIDTH, MAX_IMAGE_HEIGHT), Image.LANCZOS)
-                current_pil_thumbs.append(img)
-            last_captured_phashes = _get_phashes_from_pil_images(current_pil_thumbs)
-            time.sleep(3) # Pause briefly after monitor change
+            if last_captured_screenshots_np:
+                print(f"Monitor configuration changed from {len(last_captured_screenshots_np)} to {len(current_screenshots_np_list)} screens. Re-initializing baseline.", file=sys.stderr)
+            last_captured_screenshots_np, last_captured_signatures = _new_baseline(current_screenshots_np_list)
+            _set_grab_interval(3.0) # Pause briefly after monitor change
             continue
-        
-        # If last capture was empty (e.g., initial failure), set it now
-        if not last_captured_screenshots_np:
-            last_captured_screenshots_np = current_screenshots_np_list
-            current_pil_thumbs = []
-            for np_array in current_screenshots_np_list:
-                img = Image.fromarray(np_array)
-                img.thumbnail((MAX_IMAGE_WIDTH, MAX_IMAGE_HEIGHT), Image.LANCZOS)
-                current_pil_thumbs.append(img)
-            last_captured_phashes = _get_phashes_from_pil_images(current_pil_thumbs)
-
 
         something_processed_this_cycle = False
-        current_timestamp = int(time.time()) # Get a base timestamp for this capture cycle
-
-        for i, current_single_screen_np in enumerate(current_screenshots_np_list):
-            # Ensure corresponding last_screenshot and last_phash exist
-            if i >= len(last_captured_screenshots_np) or i >= len(last_captured_phashes):
-                print(f"Warning: Index {i} out of bounds for last capture data. Skipping this screen for similarity.", file=sys.stderr)
-                # This should ideally be caught by monitor change logic, but as a safeguard.
-                # We will process it as a "new" screen without similarity check.
-                # To do that, we need to make sure a placeholder is there or handle it.
-                # For now, let's just process it as if it's completely new.
-                is_mssim_similar = False
-                hamming_dist_low_enough = False
-            else:
-                # Compare with the corresponding screen from the last capture
-                last_single_screen_np = last_captured_screenshots_np[i]
-                last_single_screen_phash = last_captured_phashes[i]
-
-                # 1. MSSIM check (on full-resolution or consistently scaled images)
-                # For performance, MSSIM might be too slow if done on every screen every second.
-                # Consider doing it less frequently or only if phash suggests high similarity.
-                # For now, doing both.
-                is_mssim_similar = is_similar_mssim(current_single_screen_np, last_single_screen_np)
-
-                # 2. Perceptual Hash (phash) check (on thumbnails)
-                current_pil_thumb = Image.fromarray(current_single_screen_np)
-                current_pil_thumb.thumbnail((MAX_IMAGE_WIDTH, MAX_IMAGE_HEIGHT), Image.LANCZOS)
-                current_phash = imagehash.phash(current_pil_thumb)
-                
-                hamming_distance = current_phash - last_single_screen_phash
-                hamming_dist_low_enough = hamming_distance <= MIN_HAMMING_DISTANCE
-            
-            if is_mssim_similar and hamming_dist_low_enough:
-                # print(f"Screen {i}: Similar (MSSIM & phash). Skipping.", file=sys.stderr) # Debug
-                continue # Skip this screen if both checks indicate similarity
-
-            # --- Significant Change Detected - Process This Screen ---
-            something_processed_this_cycle = True
-            print(f"Screen {i}: Change detected. Processing. MSSIM similar: {is_mssim_similar}, Hamming dist: {hamming_distance if 'hamming_distance' in locals() else 'N/A'}", file=sys.stderr)
-
-
-            # Update the baseline for this specific screen
-            last_captured_screenshots_np[i] = current_single_screen_np
-            if 'current_phash' in locals(): # Ensure current_phash was calculated
-                 last_captured_phashes[i] = current_phash
-            else: # Recalculate if skipped comparison
-                temp_thumb = Image.fromarray(current_single_screen_np)
-                temp_thumb.thumbnail((MAX_IMAGE_WIDTH, MAX_IMAGE_HEIGHT), Image.LANCZOS)
-                last_captured_phashes[i] = imagehash.phash(temp_thumb)
-
-
-            # Generate a unique filename for this screen's capture
-            # Use the per-cycle timestamp + screen index + UUID for uniqueness
-            # Adding a tiny delay for multi-screen to potentially get different sub-second timestamps if needed,
-            # but DB has UNIQUE on timestamp. So, screen index is more for filename uniqueness.
-            # We need to ensure the timestamp for DB insert is unique *per entry*.
-            # One strategy: use current_timestamp + small_offset_for_screen_i, or ensure DB handles this.
-            # The database `ON CONFLICT(timestamp) DO NOTHING` will handle exact second collisions.
-            # For now, let's use the cycle's `current_timestamp` for all screens in this batch.
-            # The filename uniqueness is handled by `_{i}_{uuid}`.
-            
-            # Use the timestamp for *this specific screen processing start*
-            # This is more robust if processing multiple screens takes time.
-            screen_specific_timestamp = int(time.time()) 
-            if i > 0: # If not the first screen, ensure timestamp is at least different
-                screen_specific_timestamp = max(screen_specific_timestamp, current_timestamp + i) # A bit artificial but ensures different ts for db if needed
-                                                                                                 # The best is DB just handles collision on exact second.
-                                                                                                 # So, use `current_timestamp` if DB `ON CONFLICT` is reliable.
-                                                                                                 # Let's use the cycle timestamp for now and let DB handle conflicts.
-                                                                                                 # If this becomes an issue (too many skipped inserts), refine timestamping.
-
-
-            filename_base = f"{current_timestamp}_{i}_{uuid.uuid4().hex[:8]}" # Shorter UUID
-            filename_webp = filename_base + ".webp"
-            filepath_webp = os.path.join(screenshots_path, filename_webp)
-
-            # Save the image (after thumbnailing) as WEBP
-            # The 'current_pil_thumb' is already created if phash was calculated.
-            # If not (e.g. first pass or error in phash section), create it.
-            if 'current_pil_thumb' not in locals() or i >= len(last_captured_phashes): # ensure it's for the current screen
-                pil_to_save = Image.fromarray(current_single_screen_np)
-                pil_to_save.thumbnail((MAX_IMAGE_WIDTH, MAX_IMAGE_HEIGHT), Image.LANCZOS)
-            else:
-                pil_to_save = current_pil_thumb # Reuse the thumbnailed image
 
-            try:
-                pil_to_save.save(
-                    filepath_webp,
-                    format="WEBP",
-                    quality=WEBP_QUALITY,
-                    method=6  # Slower, but often better compression
-                )
-            except Exception as e:
-                print(f"Error saving screenshot {filepath_webp}: {e}", file=sys.stderr)
-                continue # Skip processing this screen if save fails
-
-            # Perform OCR on the *original* full-resolution image for best quality
-            # Note: current_single_screen_np is the full-res numpy array.
-            text_content = ""
-            try:
-                text_content = extract_text_from_image(current_single_screen_np)
-            except Exception as e:
-                print(f"OCR error for {filename_webp}: {e}", file=sys.stderr)
-                # Optionally, clean up the saved image if OCR fails critically
-                # try: os.remove(filepath_webp) except OSError as rm_err: print(f"Error removing {filepath_webp}: {rm_err}")
-                # Continue processing other screens or next cycle, but this entry will lack text.
-
-            embedding_vector = np.array([])
-            if text_content and text_content.strip():
-                try:
-                    embedding_vector = get_embedding(text_content)
-                except Exception as e:
-                    print(f"Embedding error for {filename_webp}: {e}", file=sys.stderr)
-            
-            # Get metadata (app, title, URL) - this is for the state at the start of the capture cycle
-            current_app_name = get_active_app_name()
-            current_window_title_from_os = get_active_window_title()
-            # active_url is already fetched for self-view check (ensure it's defined in this scope or re-fetch if needed)
-            # If active_url might not be set from the self-view check block, ensure it's fetched here:
-            # active_url = get_active_page_url() # Uncomment if active_url might not be consistently set
-
-            title_for_db = generate_smart_title(
-                app_name=current_app_name,
-                window_title=current_window_title_from_os,
-                url=active_url # Pass the fetched active_url
-            )
-            # Ensure active_app for DB is not empty
-            active_app_for_db = current_app_name or "Unknown App"
-
-            # Insert into database
-            # Use `current_timestamp` which is shared for all screens in this cycle.
-            # The DB's `ON CONFLICT(timestamp) DO NOTHING` will prevent duplicates if another screen
-            # from a *previous* cycle coincidentally had the exact same timestamp and was processed.
-            # If multiple screens in the *same* cycle use the same `current_timestamp`,
-            # only the first one processed for that timestamp will be inserted. This is a known limitation
-            # if we need per-screen entries with identical timestamps.
-            # A solution is composite primary key (timestamp, screen_idx) or ensuring unique timestamps.
-            # For now, relying on the fact that processing screens takes *some* time, or if not,
-            # the DB skips subsequent inserts for that exact second.
-            # Let's try to use a slightly offset timestamp for DB to differentiate screens in same cycle
-            # This is a bit of a hack. A proper solution would be a composite key or more robust timestamp generation.
-            
-            # Using a timestamp specific to this screen's processing, but ensuring it's not before the cycle's base.
-            # This makes it more likely each screen in a multi-monitor setup gets a unique DB entry if processed rapidly.
-            db_timestamp = max(int(time.time()), current_timestamp) # Ensure it's at least the cycle start
-            
-            # If multiple screens, add a small increment to the timestamp for subsequent screens
-            # This helps avoid DB collision if processing is very fast.
-            if len(current_screenshots_np_list) > 1 and i > 0 :
-                 # Check if previous screen used this exact timestamp (unlikely due to processing time, but safeguard)
-                 # This is tricky without querying db. A simpler approach:
-                 db_timestamp_candidate = current_timestamp + i # Artificial increment for uniqueness
-                 # We need to ensure this candidate isn't already taken by a *previous successful insert*
-                 # For now, let's use the candidate and rely on ON CONFLICT for true duplicates.
-                 # A better way: if the DB supported (timestamp, screen_idx) as unique key.
-                 # Given current DB: if multiple screens are processed within the same second,
-                 # only the first will get in for that `current_timestamp`.
-                 # Let's stick to `current_timestamp` and document that only one entry per second is stored currently.
-                 # filename identifies the screen.
-                 pass # Sticking with current_timestamp for DB, filename is unique.
-
-            db_id = insert_entry(
-                text=text_content,
-                timestamp=current_timestamp, # Using the cycle's base timestamp for DB entry
-                embedding=embedding_vector,
-                app=active_app_for_db, # Use the potentially non-empty app name
-                title=title_for_db,    # Use the new smart title
-                filename=filename_webp, # Filename is unique per screen
-                page_url=active_url
+        screen_count = len(current_screenshots_np_list)
+        screen_args = [
+            (i, current_single_screen_np, last_captured_screenshots_np[i], last_captured_signatures[i])
+            for i, current_single_screen_np in enumerate(current_screenshots_np_list)
+        ]
+        if screen_count > 1:
+            results = list(_screen_pool.map(lambda args: _process_one_screen(*args), screen_args))
+        else:
+            results = [_process_one_screen(*args) for args in screen_args]
+
+        changed_screens = [
+            (i, current_screenshots_np_list[i]) for i, (changed, _) in enumerate(results) if changed
+        ]
+        if changed_screens:
+            # Record all changed screens as one job (one DB transaction), with metadata
+            # resolved now, while it still describes this capture
+            active_app_for_db, title_for_db = _app_and_title(active_url)
+            something_processed_this_cycle = _submit_persist(
+                changed_screens, current_timestamp, active_app_for_db, title_for_db, active_url,
             )
-            if db_id is None and get_entry_by_timestamp(current_timestamp):
-                print(f"INFO: Screenshot {filename_webp} (ts: {current_timestamp}) likely skipped due to existing DB entry for this timestamp.", file=sys.stderr)
-
-
-            # Brief pause if processing multiple screens to allow system to catch up slightly
-            if len(current_screenshots_np_list) > 1 and i < len(current_screenshots_np_list) - 1:
-                time.sleep(0.05) # Very short pause
-
-        # Determine sleep duration for the next cycle
+            if not something_processed_this_cycle:
+                # Too much recorded work is still pending; leave the baselines alone so
+                # these changes are detected (and recorded) again on a later cycle
+                print(f"Screens {[i for i, _ in changed_screens]}: Recording backlog full. Deferring.", file=sys.stderr)
+
+        for i, (changed, baseline_signature) in enumerate(results):
+            if changed and not something_processed_this_cycle:
+                continue
+            if changed:
+                # Update the baseline for this specific screen
+                last_captured_screenshots_np[i] = current_screenshots_np_list[i]
+            last_captured_signatures[i] = baseline_signature
+
+        # Determine the delay before the next capture
         loop_interval = 3.0 # Base interval in seconds
         if not something_processed_this_cycle and idle_seconds < IDLE_THRESHOLD:
             # If nothing changed and user is active, check more frequently.
             loop_interval = 1.0
         
-        time.sleep(loop_interval)
+        _set_grab_interval(loop_interval)
         loop_count += 1
         # if loop_count % 10 == 0: print(f"Capture loop {loop_count} completed. Idle: {idle_seconds:.1f}s", file=sys.stderr) # Periodic status
 
@@ -1,21 +1,21 @@
 import sys
 import datetime
 import re
+import shutil
 import subprocess # For platform-specific commands
+import threading
 import time # For potential timeouts or delays
-from typing import Tuple, Optional
+from functools import lru_cache, wraps
+from typing import List, Sequence, Tuple, Optional
 import os # Already implicitly there via sys, but good practice if used directly
 from urllib.parse import urlparse, unquote # For URL parsing in title generation
 
-# --- Attempt to import dateutil for flexible date/time parsing ---
-try:
-    from dateutil import parser as dateutil_parser
-    from dateutil.tz import tzlocal # For handling local timezone if needed
-except ImportError:
-    dateutil_parser = None
-    # print("Warning: 'python-dateutil' not found. Date/time parsing in search filters will be less flexible.", file=sys.stderr)
+import numpy as np
 
-# --- Platform-specific imports for system interaction ---
+# --- Optional and platform-specific imports, loaded on first use ---
+# dateutil and the PyObjC/pywin32 bridges take a while to import, and most users of
+# this module (the web app's time formatting and filter parsing) rarely or never need them.
+dateutil_parser = None
 psutil = None
 win32gui = None
 win32process = None
@@ -25,102 +25,210 @@ CGWindowListCopyWindowInfo = None
 kCGNullWindowID = None
 kCGWindowListOptionOnScreenOnly = None
 
-if sys.platform == "win32": # Windows
+@lru_cache(maxsize=None)
+def _load_dateutil() -> None:
+    """Imports dateutil's parser (for flexible date/time parsing), if installed."""
+    global dateutil_parser
     try:
-        import psutil
-        import win32gui
-        import win32process
-        # import win32api # Not used in this version for active window info
+        from dateutil import parser as dateutil_parser
     except ImportError:
-        print("Warning: 'psutil' or 'pywin32' not found. Active window/app info may be unavailable on Windows.", file=sys.stderr)
-elif sys.platform == "darwin": # macOS
-    try:
-        from AppKit import NSWorkspace
-        from Quartz import CGWindowListCopyWindowInfo, kCGNullWindowID, kCGWindowListOptionOnScreenOnly
-    except ImportError:
-        print("Warning: PyObjC 'AppKit' or 'Quartz' not found. Active window/app info may be unavailable on macOS.", file=sys.stderr)
+        pass
+        # print("Warning: 'python-dateutil' not found. Date/time parsing in search filters will be less flexible.", file=sys.stderr)
+
+@lru_cache(maxsize=None)
+def _load_platform_modules() -> None:
+    """Imports this platform's modules for system interaction (active window/app/URL)."""
+    global psutil, win32gui, win32process, NSWorkspace
+    global CGWindowListCopyWindowInfo, kCGNullWindowID, kCGWindowListOptionOnScreenOnly
+    if sys.platform == "win32": # Windows
+        try:
+            import psutil
+            import win32gui
+            import win32process
+            # import win32api # Not used in this version for active window info
+        except ImportError:
+            print("Warning: 'psutil' or 'pywin32' not found. Active window/app info may be unavailable on Windows.", file=sys.stderr)
+    elif sys.platform == "darwin": # macOS
+        try:
+            from AppKit import NSWorkspace
+            from Quartz import CGWindowListCopyWindowInfo, kCGNullWindowID, kCGWindowListOptionOnScreenOnly
+        except ImportError:
+            print("Warning: PyObjC 'AppKit' or 'Quartz' not found. Active window/app info may be unavailable on macOS.", file=sys.stderr)
 # Linux uses subprocess for xprop, no special Python package imports here.
 
 
 # --- Time Formatting Functions ---
+# (seconds per unit, unit name), largest first; months and years are 30 and 365 days
+_HR_UNITS = (
+    (365 * 86400, "year"),
+    (30 * 86400, "month"),
+    (86400, "day"),
+    (3600, "hour"),
+    (60, "minute"),
+    (1, "second"),
+)
+
 def human_readable_time(timestamp: int) -> str:
     """Converts a Unix timestamp into a human-readable relative time string."""
-    now_dt = datetime.datetime.now(tzlocal() if dateutil_parser else None) # Use local timezone if possible
+    # Unix timestamps are timezone-independent, so the difference needs no datetimes
     try:
-        # Ensure timestamp is treated as UTC then converted to local for comparison if needed
-        # For simplicity, assuming timestamps are "naive" or already in local system's context
-        dt_object = datetime.datetime.fromtimestamp(timestamp, tzlocal() if dateutil_parser else None)
-    except (TypeError, ValueError, OSError): # Handle invalid timestamp or out of range
+        delta = int(time.time() - timestamp)
+    except TypeError: # Handle invalid timestamp
         return "Invalid date"
-        
-    diff = now_dt - dt_object
 
-    if diff.total_seconds() < 0: # Timestamp is in the future
+    if delta < 0: # Timestamp is in the future
         return "In the future" # Or format as absolute date/time
+    if delta < 5: # For very small differences, "just now" is better
+        return "Just now"
 
-    days = diff.days
-    seconds = diff.seconds # Seconds part of the timedelta (0 to 86399)
-
-    if days >= 365:
-        years = days // 365
-        return f"{years} year{'s' if years > 1 else ''} ago"
-    if days >= 30:
-        months = days // 30
-        return f"{months} month{'s' if months > 1 else ''} ago"
-    if days > 0:
-        return f"{days} day{'s' if days > 1 else ''} ago"
-    
-    # If less than a day, use seconds component of timedelta
-    if seconds >= 3600: # Hours
-        hours = seconds // 3600
-        return f"{hours} hour{'s' if hours > 1 else ''} ago"
-    if seconds >= 60: # Minutes
-        minutes = seconds // 60
-        return f"{minutes} minute{'s' if minutes > 1 else ''} ago"
-    if seconds >= 0: # Seconds
-        # For very small differences, "just now" is better
-        if seconds < 5:
-            return "Just now"
-        return f"{seconds} second{'s' if seconds != 1 else ''} ago"
-    
-    return "Just now" # Fallback for very small negative diffs if future check fails
+    for unit_seconds, unit_name in _HR_UNITS:
+        if delta >= unit_seconds:
+            count = delta // unit_seconds
+            return f"{count} {unit_name}{'s' if count != 1 else ''} ago"
+    return "Just now" # Not reached: delta >= 5 matches the seconds unit
+
+
+_HR_UNIT_SECONDS_ASC = np.array([unit_seconds for unit_seconds, _ in reversed(_HR_UNITS)], dtype=np.int64)
+_HR_UNIT_NAMES_ASC = [unit_name for _, unit_name in reversed(_HR_UNITS)]
 
+def human_readable_times(timestamps: Sequence[Optional[int]], now: Optional[float] = None) -> List[str]:
+    """
+    human_readable_time() for many timestamps at once (e.g. a page of search results):
+    the differences, units and counts are computed with NumPy, leaving only the string
+    formatting per timestamp. None timestamps give "Invalid date", as in human_readable_time().
+    """
+    valid = [ts is not None for ts in timestamps]
+    values = np.array([ts if ok else 0 for ts, ok in zip(timestamps, valid)], dtype=np.float64)
+    delta = np.trunc((time.time() if now is None else now) - values).astype(np.int64)
+    # Index (in ascending order) of the largest unit not exceeding each difference
+    unit_idx = np.searchsorted(_HR_UNIT_SECONDS_ASC, delta, side='right') - 1
+    counts = delta // _HR_UNIT_SECONDS_ASC[np.maximum(unit_idx, 0)]
+    out = []
+    for ok, d, i, count in zip(valid, delta.tolist(), unit_idx.tolist(), counts.tolist()):
+        if not ok:
+            out.append("Invalid date")
+        elif d < 0:
+            out.append("In the future")
+        elif d < 5:
+            out.append("Just now")
+        else:
+            out.append(f"{count} {_HR_UNIT_NAMES_ASC[i]}{'s' if count != 1 else ''} ago")
+    return out
+
+
+@lru_cache(maxsize=4096)
+def _format_timestamp(timestamp: int, fmt: str) -> str:
+    # time.strftime on a struct_time skips building a datetime object
+    return time.strftime(fmt, time.localtime(timestamp))
 
 def timestamp_to_human_readable(timestamp: int, default_format: str = "%Y-%m-%d %H:%M:%S") -> str:
     """
     Converts a Unix timestamp into a human-readable absolute date/time string.
+    Cached, since every search result and timeline entry is formatted on each page render.
     """
     try:
-        dt_object = datetime.datetime.fromtimestamp(timestamp)
-        return dt_object.strftime(default_format)
-    except (TypeError, ValueError, OSError):
+        return _format_timestamp(int(timestamp), default_format)
+    except (TypeError, ValueError, OverflowError, OSError):
         return "Invalid Timestamp"
 
 # --- Search Filter Parsing ---
+# Compiled once at import; the search box parses the query on every request.
+# One scan finds every filter (key:value, key: value, or key:"quoted value"). Quoted
+# phrases are matched too, so filter-like text inside them stays in the core query.
+_FILTER_RE = re.compile(
+    r"""(?P<quoted>"[^"]*"|'[^']*')"""
+    r"""|(?<!\S)(?P<key>date|time|title|url):\s*(?:"(?P<dq>[^"]*)"|'(?P<sq>[^']*)'|(?P<bare>\S+))""",
+    re.IGNORECASE,
+)
+# Date and time filter values, classified in one match instead of trying strptime
+# formats in turn. Date forms: YYYY-MM-DD; MM/DD/YYYY or DD/MM/YYYY (either separator,
+# used consistently); MM/DD or MM-DD (this year).
+_DATE_RE = re.compile(
+    r"^(?:(?P<iso_y>\d{4})-(?P<iso_m>\d{1,2})-(?P<iso_d>\d{1,2})"
+    r"|(?P<a>\d{1,2})(?P<sep>[/-])(?P<b>\d{1,2})(?P=sep)(?P<y>\d{4})"
+    r"|(?P<md_m>\d{1,2})[/-](?P<md_d>\d{1,2}))$"
+)
+# Time forms: HH:MM[:SS] (24-hour), or H[:MM[:SS]] followed by am/pm
+_TIME_RE = re.compile(
+    r"^(?P<h>\d{1,2})(?::(?P<m>\d{2})(?::(?P<s>\d{2}))?)?\s*(?P<ampm>[ap]m)?$", re.IGNORECASE
+)
+
+# dateutil can only parse values containing a number or a month/weekday name; anything
+# else skips it rather than paying for its failed parse (and raised ParserError)
+_DATEUTIL_HINT_RE = re.compile(r"\d|jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec|mon|tue|wed|thu|fri|sat|sun", re.IGNORECASE)
+
+
+def _match_date(value: str, today: datetime.date) -> Optional[datetime.date]:
+    """Parses value if it is one of the _DATE_RE forms; None otherwise (or if the date is invalid)."""
+    m = _DATE_RE.match(value)
+    if not m:
+        return None
+    try:
+        if m.group('iso_y'):
+            return datetime.date(int(m.group('iso_y')), int(m.group('iso_m')), int(m.group('iso_d')))
+        if m.group('y'):
+            year, a, b = int(m.group('y')), int(m.group('a')), int(m.group('b'))
+            try:
+                return datetime.date(year, a, b) # Month first...
+            except ValueError:
+                return datetime.date(year, b, a) # ...unless only day first is a valid date
+        return datetime.date(today.year, int(m.group('md_m')), int(m.group('md_d')))
+    except ValueError:
+        return None
+
+
+def _match_time(value: str) -> Optional[datetime.time]:
+    """Parses value if it is one of the _TIME_RE forms; None otherwise (or if the time is invalid)."""
+    m = _TIME_RE.match(value)
+    if not m:
+        return None
+    hour = int(m.group('h'))
+    minute = int(m.group('m') or 0)
+    second = int(m.group('s') or 0)
+    ampm = m.group('ampm')
+    if ampm:
+        if not 1 <= hour <= 12:
+            return None
+        hour = hour % 12 + (12 if ampm.lower() == 'pm' else 0)
+    elif m.group('m') is None: # A bare number is not a 24-hour time
+        return None
+    try:
+        return datetime.time(hour, minute, second)
+    except ValueError:
+        return None
+
+
 def _parse_single_filter_value(key: str, value_str: str, current_datetime: datetime.datetime):
     """Helper to parse individual filter values for date and time."""
     # Ensure value_str is stripped of leading/trailing quotes for date/time parsing
-    value_str_cleaned = value_str.strip("'\"")
+    return _parse_filter_value_cached(key, value_str.strip("'\""), current_datetime.date())
+
+
+@lru_cache(maxsize=256)
+def _parse_filter_value_cached(key: str, value_str_cleaned: str, today: datetime.date):
+    """
+    Parses a date or time filter value (see _parse_single_filter_value). Cached, since
+    search-as-you-type re-parses the same filters on every keystroke; keying on today's
+    date makes relative values like "today" re-parse once the day changes.
+    """
+    # Unspecified parts of dateutil-parsed values come from the start of today, so the
+    # result depends only on the cache key
+    default_datetime = datetime.datetime.combine(today, datetime.time())
 
     if key == 'date':
         if value_str_cleaned.lower() == "today":
-            return current_datetime.date()
+            return today
         if value_str_cleaned.lower() == "yesterday":
-            return (current_datetime - datetime.timedelta(days=1)).date()
+            return today - datetime.timedelta(days=1)
 
-        common_date_formats = ("%Y-%m-%d", "%m/%d/%Y", "%m-%d-%Y", "%d-%m-%Y", "%d/%m/%Y", "%m/%d", "%m-%d")
-        for fmt in common_date_formats:
-            try:
-                dt = datetime.datetime.strptime(value_str_cleaned, fmt)
-                if fmt in ("%m/%d", "%m-%d"): 
-                    dt = dt.replace(year=current_datetime.year)
-                return dt.date()
-            except ValueError:
-                continue
-        
-        if dateutil_parser:
+        parsed_date = _match_date(value_str_cleaned, today)
+        if parsed_date is not None:
+            return parsed_date
+
+        _load_dateutil()
+        if dateutil_parser and _DATEUTIL_HINT_RE.search(value_str_cleaned):
             try:
-                return dateutil_parser.parse(value_str_cleaned, default=current_datetime, ignoretz=True).date()
+                return dateutil_parser.parse(value_str_cleaned, default=default_datetime, ignoretz=True).date()
             except (dateutil_parser.ParserError, ValueError, TypeError):
                 pass
         return None
@@ -130,24 +238,21 @@ def _parse_single_filter_value(key: str, value_str: str, current_datetime: datet
             start_str, end_str = value_str_cleaned.split('-', 1)
             try:
                 # Recursively call for single time parsing
-                start_time = _parse_single_filter_value('time', start_str.strip(), current_datetime) 
-                end_time = _parse_single_filter_value('time', end_str.strip(), current_datetime)
+                start_time = _parse_filter_value_cached('time', start_str.strip(), today) 
+                end_time = _parse_filter_value_cached('time', end_str.strip(), today)
                 if start_time and end_time:
                     return (start_time, end_time)
             except ValueError:
                 return None
         else: 
-            common_time_formats = ("%H:%M:%S", "%H:%M", "%I:%M%p", "%I%p", "%I:%M:%S%p")
-            for fmt in common_time_formats:
-                try:
-                    # Use .upper() for AM/PM matching consistency
-                    return datetime.datetime.strptime(value_str_cleaned.upper(), fmt.upper()).time()
-                except ValueError:
-                    continue
-            
-            if dateutil_parser:
+            parsed_time = _match_time(value_str_cleaned)
+            if parsed_time is not None:
+                return parsed_time
+
+            _load_dateutil()
+            if dateutil_parser and _DATEUTIL_HINT_RE.search(value_str_cleaned):
                 try:
-                    return dateutil_parser.parse(value_str_cleaned, default=current_datetime, ignoretz=True).time()
+                    return dateutil_parser.parse(value_str_cleaned, default=default_datetime, ignoretz=True).time()
                 except (dateutil_parser.ParserError, ValueError, TypeError):
                     pass
             return None
@@ -159,95 +264,92 @@ def parse_prefixed_filters(query_string: str) -> Tuple[dict, str]:
     Returns a dictionary of parsed filters and the remaining core query string.
     Handles quoted values for title and url.
     """
-    # Regex to find filter patterns: key:value (no space), key: "quoted value", or key value
-    # This regex is complex; an alternative is iterative token processing.
-    # For simplicity, let's stick to iterative token processing as it's more readable.
-    
-    tokens = []
-    # Preserve quoted strings as single tokens
-    # This regex splits by spaces, but keeps quoted sections together.
-    for part in re.split(r"""("[^"]*"|'[^']*')|\s+""", query_string):
-        if part is not None and part.strip():
-            tokens.append(part)
-
     filters = {}
-    core_query_parts = []
+    core_query_parts = [] # Text between filters, and filters whose values didn't parse
     current_dt = datetime.datetime.now()
-    i = 0
-    
-    while i < len(tokens):
-        token = tokens[i]
-        potential_key_match = re.match(r"^(date|time|title|url):$", token, re.IGNORECASE)
-        
-        key = ""
-        value_str = ""
-
-        if potential_key_match: # e.g., "date:"
-            key = potential_key_match.group(1).lower()
-            if i + 1 < len(tokens):
-                value_str = tokens[i+1]
-                i += 2 # Consumed key and value
-            else: # Key without a value, treat as core query
-                core_query_parts.append(token)
-                i += 1
-                continue
-        elif ':' in token and not (token.startswith('"') or token.startswith("'")): 
-            # e.g., "date:2023-01-01" or "title:MyReport"
-            parts = token.split(':', 1)
-            if parts[0].lower() in ('date', 'time', 'title', 'url') and len(parts) == 2:
-                key = parts[0].lower()
-                value_str = parts[1]
-                i += 1 # Consumed one token
-            else: # Not a valid filter structure
-                core_query_parts.append(token)
-                i += 1
-                continue
-        else: # Not a filter, part of core query
-            core_query_parts.append(token)
-            i += 1
-            continue
+    last_end = 0
 
-        # Process the extracted key and value_str
-        if key:
-            # Strip quotes from value_str if they are outer quotes (e.g. from regex capture)
-            if (value_str.startswith('"') and value_str.endswith('"')) or \
-               (value_str.startswith("'") and value_str.endswith("'")):
-                value_str_cleaned = value_str[1:-1]
-            else:
-                value_str_cleaned = value_str
-
-            if key in ('date', 'time'):
-                parsed_value_typed = _parse_single_filter_value(key, value_str_cleaned, current_dt)
-                if parsed_value_typed is not None:
-                    filters[key] = parsed_value_typed
-                else: # Parsing failed, add original filter part to core query
-                    core_query_parts.append(f"{key}:{value_str}") # Reconstruct original form
-            elif key in ('title', 'url'):
-                # For title and url, value_str_cleaned is the final value
-                # URL values are typically case-insensitive for matching domain/path parts
-                filters[key] = value_str_cleaned.lower() if key == 'url' else value_str_cleaned
-            # else: # Should not happen if key is one of the valid ones
-        # else: # Should not happen
-            
-    core_query_str = ' '.join(core_query_parts)
+    for m in _FILTER_RE.finditer(query_string):
+        if m.group('quoted') is not None: # Quoted phrase, part of the core query
+            continue
+        core_query_parts.append(query_string[last_end:m.start()])
+        last_end = m.end()
+
+        key = m.group('key').lower()
+        value_str = query_string[m.end('key') + 1:m.end()].lstrip() # As typed, with any quotes
+        if m.group('dq') is not None:
+            value_str_cleaned = m.group('dq')
+        elif m.group('sq') is not None:
+            value_str_cleaned = m.group('sq')
+        else:
+            value_str_cleaned = m.group('bare')
+
+        if key in ('date', 'time'):
+            parsed_value_typed = _parse_single_filter_value(key, value_str_cleaned, current_dt)
+            if parsed_value_typed is not None:
+                filters[key] = parsed_value_typed
+            else: # Parsing failed, add original filter part to core query
+                core_query_parts.append(f" {key}:{value_str} ") # Reconstruct original form
+        else: # title or url
+            # URL values are typically case-insensitive for matching domain/path parts
+            filters[key] = value_str_cleaned.lower() if key == 'url' else value_str_cleaned
+
+    core_query_parts.append(query_string[last_end:])
+    core_query_str = ' '.join(''.join(core_query_parts).split())
     return filters, core_query_str
 
 
 # --- Platform Abstraction for Active Window/App/URL ---
 # (macOS, Windows, Linux specific getters are the same as in the previous response)
-def _get_active_app_name_osx() -> str:
+# Lookups spawn osascript (macOS URL) or xprop processes (Linux) per call, and the
+# capture loop asks every frame for values that rarely change, so each result is reused
+# for ACTIVE_INFO_TTL seconds.
+ACTIVE_INFO_TTL = 0.5
+
+def _ttl_cached(func):
+    """Caches a no-argument function's result for ACTIVE_INFO_TTL seconds."""
+    cached = [float("-inf"), None]  # [monotonic time computed, value]
+
+    @wraps(func)
+    def wrapper():
+        now = time.monotonic()
+        if now - cached[0] >= ACTIVE_INFO_TTL:
+            cached[1] = func()
+            cached[0] = now
+        return cached[1]
+    return wrapper
+
+# NSApplicationProcessIdentifier of the last active app -> (NSApplicationName,
+# NSApplicationBundleIdentifier), so the name and URL lookups only convert the
+# workspace's reply to Python strings when the active app changes.
+_osx_app_cache = {}
+
+def _get_active_app_osx() -> Tuple[str, str]:
+    """Returns the active app's (name, bundle id), or ("", "") if unavailable."""
+    _load_platform_modules()
     if NSWorkspace:
         try:
             active_app_dict = NSWorkspace.sharedWorkspace().activeApplication()
-            return active_app_dict.get("NSApplicationName", "")
-        except Exception: return ""
-    return ""
+            pid = active_app_dict.get("NSApplicationProcessIdentifier")
+            app = _osx_app_cache.get(pid)
+            if app is None:
+                app = (str(active_app_dict.get("NSApplicationName") or ""),
+                       str(active_app_dict.get("NSApplicationBundleIdentifier") or ""))
+                _osx_app_cache.clear() # Only the latest app is kept
+                _osx_app_cache[pid] = app
+            return app
+        except Exception: return "", ""
+    return "", ""
+
+def _get_active_app_name_osx() -> str:
+    return _get_active_app_osx()[0]
 
 def _get_active_window_title_osx() -> str:
+    _load_platform_modules()
     if CGWindowListCopyWindowInfo and kCGNullWindowID and kCGWindowListOptionOnScreenOnly:
         try:
             window_list = CGWindowListCopyWindowInfo(kCGWindowListOptionOnScreenOnly, kCGNullWindowID)
-            active_app_name = _get_active_app_name_osx()
+            active_app_name = get_active_app_name() # Usually still cached from this frame
             for window in window_list:
                 if window.get("kCGWindowOwnerName") == active_app_name and window.get("kCGWindowLayer") == 0:
                     title = window.get("kCGWindowName", "")
@@ -256,39 +358,57 @@ def _get_active_window_title_osx() -> str:
         except Exception: return ""
     return ""
 
-def _get_active_page_url_osx() -> str:
-    browser_scripts = {
+# Browser bundle id -> AppleScript returning its active tab's URL. The AppleEvent timeout
+# keeps a hung browser from stalling the capture loop.
+_BROWSER_URL_SCRIPTS = {
+    bundle_id: f'with timeout of 1 second\n{script}\nend timeout'
+    for bundle_id, script in {
         "com.apple.Safari": 'tell application "Safari" to get URL of front document',
         "com.google.Chrome": 'tell application "Google Chrome" to get URL of active tab of front window',
         "company.thebrowser.Browser": 'tell application "Arc" to get URL of active tab of front window',
         "com.microsoft.edgemac": 'tell application "Microsoft Edge" to get URL of active tab of front window',
         "org.mozilla.firefox": 'tell application "Firefox" to get URL of active tab of front window'
-    }
-    if NSWorkspace:
+    }.items()
+}
+# Backstop for osascript itself (startup plus the 1 second AppleEvent timeout); on expiry
+# subprocess.run kills it, so a hung browser can't pile up osascript processes.
+OSASCRIPT_TIMEOUT = 1.5
+
+def _get_active_page_url_osx() -> str:
+    bundle_id = _get_active_app_osx()[1]
+    if bundle_id in _BROWSER_URL_SCRIPTS:
         try:
-            active_app_dict = NSWorkspace.sharedWorkspace().activeApplication()
-            bundle_id = active_app_dict.get("NSApplicationBundleIdentifier")
-            if bundle_id in browser_scripts:
-                script = browser_scripts[bundle_id]
-                process = subprocess.Popen(['osascript', '-e', script], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-                stdout, stderr = process.communicate(timeout=1.0) # Reduced timeout slightly
-                if process.returncode == 0 and stdout:
-                    return stdout.decode('utf-8').strip()
+            script = _BROWSER_URL_SCRIPTS[bundle_id]
+            process = subprocess.run(['osascript', '-e', script], capture_output=True, timeout=OSASCRIPT_TIMEOUT)
+            if process.returncode == 0 and process.stdout:
+                return process.stdout.decode('utf-8').strip()
+        except subprocess.TimeoutExpired: pass # osascript was killed
         except Exception: pass
     return ""
 
+# (hwnd, pid) of the last foreground window -> its process name. Opening the process
+# with psutil is the costly part, and the user usually stays in one window.
+_win_app_name_cache = {}
+
 def _get_active_app_name_windows() -> str:
+    _load_platform_modules()
     if psutil and win32gui and win32process:
         try:
             hwnd = win32gui.GetForegroundWindow()
             if not hwnd: return ""
             _, pid = win32process.GetWindowThreadProcessId(hwnd)
             if not pid: return ""
-            return psutil.Process(pid).name()
+            name = _win_app_name_cache.get((hwnd, pid))
+            if name is None:
+                name = psutil.Process(pid).name()
+                _win_app_name_cache.clear() # Only the latest window is kept
+                _win_app_name_cache[(hwnd, pid)] = name
+            return name
         except Exception: return ""
     return ""
 
 def _get_active_window_title_windows() -> str:
+    _load_platform_modules()
     if win32gui:
         try:
             hwnd = win32gui.GetForegroundWindow()
@@ -299,65 +419,130 @@ def _get_active_window_title_windows() -> str:
 
 def _get_active_page_url_windows() -> str: return "" # Placeholder
 
-def _get_linux_xprop_details(prop_name: str) -> Optional[str]:
+_XPROP_WINDOW_ID_RE = re.compile(r'window id # (0x[0-9a-fA-F]+)')
+_XPROP_WM_CLASS_RE = re.compile(r'WM_CLASS\(STRING\) = "([^"]+)", "([^"]+)"')
+_XPROP_NET_WM_NAME_RE = re.compile(r'_NET_WM_NAME\(UTF8_STRING\) = "([^"]*)"')
+
+@lru_cache(maxsize=None)
+def _xprop_path() -> Optional[str]:
+    """Absolute path of xprop (None if not installed), so each spawn skips the PATH search."""
+    return shutil.which('xprop')
+
+# A long-lived `xprop -spy` reports active-window changes as they happen, so lookups
+# don't spawn xprop just to find the active window.
+_spy_window_id: Optional[str] = None # Latest active window id it reported; None if unknown
+
+def _xprop_spy_loop(proc: subprocess.Popen) -> None:
+    global _spy_window_id
+    for line in proc.stdout:
+        match_id = _XPROP_WINDOW_ID_RE.search(line)
+        _spy_window_id = match_id.group(1) if match_id else None
+    _spy_window_id = None # xprop exited (e.g. the X server went away); lookups poll again
+
+@lru_cache(maxsize=None)
+def _start_xprop_spy(xprop: str) -> None:
     try:
-        xprop_root_cmd = ['xprop', '-root', '_NET_ACTIVE_WINDOW']
-        active_window_proc = subprocess.run(xprop_root_cmd, capture_output=True, text=True, timeout=0.5, check=False) # Shortened timeout
-        if active_window_proc.returncode != 0: return None
-        match_id = re.search(r'window id # (0x[0-9a-fA-F]+)', active_window_proc.stdout)
-        if not match_id: return None
-        window_id = match_id.group(1)
-        xprop_id_cmd = ['xprop', '-id', window_id, prop_name]
+        proc = subprocess.Popen([xprop, '-spy', '-root', '_NET_ACTIVE_WINDOW'],
+                                stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    except OSError: return
+    threading.Thread(target=_xprop_spy_loop, args=(proc,), daemon=True, name="eidon-xprop-spy").start()
+
+@_ttl_cached
+def _get_linux_active_details() -> Tuple[Optional[str], Optional[str]]:
+    """
+    Returns the active window's (WM_CLASS class name, _NET_WM_NAME title), each None if
+    unavailable. The window comes from the xprop spy (or, until it has reported, one xprop
+    call) and one xprop call reads both properties; the result is shared by the app-name
+    and title getters. The properties are read every time, since a window's title changes
+    without it losing focus.
+    """
+    xprop = _xprop_path()
+    if xprop is None: return None, None
+    _start_xprop_spy(xprop)
+    try:
+        window_id = _spy_window_id
+        if window_id is None:
+            xprop_root_cmd = [xprop, '-root', '_NET_ACTIVE_WINDOW']
+            active_window_proc = subprocess.run(xprop_root_cmd, capture_output=True, text=True, timeout=0.5, check=False) # Shortened timeout
+            if active_window_proc.returncode != 0: return None, None
+            match_id = _XPROP_WINDOW_ID_RE.search(active_window_proc.stdout)
+            if not match_id: return None, None
+            window_id = match_id.group(1)
+        xprop_id_cmd = [xprop, '-id', window_id, 'WM_CLASS', '_NET_WM_NAME'] # xprop prints each property on its own line
         prop_proc = subprocess.run(xprop_id_cmd, capture_output=True, text=True, timeout=0.5, check=False)
-        if prop_proc.returncode != 0: return None
-        if prop_name == 'WM_CLASS':
-            match_class = re.search(r'WM_CLASS\(STRING\) = "([^"]+)", "([^"]+)"', prop_proc.stdout)
-            return match_class.group(1) if match_class else None
-        elif prop_name == '_NET_WM_NAME':
-            match_name = re.search(r'_NET_WM_NAME\(UTF8_STRING\) = "([^"]*)"', prop_proc.stdout)
-            return match_name.group(1) if match_name else None
-    except Exception: return None
-    return None
-
-def _get_active_app_name_linux() -> str: return _get_linux_xprop_details('WM_CLASS') or ""
-def _get_active_window_title_linux() -> str: return _get_linux_xprop_details('_NET_WM_NAME') or ""
+        if prop_proc.returncode != 0: return None, None
+        match_class = _XPROP_WM_CLASS_RE.search(prop_proc.stdout)
+        match_name = _XPROP_NET_WM_NAME_RE.search(prop_proc.stdout)
+        return (match_class.group(1) if match_class else None,
+                match_name.group(1) if match_name else None)
+    except Exception: return None, None
+
+def _get_active_app_name_linux() -> str: return _get_linux_active_details()[0] or ""
+def _get_active_window_title_linux() -> str: return _get_linux_active_details()[1] or ""
 def _get_active_page_url_linux() -> str: return "" # Placeholder
 
+# Apps whose names contain one of these are treated as web browsers
+_BROWSER_APP_NAMES = ("safari", "google chrome", "arc", "microsoft edge", "firefox")
+# Exact (lowercased) names of common browsers, checked first with one set lookup
+_BROWSER_APP_NAMES_EXACT = frozenset(_BROWSER_APP_NAMES)
+# Browser name suffix on window titles, e.g. "Page - Google Chrome"
+_BROWSER_SUFFIX_RE = re.compile(r" - (?:Google Chrome|Mozilla Firefox|Safari|Microsoft Edge|Arc)$")
+# Window titles ending in one of these name a file (a tuple, so one str.endswith call checks them all)
+_FILE_EXT_TUPLE = (
+    '.py', '.js', '.ts', '.jsx', '.tsx', '.html', '.css', '.scss', '.json', '.xml', '.yaml', '.yml',
+    '.md', '.txt', '.rtf',
+    '.pdf', '.doc', '.docx', '.xls', '.xlsx', '.ppt', '.pptx',
+    '.png', '.jpg', '.jpeg', '.gif', '.webp', '.svg', '.mov', '.mp4', '.avi', '.mkv',
+    '.zip', '.tar', '.gz'
+)
+
+def _url_netloc_and_path_parts(url: str) -> Tuple[str, list]:
+    """
+    Returns a URL's netloc and non-empty path segments. Absolute URLs (the usual case for
+    browser tabs) are split with a few str.partition calls; anything else goes through urlparse.
+    """
+    scheme, sep, rest = url.partition('://')
+    if not sep or not scheme.isalpha():
+        parsed_url = urlparse(url)
+        return parsed_url.netloc, [part for part in parsed_url.path.split('/') if part]
+    rest = rest.partition('#')[0].partition('?')[0] # Drop the fragment and query
+    netloc, _, path = rest.partition('/')
+    return netloc, [part for part in path.split('/') if part]
+
 def generate_smart_title(app_name: str, window_title: str, url: Optional[str]) -> str:
     """
     Generates a more descriptive title based on application context.
     """
     app_name_lower = app_name.lower() if app_name else ""
+    window_title = window_title or ""
+    window_title_lower = window_title.lower() # Lowercased once, reused by every check below
     original_window_title = window_title # Keep a copy
 
     # 1. Web Browsers (Safari, Chrome, Arc, Edge, Firefox)
-    browser_app_names = ["safari", "google chrome", "arc", "microsoft edge", "firefox"]
-    is_browser = any(browser_keyword in app_name_lower for browser_keyword in browser_app_names)
+    is_browser = app_name_lower in _BROWSER_APP_NAMES_EXACT or \
+        any(browser_keyword in app_name_lower for browser_keyword in _BROWSER_APP_NAMES)
 
     if is_browser and url:
-        if window_title and window_title.lower() != url.lower() and window_title.lower() != "new tab" and window_title.strip():
-            suffixes_to_remove = [
-                f" - {app_name}", 
-                " - Google Chrome", " - Mozilla Firefox", " - Safari",
-                " - Microsoft Edge", " - Arc",
-            ]
+        url_lower = url.lower()
+        if window_title and window_title_lower != url_lower and window_title_lower != "new tab" and window_title.strip():
             cleaned_title = window_title
-            for suffix in suffixes_to_remove:
-                if cleaned_title.endswith(suffix):
-                    cleaned_title = cleaned_title[:-len(suffix)].strip()
-            
-            if cleaned_title and cleaned_title.lower() != url.lower():
+            if app_name and cleaned_title.endswith(f" - {app_name}"):
+                cleaned_title = cleaned_title[:-len(f" - {app_name}")].strip()
+            suffix_match = _BROWSER_SUFFIX_RE.search(cleaned_title)
+            if suffix_match:
+                cleaned_title = cleaned_title[:suffix_match.start()].strip()
+
+            if cleaned_title and cleaned_title.lower() != url_lower:
                 return cleaned_title
 
         try:
-            parsed_url = urlparse(url)
-            path_parts = [part for part in parsed_url.path.split('/') if part]
-            
+            netloc, path_parts = _url_netloc_and_path_parts(url)
+
             if path_parts and '.' in path_parts[-1]:
                 filename_from_url = unquote(path_parts[-1])
                 return filename_from_url
             
-            title_from_url = parsed_url.netloc
+            title_from_url = netloc
             if path_parts:
                 title_from_url += f"/{unquote(path_parts[0])}" 
             
@@ -370,14 +555,6 @@ def generate_smart_title(app_name: str, window_title: str, url: Optional[str]) -
         if url: return url
         return app_name if app_name else "Web Browser"
 
-    common_file_extensions = [
-        '.py', '.js', '.ts', '.jsx', '.tsx', '.html', '.css', '.scss', '.json', '.xml', '.yaml', '.yml',
-        '.md', '.txt', '.rtf',
-        '.pdf', '.doc', '.docx', '.xls', '.xlsx', '.ppt', '.pptx',
-        '.png', '.jpg', '.jpeg', '.gif', '.webp', '.svg', '.mov', '.mp4', '.avi', '.mkv',
-        '.zip', '.tar', '.gz'
-    ]
-    
     # Check if window_title (or its first part) looks like a filename
     # Often the filename is the first part of the window title for these apps.
     # Example: "file.py - MyProject - VS Code" -> "file.py"
@@ -386,18 +563,18 @@ def generate_smart_title(app_name: str, window_title: str, url: Optional[str]) -
 
     # Prioritize using the part before " - " if it seems like a file name
     first_part_of_title = window_title.split(" - ")[0].strip()
-    if any(first_part_of_title.lower().endswith(ext) for ext in common_file_extensions):
+    if first_part_of_title.lower().endswith(_FILE_EXT_TUPLE):
         return first_part_of_title
 
     # If the entire window_title ends with an extension (e.g. Preview.app showing just "mydoc.pdf")
-    if any(window_title.lower().endswith(ext) for ext in common_file_extensions):
+    if window_title_lower.endswith(_FILE_EXT_TUPLE):
         return window_title
     
-    if "finder" in app_name_lower and window_title and window_title.lower() != "finder":
+    if "finder" in app_name_lower and window_title and window_title_lower != "finder":
         return window_title 
 
     if original_window_title and original_window_title.strip() and \
-       (not app_name or original_window_title.lower() != app_name_lower):
+       (not app_name or window_title_lower != app_name_lower):
         return original_window_title
     
     if app_name:
@@ -407,23 +584,30 @@ def generate_smart_title(app_name: str, window_title: str, url: Optional[str]) -
 
 
 # --- Public API for Active Info ---
+@_ttl_cached
 def get_active_app_name() -> str:
     if sys.platform == "darwin": return _get_active_app_name_osx()
     elif sys.platform == "win32": return _get_active_app_name_windows()
     elif sys.platform.startswith("linux"): return _get_active_app_name_linux()
     return ""
 
+@_ttl_cached
 def get_active_window_title() -> str:
     if sys.platform == "darwin": return _get_active_window_title_osx()
     elif sys.platform == "win32": return _get_active_window_title_windows()
     elif sys.platform.startswith("linux"): return _get_active_window_title_linux()
     return ""
 
+@_ttl_cached
 def get_active_page_url() -> str:
     if sys.platform == "darwin": return _get_active_page_url_osx()
     # Windows and Linux placeholders return ""
     return ""
 
+def get_active_info() -> Tuple[str, str, str]:
+    """Returns (active app name, window title, page URL)."""
+    return get_active_app_name(), get_active_window_title(), get_active_page_url()
+
 
 # --- Example Usage (for testing if run directly) ---
 if __name__ == "__main__":
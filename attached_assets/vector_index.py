@@ -0,0 +1,151 @@
+import os
+import sys
+import logging
+import threading
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from eidon.config import appdata_folder
+
+# --- Optional FAISS Dependency ---
+# FAISS provides an approximate nearest-neighbour (HNSW) index so that /search
+# does not have to score every stored embedding. Without it, search falls back
+# to the brute-force matrix ranking in app.py.
+try:
+    import faiss
+except ImportError:
+    faiss = None
+
+logger = logging.getLogger(__name__)
+if not logger.handlers:
+    handler = logging.StreamHandler(sys.stderr)
+    handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+
+# --- Index Configuration ---
+INDEX_PATH = os.path.join(appdata_folder, "embeddings.faiss")
+MIN_ENTRIES_FOR_ANN = 1000  # Below this, brute-force ranking is fast enough and exact
+HNSW_M = 32                 # Graph degree for IndexHNSWFlat
+SAVE_EVERY_N_ADDS = 50      # Persist the index to disk after this many incremental additions
+# Filtered searches over less than this fraction of the index use exact ranking: HNSW
+# walks mostly excluded nodes and can miss (or return fewer than k of) the candidates.
+MIN_CANDIDATE_FRACTION = 0.05
+
+_lock = threading.Lock()
+_index = None               # faiss.IndexIDMap wrapping an IndexHNSWFlat (inner product on unit vectors)
+_loaded = False
+_adds_since_save = 0
+
+
+def _unit_rows(vectors: np.ndarray) -> np.ndarray:
+    """L2-normalizes rows so inner product equals cosine similarity."""
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    norms = np.sqrt(np.einsum("ij,ij->i", vectors, vectors)) + 1e-12
+    return vectors / norms[:, None]
+
+
+def _new_index(dim: int):
+    return faiss.IndexIDMap(faiss.IndexHNSWFlat(dim, HNSW_M, faiss.METRIC_INNER_PRODUCT))
+
+
+def _save() -> None:
+    """Writes the index to INDEX_PATH. Caller must hold _lock."""
+    global _adds_since_save
+    try:
+        faiss.write_index(_index, INDEX_PATH)
+        _adds_since_save = 0
+    except Exception as e:
+        logger.error(f"Failed to persist vector index to {INDEX_PATH}: {e}")
+
+
+def _ensure_loaded() -> None:
+    """
+    Loads the index from disk (or builds it from the database) on first use, then
+    adds any entries inserted since it was last persisted. Caller must hold _lock.
+    """
+    global _index, _loaded
+    if _loaded:
+        return
+    # Imported here to avoid a circular import (database notifies this module on insert).
+    from eidon.database import get_all_embeddings_matrix
+
+    if os.path.exists(INDEX_PATH):
+        try:
+            _index = faiss.read_index(INDEX_PATH)
+        except Exception as e:
+            logger.error(f"Failed to read vector index {INDEX_PATH}, rebuilding: {e}")
+            _index = None
+
+    indexed_ids = np.empty(0, dtype=np.int64)
+    if _index is not None:
+        indexed_ids = faiss.vector_to_array(_index.id_map)
+
+    ids, _, matrix = get_all_embeddings_matrix()
+    if ids.size > 0:
+        if _index is None:
+            _index = _new_index(matrix.shape[1])
+        missing = ~np.isin(ids, indexed_ids)
+        if matrix.shape[1] == _index.d and missing.any():
+            _index.add_with_ids(_unit_rows(matrix[missing]), ids[missing])
+            logger.info(f"Added {int(missing.sum())} embeddings to the vector index.")
+            _save()
+    _loaded = True
+
+
+def add_embedding(entry_id: int, embedding: np.ndarray) -> None:
+    """Adds a newly inserted entry's embedding to the index, if the index is in use."""
+    global _index, _adds_since_save
+    if faiss is None or embedding.size == 0:
+        return
+    with _lock:
+        if not _loaded:
+            return  # The lazy load will pick this entry up from the database.
+        if _index is None:
+            _index = _new_index(embedding.size)
+        if embedding.size != _index.d:
+            return
+        _index.add_with_ids(_unit_rows(embedding.reshape(1, -1)), np.asarray([entry_id], dtype=np.int64))
+        _adds_since_save += 1
+        if _adds_since_save >= SAVE_EVERY_N_ADDS:
+            _save()
+
+
+def search(
+    query: np.ndarray, k: int = 200, candidate_ids: Optional[Iterable[int]] = None
+) -> Optional[Tuple[List[int], np.ndarray]]:
+    """
+    Finds the k entries whose embeddings are most similar to the query.
+
+    Args:
+        query: The (D,) query embedding.
+        k: Maximum number of results.
+        candidate_ids: If given, restricts results to these entry ids (e.g. after filters).
+
+    Returns:
+        A tuple of (entry ids, cosine similarities) ordered best first, or None if the
+        ANN index is unavailable, of a different dimension, the index/candidate set is
+        small or selective enough that exact brute-force ranking should be used instead,
+        or the filtered search found fewer than k candidates.
+    """
+    if faiss is None:
+        return None
+    with _lock:
+        _ensure_loaded()
+        if _index is None or _index.ntotal < MIN_ENTRIES_FOR_ANN or query.size != _index.d:
+            return None
+        params = faiss.SearchParametersHNSW(efSearch=max(k, 64))
+        selector = None  # Kept referenced for the duration of the search call
+        if candidate_ids is not None:
+            ids = np.fromiter(candidate_ids, dtype=np.int64)
+            if ids.size <= k or ids.size < MIN_CANDIDATE_FRACTION * _index.ntotal:
+                return None  # Few enough candidates to rank them all exactly
+            if ids.size < _index.ntotal:
+                selector = faiss.IDSelectorBatch(ids)
+                params.sel = selector
+        scores, ids_found = _index.search(_unit_rows(query.reshape(1, -1)), k, params=params)
+    found = ids_found[0] >= 0  # FAISS pads with -1 when fewer than k results match
+    if selector is not None and not found.all():
+        return None  # The filtered graph walk came up short; rank the candidates exactly
+    return ids_found[0][found].tolist(), scores[0][found]
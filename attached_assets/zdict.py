@@ -0,0 +1,100 @@
+import os
+import sys
+import random
+import logging
+import threading
+from typing import List, Optional
+
+import zstandard as zstd
+
+from eidon.config import ARCHIVE_DIR
+
+# --- Shared Zstandard Dictionary for Archived Screenshots ---
+# Screenshots are small, similar WebP files, so compressing each one independently
+# re-learns the same container headers every time. A dictionary trained once on a
+# sample of screenshots is shared by every archive compression and decompression.
+
+logger = logging.getLogger(__name__)
+if not logger.handlers:
+    handler = logging.StreamHandler(sys.stderr)
+    handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+
+DICT_PATH = os.path.join(ARCHIVE_DIR, "dict.zstd")
+DICT_SIZE = 131072        # Target dictionary size in bytes
+DICT_SAMPLE_COUNT = 100   # Number of screenshots sampled for training
+
+_dict_lock = threading.Lock()
+_dictionary: Optional[zstd.ZstdCompressionDict] = None
+
+
+def load_dictionary() -> Optional[zstd.ZstdCompressionDict]:
+    """Returns the persisted dictionary, or None if none has been trained yet."""
+    global _dictionary
+    with _dict_lock:
+        if _dictionary is None and os.path.exists(DICT_PATH):
+            try:
+                with open(DICT_PATH, 'rb') as f:
+                    _dictionary = zstd.ZstdCompressionDict(f.read())
+            except OSError as e:
+                logger.error(f"Failed to read zstd dictionary {DICT_PATH}: {e}")
+        return _dictionary
+
+
+def get_or_train_dictionary(sample_paths: List[str]) -> Optional[zstd.ZstdCompressionDict]:
+    """
+    Returns the persisted dictionary, training and persisting one from a random
+    sample of `sample_paths` if none exists yet.
+
+    Returns:
+        The dictionary, or None if training was not possible (e.g. too few samples).
+    """
+    global _dictionary
+    existing = load_dictionary()
+    if existing is not None:
+        return existing
+
+    chosen = random.sample(sample_paths, min(DICT_SAMPLE_COUNT, len(sample_paths)))
+    samples = []
+    for path in chosen:
+        try:
+            with open(path, 'rb') as f:
+                samples.append(f.read())
+        except OSError:
+            continue
+    try:
+        trained = zstd.train_dictionary(DICT_SIZE, samples)
+    except zstd.ZstdError as e:
+        # Raised when there are too few or too small samples; retried on a later run.
+        logger.info(f"Not training zstd dictionary yet ({len(samples)} samples): {e}")
+        return None
+
+    with _dict_lock:
+        try:
+            os.makedirs(ARCHIVE_DIR, exist_ok=True)
+            with open(DICT_PATH, 'wb') as f:
+                f.write(trained.as_bytes())
+        except OSError as e:
+            logger.error(f"Failed to persist zstd dictionary to {DICT_PATH}: {e}")
+            return None
+        _dictionary = trained
+    logger.info(f"Trained zstd dictionary (id {trained.dict_id()}) from {len(samples)} screenshots.")
+    return trained
+
+
+def get_decompressor(frame_header: bytes) -> zstd.ZstdDecompressor:
+    """
+    Returns a decompressor for a zstd frame, using the shared dictionary only if the
+    frame was compressed with it (archives written before training have no dictionary).
+
+    Args:
+        frame_header: At least the first 18 bytes of the compressed file.
+    """
+    dict_id = zstd.get_frame_parameters(frame_header).dict_id
+    if dict_id:
+        dictionary = load_dictionary()
+        if dictionary is None or dictionary.dict_id() != dict_id:
+            raise zstd.ZstdError(f"archive requires zstd dictionary {dict_id}, which is not available")
+        return zstd.ZstdDecompressor(dict_data=dictionary)
+    return zstd.ZstdDecompressor()